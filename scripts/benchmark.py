@@ -0,0 +1,323 @@
+"""
+Offline end-to-end benchmark: runs `ingest`, `maestro` and the individual Maestro tools
+against the local fake OpenAI server and prints, per scenario, the wall time, the time to
+first output (the first byte the command writes to stdout), the CPU time and the peak RSS
+as JSON, so performance regressions show up from one release to the next.
+
+Every run is a separate process in a scratch directory with its own ChromaDB, session
+database and active session, so results do not depend on local data. `ingest` always runs
+first and the other scenarios use its collection. The fake server's latency and token rate
+are configurable; by default the Maestro is scripted to query the brand voice and generate
+ideas before answering (`--script` replaces this, see scripts/fake_openai_server.py).
+
+No OpenAI account is needed, but the Maestro counts tokens with tiktoken's `cl100k_base`
+encoding, which tiktoken downloads once and caches (in TIKTOKEN_CACHE_DIR, or a
+`data-gym-cache` directory in the system temp directory). Without network access, point
+TIKTOKEN_CACHE_DIR at a directory that already holds it; the benchmark checks this before
+running any scenario.
+
+The exit status is 1 when any run of a scenario fails. With `--baseline`, the report is
+also compared to an earlier one: a scenario whose median wall time, CPU time or peak RSS
+grew by more than `--tolerance` is listed under "regressions" and the exit status is 1.
+
+Usage:
+    python -m scripts.benchmark --repeat 3 --output benchmark.json
+    python -m scripts.benchmark --scenario maestro_fast_path --scenario tool:write_post_caption --baseline benchmark.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+
+from scripts.fake_openai_server import FakeServerConfig, start_fake_openai_server
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SESSION_ID = "benchmark"
+
+_IDEA = {
+    "title": "Descomplicando a Precificação",
+    "content_pillar": "Educação",
+    "defense_of_idea": "Artesãs cobram pouco porque não somam o tempo de trabalho; o post mostra a conta completa.",
+    "expected_results": "High salvamentos",
+    "suggested_format": "Carousel (3-5 slides)",
+}
+
+# Arguments for each Maestro tool, as the Maestro would send them.
+TOOL_ARGUMENTS: Dict[str, Dict[str, Any]] = {
+    "get_context_for_content_plan": {"num_posts": 5},
+    "get_specialized_context": {"context_type": "hooks", "query": "precificação", "num_samples": 3},
+    "query_brand_voice": {"query_text": "precificação para artesãs", "n_results": 5},
+    "propose_wildcard_angle": {"pillar": "Educação"},
+    "generate_brand_voice_report": {"post_samples": [{
+        "caption": "Você sabe quanto vale a sua hora? 💰",
+        "metadata": {
+            "caption": "Você sabe quanto vale a sua hora? 💰", "hashtags": "#calcularte", "timestamp": "2024-05-01T12:00:00.000Z",
+            "likesCount": 120, "commentsCount": 8, "url": "https://www.instagram.com/p/benchmark/",
+        },
+    }]},
+    "propose_content_plan": {"plan_input": "Plan the next 5 posts. Recent pillars: Educação, Humor, Empatia/Motivação."},
+    "generate_creative_ideas": {"ideas_input": "Generate 3 creative post ideas about precificação."},
+    "write_post_caption": {"post_idea": _IDEA},
+    "create_image_prompts": {"art_director_input": {"post_idea": _IDEA, "caption": "Você sabe quanto vale a sua hora? Arrasta pro lado! 👉"}},
+    "create_complete_posts": {"ideas_input": "Generate 2 creative post ideas about precificação."},
+    "refine_creative_content": {"revision_input": "Original content:\nVocê sabe quanto vale a sua hora?\n\nUser feedback:\nDeixe mais curto."},
+    "find_session_content": {"asset_type": "caption", "limit": 3},
+    "query_session_history": {"query_input": "Which captions were written in this session?"},
+}
+
+# The Maestro walks through a fixed plan (query, ideas, caption) before answering; the
+# sub-agents get the server's synthesized outputs.
+DEFAULT_SCRIPT = [
+    {
+        "match": "You are the Maestro Agent",
+        "tool_calls": [
+            [{"name": "query_brand_voice", "arguments": {"query_text": "*", "n_results": 20}}],
+            [{"name": "generate_creative_ideas", "arguments": {"ideas_input": "Generate 1 creative post idea about precificação."}}],
+            [{"name": "write_post_caption", "arguments": {"post_idea": _IDEA}}],
+        ],
+        "text": "Here is your post: an idea about pricing and its caption.",
+    },
+]
+
+SCENARIOS: Dict[str, List[str]] = {
+    "ingest": ["src.main", "ingest", "--sample"],
+    "maestro": ["src.main", "maestro", "Desenvolva um post completo sobre precificação para artesãs, com legenda, e depois revise o tom."],
+    "maestro_fast_path": ["src.main", "maestro", "Escreva uma legenda sobre precificação"],
+    **{f"tool:{name}": ["scripts.benchmark", "--run-tool", name] for name in TOOL_ARGUMENTS},
+}
+
+# Metrics compared with a baseline, and the growth below which a change is noise.
+REGRESSION_METRICS = {"wall_seconds": 0.05, "cpu_seconds": 0.05, "peak_rss_mb": 5.0}
+
+
+def _rss_mb(ru_maxrss: int) -> float:
+    # Linux reports kilobytes, macOS bytes.
+    return ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else ru_maxrss / 1024
+
+
+def measure(argv: List[str], cwd: str, env: Dict[str, str], timeout: float) -> Dict[str, Any]:
+    """Runs `python -m <argv>` and measures it with the child's own resource usage."""
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", *argv], cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr_chunks: List[bytes] = []
+    drain = threading.Thread(target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True)
+    drain.start()
+    timer = threading.Timer(timeout, proc.kill)
+    timer.start()
+
+    first_output, stdout_bytes = None, 0
+    while True:
+        chunk = os.read(proc.stdout.fileno(), 65536)
+        if not chunk:
+            break
+        if first_output is None:
+            first_output = time.perf_counter() - started
+        stdout_bytes += len(chunk)
+    _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - started
+    timer.cancel()
+    drain.join()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    proc.stdout.close()
+    proc.stderr.close()
+
+    result = {
+        "exit_code": proc.returncode,
+        "wall_seconds": wall,
+        "first_output_seconds": first_output,
+        "cpu_seconds": usage.ru_utime + usage.ru_stime,
+        "peak_rss_mb": _rss_mb(usage.ru_maxrss),
+        "stdout_bytes": stdout_bytes,
+    }
+    if proc.returncode != 0:
+        result["stderr_tail"] = b"".join(stderr_chunks).decode("utf-8", "replace")[-2000:]
+    return result
+
+
+def _summary(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ok = [run for run in runs if run["exit_code"] == 0]
+    median = lambda key: round(statistics.median(run[key] for run in ok), 3) if ok and all(run[key] is not None for run in ok) else None
+    summary = {
+        "runs": len(runs),
+        "failures": len(runs) - len(ok),
+        "wall_seconds": median("wall_seconds"),
+        "first_output_seconds": median("first_output_seconds"),
+        "cpu_seconds": median("cpu_seconds"),
+        "peak_rss_mb": round(max(run["peak_rss_mb"] for run in ok), 1) if ok else None,
+    }
+    if len(ok) < len(runs):
+        summary["last_error"] = next(run.get("stderr_tail", "") for run in reversed(runs) if run["exit_code"] != 0)
+    return summary
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """The metrics of `report` that grew by more than `tolerance` over `baseline`."""
+    regressions = []
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for metric, noise in REGRESSION_METRICS.items():
+            new, old = current.get(metric), previous.get(metric)
+            if new is None or old is None:
+                continue
+            if new > old * (1 + tolerance) and new - old > noise:
+                regressions.append({"scenario": name, "metric": metric, "baseline": old, "current": new, "change": round(new / old - 1, 3) if old else None})
+    return regressions
+
+
+def _scratch_dir() -> str:
+    """A working directory with the sample dataset and an active benchmark session."""
+    workdir = tempfile.mkdtemp(prefix="calcularte-benchmark-")
+    shutil.copy(os.path.join(REPO_ROOT, "dataset_sample.jsonl"), workdir)
+    with open(os.path.join(workdir, ".active_session"), "w") as f:
+        f.write(SESSION_ID)
+    return workdir
+
+
+def _child_env(base_url: str, workdir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")])),
+        "OPENAI_API_KEY": "fake",
+        "OPENAI_BASE_URL": base_url,
+        "OPENAI_MODEL": env.get("BENCHMARK_MODEL", "fake-model"),
+        "OPENAI_EMBEDDING_MODEL": "text-embedding-3-small",
+        "OPENAI_AGENTS_DISABLE_TRACING": "1",
+        "DAEMON_ENABLED": "false",
+        "SESSION_DB_FILE": os.path.join(workdir, "sessions.db"),
+        "ACTIVE_SESSION_FILE": os.path.join(workdir, ".active_session"),
+        "LOG_FILE": os.path.join(workdir, "app_run.log"),
+        "MODEL_PROFILES_FILE": os.path.join(workdir, "model_profiles.json"),
+    })
+    return env
+
+
+def _check_tokenizer():
+    """Loads the tokenizer once, so children find it cached, and stops early if it cannot be loaded."""
+    from src.utils.token_counter import get_encoding
+
+    try:
+        get_encoding()
+    except Exception as e:
+        raise SystemExit(
+            f"Could not load tiktoken's cl100k_base encoding ({type(e).__name__}: {e}). "
+            "Run once with network access, or set TIKTOKEN_CACHE_DIR to a directory that holds it."
+        )
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            script = json.load(f)
+    token_delay = 1.0 / args.tokens_per_second if args.tokens_per_second > 0 else args.token_delay
+    config = FakeServerConfig(ttft=args.ttft, token_delay=token_delay, embedding_dimensions=args.embedding_dimensions, script=script)
+    server, base_url = start_fake_openai_server(config)
+
+    names = args.scenario or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}. Known: {', '.join(SCENARIOS)}")
+    if any(name != "ingest" for name in names):
+        _check_tokenizer()
+    workdir = _scratch_dir()
+    env = _child_env(base_url, workdir)
+    scenarios: Dict[str, Any] = {}
+    try:
+        # The other scenarios need the brand collection.
+        if "ingest" not in names:
+            setup = measure(SCENARIOS["ingest"], workdir, env, args.timeout)
+            if setup["exit_code"] != 0:
+                raise SystemExit(f"Ingestion failed:\n{setup.get('stderr_tail', '')}")
+        for name in sorted(names, key=lambda name: name != "ingest"):
+            print(f"Running {name}...", file=sys.stderr)
+            scenarios[name] = _summary([measure(SCENARIOS[name], workdir, env, args.timeout) for _ in range(args.repeat)])
+    finally:
+        server.shutdown()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "config": {
+            "repeat": args.repeat,
+            "ttft": args.ttft,
+            "token_delay": token_delay,
+            "embedding_dimensions": args.embedding_dimensions,
+            "python": sys.version.split()[0],
+            "platform": sys.platform,
+        },
+        "scenarios": scenarios,
+        "server_requests": config.request_count,
+        **({"workdir": workdir} if args.keep else {}),
+    }
+
+
+async def run_tool(name: str) -> int:
+    """Child mode: invokes one Maestro tool, as the Maestro would, and prints its output."""
+    from agents.tool_context import ToolContext
+    from src.main import SESSION_DB_FILE, _init_agent_runtime
+    from src.agents_crew.run_context import MaestroContext
+    from src.agents_crew.tools import maestro_tools
+    from src.db.session_store import BlobStoringSession
+
+    _init_agent_runtime()
+    tool = next(tool for tool in maestro_tools if tool.name == name)
+    arguments = json.dumps(TOOL_ARGUMENTS[name], ensure_ascii=False)
+    session = BlobStoringSession(session_id=SESSION_ID, db_path=SESSION_DB_FILE)
+    ctx = ToolContext(
+        context=MaestroContext(session=session, db_path=SESSION_DB_FILE),
+        tool_name=name,
+        tool_call_id=f"call_benchmark_{name}",
+        tool_arguments=arguments,
+    )
+    output = await tool.on_invoke_tool(ctx, arguments)
+    print(output)
+    # Tools report their own failures as text instead of raising.
+    return 1 if str(output).startswith("An error occurred") else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", help=f"Scenario to run (repeatable; default: all). One of: {', '.join(SCENARIOS)}.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario; the report holds the medians.")
+    parser.add_argument("--ttft", type=float, default=0.05, help="Fake server time to first token, in seconds.")
+    parser.add_argument("--token-delay", type=float, default=0.001, help="Fake server delay between streamed deltas, in seconds.")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Streaming rate; overrides --token-delay.")
+    parser.add_argument("--embedding-dimensions", type=int, default=1536)
+    parser.add_argument("--script", help="JSON file of scripted fake server responses (default: the built-in Maestro plan).")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Seconds before a run is killed and counted as failed.")
+    parser.add_argument("--output", help="Also write the report to this file.")
+    parser.add_argument("--baseline", help="An earlier report to compare with.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative growth that counts as a regression.")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory (its path is in the report).")
+    parser.add_argument("--run-tool", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_tool:
+        sys.exit(asyncio.run(run_tool(args.run_tool)))
+
+    report = run_benchmark(args)
+    exit_code = 1 if any(scenario["failures"] for scenario in report["scenarios"].values()) else 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(report, baseline, args.tolerance)
+        exit_code = 1 if report["regressions"] else exit_code
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
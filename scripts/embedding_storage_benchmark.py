@@ -0,0 +1,225 @@
+"""
+Embedding storage benchmark: compares reduced-dimension and quantized storage of the post
+embeddings with full-size float32, on one set of embeddings. For every combination of
+`--dims` and `--storage` it reports:
+
+- memory: resident memory added by loading the search structure and answering one query;
+- disk: the size of that structure (the Chroma directory for float32, the `.npz` for
+  float16/int8, see src/db/quantized_vectors.py);
+- build time, and single-query latency (p50/p95);
+- recall@k against exact cosine search over the full-size float32 embeddings, with sampled
+  posts as queries (the query post itself left out).
+
+float32 is searched through a Chroma collection built as `ingest` builds it (INDEX_*
+settings), so its recall also includes the HNSW approximation; float16/int8 are scanned
+exactly. Reduced sizes truncate and re-normalize the embeddings, which equals requesting
+them with `dimensions` for `text-embedding-3-*` models. Synthetic embeddings carry no
+Matryoshka structure, so judge recall at reduced sizes on real embeddings (`--from-collection`
+or `--embeddings`).
+
+Each configuration is built and queried in separate processes, so memory figures are not
+shared between them. Prints one JSON report.
+
+Usage:
+    python -m scripts.embedding_storage_benchmark --posts 20000
+    python -m scripts.embedding_storage_benchmark --from-collection --dims 1536 512 256 --storage float32 int8
+    python -m scripts.embedding_storage_benchmark --embeddings profile.npy --output storage.json
+"""
+import argparse
+import itertools
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from scripts.synthetic_profile import generate_profile
+from src.db.index_tuning import exact_neighbors
+from src.utils.retrieval import truncate_embeddings
+
+STORAGES = ("float32", "float16", "int8")
+
+
+def _rss_mb() -> float:
+    # Current resident memory where /proc is available; the peak elsewhere.
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _size_mb(path: str) -> float:
+    if os.path.isfile(path):
+        return round(os.path.getsize(path) / (1024 * 1024), 2)
+    total = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return round(total / (1024 * 1024), 2)
+
+
+def _load_vectors(args) -> np.ndarray:
+    if args.embeddings:
+        return np.load(args.embeddings, mmap_mode="r")
+    if args.from_collection:
+        import chromadb
+        from src.db.index_tuning import load_embeddings
+        from src.db.post_index import CHROMA_PATH, COLLECTION_NAME
+
+        return load_embeddings(chromadb.PersistentClient(path=CHROMA_PATH).get_collection(name=COLLECTION_NAME))[1]
+    return np.concatenate([vectors for _, vectors in generate_profile(args.posts, seed=args.seed, dimensions=args.dimensions)])
+
+
+def _index_path(workdir: str, dims: int, storage: str) -> str:
+    return os.path.join(workdir, f"chroma_{dims}") if storage == "float32" else os.path.join(workdir, f"vectors_{dims}_{storage}.npz")
+
+
+def build_config(args) -> Dict[str, Any]:
+    """Child mode: builds the search structure of one configuration in the work directory."""
+    from src.db import quantized_vectors
+
+    full = np.load(os.path.join(args.workdir, "full.npy"), mmap_mode="r")
+    ids = [str(i) for i in range(len(full))]
+    path = _index_path(args.workdir, args.run_dims, args.run_storage)
+    started = time.perf_counter()
+    if args.run_storage == "float32":
+        import chromadb
+        from src.db.post_index import create_collection
+
+        client = chromadb.PersistentClient(path=path)
+        collection = create_collection(client, "benchmark", dimensions=args.run_dims)
+        batch_size = client.get_max_batch_size()
+        for offset in range(0, len(ids), batch_size):
+            collection.add(ids=ids[offset:offset + batch_size], embeddings=truncate_embeddings(full[offset:offset + batch_size], args.run_dims))
+    else:
+        store = quantized_vectors.quantize(ids, truncate_embeddings(full, args.run_dims), args.run_storage)
+        quantized_vectors._save(store, path)
+    return {"build_seconds": round(time.perf_counter() - started, 2), "disk_mb": _size_mb(path)}
+
+
+def query_config(args) -> Dict[str, Any]:
+    """Child mode: loads one configuration's search structure and measures memory, latency and recall."""
+    from src.db import quantized_vectors
+
+    truth_file = np.load(os.path.join(args.workdir, "truth.npz"))
+    query_rows, truth = truth_file["rows"], truth_file["truth"]
+    full = np.load(os.path.join(args.workdir, "full.npy"), mmap_mode="r")
+    queries = truncate_embeddings(full[query_rows], args.run_dims)
+    path = _index_path(args.workdir, args.run_dims, args.run_storage)
+    k = truth.shape[1]
+
+    if args.run_storage == "float32":
+        import chromadb
+
+        baseline = _rss_mb()
+        collection = chromadb.PersistentClient(path=path).get_collection(name="benchmark")
+        search = lambda query: [int(i) for i in collection.query(query_embeddings=[query], n_results=k + 1, include=[])["ids"][0]]
+    else:
+        baseline = _rss_mb()
+        store = quantized_vectors._load(path, args.run_storage)
+        search = lambda query: store.search(query, k + 1)[0]
+    search(queries[0])  # loads the index
+    memory_mb = _rss_mb() - baseline
+
+    latencies, hits = [], 0
+    for row, query, expected in zip(query_rows, queries, truth):
+        started = time.perf_counter()
+        found = search(query)
+        latencies.append(time.perf_counter() - started)
+        hits += len(set(expected.tolist()).intersection([i for i in found if i != row][:k]))
+    ordered = sorted(latencies)
+    pick = lambda pct: round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] * 1000, 3)
+    return {
+        "memory_mb": round(memory_mb, 2), "p50_ms": pick(50), "p95_ms": pick(95),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3), "recall": round(hits / (k * len(query_rows)), 4),
+    }
+
+
+def _child(args, phase: str, dims: int, storage: str, workdir: str) -> Dict[str, Any]:
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, LOG_LEVEL="WARNING", LOG_FILE=os.path.join(workdir, "app_run.log"))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [repo_root, env.get("PYTHONPATH")]))
+    command = [
+        sys.executable, "-m", "scripts.embedding_storage_benchmark", "--run-phase", phase,
+        "--run-dims", str(dims), "--run-storage", storage, "--workdir", workdir,
+    ]
+    completed = subprocess.run(command, env=env, capture_output=True, text=True, timeout=args.timeout)
+    if completed.returncode != 0:
+        return {"error": completed.stderr[-2000:]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="calcularte-embedding-storage-")
+    try:
+        vectors = np.asarray(_load_vectors(args), dtype=np.float32)
+        posts, full_dims = vectors.shape
+        np.save(os.path.join(workdir, "full.npy"), vectors)
+        query_rows = np.sort(np.random.default_rng(args.seed).choice(len(vectors), size=min(args.queries, len(vectors)), replace=False))
+        k = min(args.k, len(vectors) - 1)
+        truth = np.asarray(exact_neighbors(vectors, query_rows.tolist(), k, "cosine"))
+        np.savez(os.path.join(workdir, "truth.npz"), rows=query_rows, truth=truth)
+        del vectors
+
+        results: List[Dict[str, Any]] = []
+        for dims, storage in itertools.product(sorted({min(d, full_dims) for d in args.dims or [full_dims]}, reverse=True), args.storage):
+            print(f"Benchmarking {dims} dimensions, {storage}...", file=sys.stderr)
+            result = {"dimensions": dims, "storage": storage}
+            result.update(_child(args, "build", dims, storage, workdir))
+            if "error" not in result:
+                result.update(_child(args, "query", dims, storage, workdir))
+            results.append(result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    # Ratios against full-size float32, when it was measured.
+    baseline = next((r for r in results if r["dimensions"] == full_dims and r["storage"] == "float32" and "error" not in r), None)
+    if baseline:
+        for result in results:
+            if "error" not in result:
+                result["disk_ratio"] = round(baseline["disk_mb"] / result["disk_mb"], 2) if result["disk_mb"] else None
+                result["memory_ratio"] = round(baseline["memory_mb"] / result["memory_mb"], 2) if result["memory_mb"] > 0 else None
+                result["p50_speedup"] = round(baseline["p50_ms"] / result["p50_ms"], 2) if result["p50_ms"] else None
+    source = args.embeddings or ("collection" if args.from_collection else "synthetic")
+    config = {"source": source, "posts": posts, "full_dimensions": full_dims, "k": k, "queries": len(query_rows), "seed": args.seed}
+    return {"config": config, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", help="A float32 .npy matrix of embeddings (one row per post), e.g. from scripts.synthetic_profile.")
+    parser.add_argument("--from-collection", action="store_true", help="Use the embeddings of the local collection (./chroma_db).")
+    parser.add_argument("--posts", type=int, default=20_000, help="Synthetic posts, when no embeddings are given.")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Synthetic embedding dimensions.")
+    parser.add_argument("--dims", type=int, nargs="+", default=[1536, 1024, 512, 256], help="Stored sizes to compare (capped at the embeddings' size).")
+    parser.add_argument("--storage", nargs="+", choices=STORAGES, default=list(STORAGES), help="Storage types to compare.")
+    parser.add_argument("--queries", type=int, default=200, help="Posts sampled as queries.")
+    parser.add_argument("-k", type=int, default=10, help="Neighbours per query for recall@k.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=3600.0, help="Seconds before a configuration is abandoned.")
+    parser.add_argument("--output", help="Also write the report to this file.")
+    parser.add_argument("--run-phase", choices=("build", "query"), help=argparse.SUPPRESS)
+    parser.add_argument("--run-dims", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--run-storage", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_phase:
+        print(json.dumps(build_config(args) if args.run_phase == "build" else query_config(args)))
+        return
+
+    report = run_benchmark(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
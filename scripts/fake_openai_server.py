@@ -0,0 +1,335 @@
+"""
+A local, OpenAI-compatible stand-in server for offline checks and benchmarks.
+
+Serves `POST /v1/responses` (streaming and non-streaming) and `POST /v1/embeddings`.
+Text responses are synthesized: when the request asks for a JSON schema (an agent with an
+`output_type`), a minimal valid instance of that schema is returned, otherwise filler text.
+Latency is configurable: a time-to-first-token delay, a per-delta delay (or a token rate),
+and an optional fraction of "stalled" requests that wait much longer before their first token.
+
+A script (`--script FILE`, a JSON list) replaces the synthesized output for requests whose
+instructions contain an entry's `match` text. An entry gives the `text` to stream and,
+optionally, `tool_calls`: a list of steps, each a list of `{"name", "arguments"}` calls. A
+request gets the step numbered by how many tool outputs its input already holds, and the
+`text` once the steps are used up, so an orchestrator can be walked through a fixed plan:
+
+    [{"match": "You are the Maestro Agent",
+      "tool_calls": [[{"name": "query_brand_voice", "arguments": {"query_text": "*", "n_results": 20}}]],
+      "text": "Here is your post."}]
+
+Usage:
+    python -m scripts.fake_openai_server --port 8765 --ttft 0.5 --token-delay 0.01
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python -m src.main maestro "..."
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+FILLER_TEXT = (
+    "Organizar as finanças do ateliê começa com clareza: separe o seu salário, "
+    "registre cada custo e precifique com confiança. ✨ #calcularte #artesanato"
+)
+
+
+class FakeServerConfig:
+    """Latency and payload settings shared by every request the server handles."""
+
+    def __init__(
+        self,
+        ttft: float = 0.0,
+        token_delay: float = 0.0,
+        stall_rate: float = 0.0,
+        stall_ttft: float = 30.0,
+        chunk_size: int = 4,
+        embedding_dimensions: int = 1536,
+        script: Optional[List[Dict[str, Any]]] = None,
+    ):
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.stall_rate = stall_rate
+        self.stall_ttft = stall_ttft
+        self.chunk_size = chunk_size
+        self.embedding_dimensions = embedding_dimensions
+        self.script = script or []
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def next_id(self, prefix: str) -> str:
+        with self._lock:
+            return f"{prefix}_{next(self._ids)}"
+
+    def count_request(self):
+        with self._lock:
+            self.request_count += 1
+
+    def first_token_delay(self) -> float:
+        return self.stall_ttft if random.random() < self.stall_rate else self.ttft
+
+
+def instance_from_schema(schema: Dict[str, Any], defs: Optional[Dict[str, Any]] = None) -> Any:
+    """Builds a small value that satisfies a (strict) JSON schema."""
+    defs = defs if defs is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return instance_from_schema(defs[schema["$ref"].split("/")[-1]], defs)
+    for key in ("anyOf", "oneOf"):
+        if key in schema:
+            options = [s for s in schema[key] if s.get("type") != "null"] or schema[key]
+            return instance_from_schema(options[0], defs)
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "const" in schema:
+        return schema["const"]
+
+    schema_type = schema.get("type")
+    if isinstance(schema_type, list):
+        schema_type = next((t for t in schema_type if t != "null"), "null")
+    if schema_type == "object":
+        return {name: instance_from_schema(prop, defs) for name, prop in schema.get("properties", {}).items()}
+    if schema_type == "array":
+        return [instance_from_schema(schema.get("items", {}), defs) for _ in range(2)]
+    if schema_type == "integer":
+        return 1
+    if schema_type == "number":
+        return 1.0
+    if schema_type == "boolean":
+        return True
+    if schema_type == "null":
+        return None
+    return FILLER_TEXT
+
+
+def _script_entry(request: Dict[str, Any], script: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    instructions = request.get("instructions") or ""
+    return next((entry for entry in script if entry.get("match") and entry["match"] in instructions), None)
+
+
+def scripted_tool_calls(request: Dict[str, Any], script: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The tool calls a scripted request should make now (empty once its steps are used up)."""
+    entry = _script_entry(request, script)
+    if not entry or not entry.get("tool_calls"):
+        return []
+    inputs = request.get("input")
+    step = sum(1 for item in inputs if isinstance(item, dict) and item.get("type") == "function_call_output") if isinstance(inputs, list) else 0
+    steps = entry["tool_calls"]
+    return steps[step] if step < len(steps) else []
+
+
+def response_text_for(request: Dict[str, Any], script: Optional[List[Dict[str, Any]]] = None) -> str:
+    """Chooses the text a `/v1/responses` request should produce."""
+    entry = _script_entry(request, script or [])
+    if entry and entry.get("text") is not None:
+        return entry["text"]
+    text_format = (request.get("text") or {}).get("format") or {}
+    if text_format.get("type") == "json_schema":
+        return json.dumps(instance_from_schema(text_format.get("schema", {})), ensure_ascii=False)
+    return FILLER_TEXT
+
+
+def fake_embedding(text: str, dimensions: int) -> list:
+    """A deterministic, unit-length pseudo-embedding derived from the text."""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0, 1) for _ in range(dimensions)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _usage(input_tokens: int, output_tokens: int) -> Dict[str, Any]:
+    return {
+        "input_tokens": input_tokens,
+        "input_tokens_details": {"cached_tokens": 0},
+        "output_tokens": output_tokens,
+        "output_tokens_details": {"reasoning_tokens": 0},
+        "total_tokens": input_tokens + output_tokens,
+    }
+
+
+def _response_object(response_id: str, model: str, status: str, output: list, usage: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "id": response_id,
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": model,
+        "status": status,
+        "output": output,
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": usage,
+    }
+
+
+def _message_item(item_id: str, text: Optional[str]) -> Dict[str, Any]:
+    content = [] if text is None else [{"type": "output_text", "text": text, "annotations": []}]
+    return {
+        "id": item_id,
+        "type": "message",
+        "role": "assistant",
+        "status": "in_progress" if text is None else "completed",
+        "content": content,
+    }
+
+
+def _function_call_item(item_id: str, call_id: str, name: str, arguments: str, status: str = "completed") -> Dict[str, Any]:
+    return {"id": item_id, "type": "function_call", "call_id": call_id, "name": name, "arguments": arguments, "status": status}
+
+
+def make_handler(config: FakeServerConfig):
+    class FakeOpenAIHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _read_json(self) -> Dict[str, Any]:
+            body = self.rfile.read(int(self.headers.get("content-length", 0)))
+            return json.loads(body or b"{}")
+
+        def _send_json(self, payload: Dict[str, Any], status: int = 200):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            config.count_request()
+            request = self._read_json()
+            if self.path.endswith("/embeddings"):
+                self._handle_embeddings(request)
+            elif self.path.endswith("/responses"):
+                self._handle_responses(request)
+            else:
+                self._send_json({"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}}, status=404)
+
+        def _handle_embeddings(self, request: Dict[str, Any]):
+            inputs = request.get("input", [])
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            dimensions = request.get("dimensions") or config.embedding_dimensions
+            time.sleep(config.ttft)
+            self._send_json({
+                "object": "list",
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": fake_embedding(str(text), dimensions)}
+                    for i, text in enumerate(inputs)
+                ],
+                "model": request.get("model", "fake-embedding"),
+                "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+            })
+
+        def _handle_responses(self, request: Dict[str, Any]):
+            model = request.get("model") or "fake-model"
+            calls = [
+                _function_call_item(config.next_id("fc"), config.next_id("call"), call["name"], json.dumps(call.get("arguments", {}), ensure_ascii=False))
+                for call in scripted_tool_calls(request, config.script)
+            ]
+            text = "" if calls else response_text_for(request, config.script)
+            input_tokens = len(json.dumps(request.get("input", ""))) // 4
+            output_tokens = max(1, (len(text) + sum(len(call["arguments"]) for call in calls)) // 4)
+            response_id = config.next_id("resp")
+            item_id = config.next_id("msg")
+            output = calls or [_message_item(item_id, text)]
+            completed = _response_object(response_id, model, "completed", output, _usage(input_tokens, output_tokens))
+
+            if not request.get("stream"):
+                time.sleep(config.first_token_delay() + config.token_delay * output_tokens)
+                self._send_json(completed)
+                return
+
+            self.send_response(200)
+            self.send_header("content-type", "text/event-stream")
+            self.send_header("cache-control", "no-cache")
+            self.send_header("connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            sequence = itertools.count()
+
+            def emit(event_type: str, **fields):
+                payload = {"type": event_type, "sequence_number": next(sequence), **fields}
+                self.wfile.write(f"event: {event_type}\ndata: {json.dumps(payload)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            try:
+                emit("response.created", response=_response_object(response_id, model, "in_progress", [], None))
+                time.sleep(config.first_token_delay())
+                if calls:
+                    self._stream_tool_calls(emit, calls)
+                    emit("response.completed", response=completed)
+                    return
+                emit("response.output_item.added", output_index=0, item=_message_item(item_id, None))
+                emit("response.content_part.added", item_id=item_id, output_index=0, content_index=0,
+                     part={"type": "output_text", "text": "", "annotations": []})
+                for start in range(0, len(text), config.chunk_size):
+                    emit("response.output_text.delta", item_id=item_id, output_index=0, content_index=0,
+                         delta=text[start:start + config.chunk_size], logprobs=[])
+                    if config.token_delay:
+                        time.sleep(config.token_delay)
+                emit("response.output_text.done", item_id=item_id, output_index=0, content_index=0, text=text, logprobs=[])
+                emit("response.content_part.done", item_id=item_id, output_index=0, content_index=0,
+                     part={"type": "output_text", "text": text, "annotations": []})
+                emit("response.output_item.done", output_index=0, item=_message_item(item_id, text))
+                emit("response.completed", response=completed)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up on this request (e.g. a hedged duplicate was cancelled).
+                pass
+
+        def _stream_tool_calls(self, emit, calls: List[Dict[str, Any]]):
+            for index, call in enumerate(calls):
+                emit("response.output_item.added", output_index=index, item={**call, "arguments": "", "status": "in_progress"})
+                for start in range(0, len(call["arguments"]), config.chunk_size):
+                    emit("response.function_call_arguments.delta", item_id=call["id"], output_index=index,
+                         delta=call["arguments"][start:start + config.chunk_size])
+                    if config.token_delay:
+                        time.sleep(config.token_delay)
+                emit("response.function_call_arguments.done", item_id=call["id"], output_index=index, name=call["name"], arguments=call["arguments"])
+                emit("response.output_item.done", output_index=index, item=call)
+
+    return FakeOpenAIHandler
+
+
+def start_fake_openai_server(config: Optional[FakeServerConfig] = None, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Starts the server on a background thread and returns it with its `/v1` base URL."""
+    server = ThreadingHTTPServer((host, port), make_handler(config or FakeServerConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ttft", type=float, default=0.0, help="Seconds before the first token.")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed deltas.")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Fraction of requests that stall before the first token.")
+    parser.add_argument("--stall-ttft", type=float, default=30.0, help="Seconds a stalled request waits before the first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Streaming rate; overrides --token-delay (one delta is about one token).")
+    parser.add_argument("--script", help="JSON file of scripted responses (see above).")
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            script = json.load(f)
+    token_delay = 1.0 / args.tokens_per_second if args.tokens_per_second > 0 else args.token_delay
+    config = FakeServerConfig(ttft=args.ttft, token_delay=token_delay, stall_rate=args.stall_rate, stall_ttft=args.stall_ttft, script=script)
+    server, base_url = start_fake_openai_server(config, host=args.host, port=args.port)
+    print(f"Fake OpenAI server listening on {base_url} (Ctrl+C to stop).")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
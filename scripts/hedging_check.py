@@ -0,0 +1,92 @@
+"""
+Measures sub-agent tail latency with and without hedging against the local fake OpenAI server.
+
+A fraction of the server's requests stall before their first token (`--stall-rate`,
+`--stall-ttft`). The script runs the Copywriter Agent `--runs` times through
+`_run_agent_as_streaming_tool`, first without hedging and then with it, and prints
+p50/p95/max latency and failure counts for both modes as JSON.
+
+Both modes start from the latency samples of the healthy warm-up runs, so the stalls of the
+un-hedged pass do not inflate the hedge delay of the hedged one. The hedged pass reports the
+range of hedge delays it actually used.
+
+Usage:
+    python -m scripts.hedging_check --runs 40 --stall-rate 0.05 --stall-ttft 3
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from agents import set_default_openai_client, set_tracing_disabled
+from scripts.fake_openai_server import FakeServerConfig, start_fake_openai_server
+from src.utils.rate_limiter import create_async_openai_client
+
+
+def _summary(durations, failures):
+    ordered = sorted(durations)
+    pick = lambda pct: round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))], 3) if ordered else None
+    return {"runs": len(durations) + failures, "failures": failures, "p50": pick(50), "p95": pick(95), "max": pick(100)}
+
+
+async def run_mode(run_tool, agent, runs: int, hedge: bool, tracker):
+    durations, delays, failures = [], [], 0
+    for i in range(runs):
+        if hedge:
+            delays.append(tracker.hedge_delay(agent.name))
+        started = time.perf_counter()
+        try:
+            await run_tool(agent, f"Write caption #{i}.", None, hedge=hedge)
+            durations.append(time.perf_counter() - started)
+        except Exception:
+            failures += 1
+    summary = _summary(durations, failures)
+    if delays:
+        summary["hedge_delay_seconds"] = {"min": round(min(delays), 3), "max": round(max(delays), 3)}
+    return summary
+
+
+async def run_check(args):
+    config = FakeServerConfig(ttft=args.ttft, token_delay=args.token_delay, stall_rate=args.stall_rate, stall_ttft=args.stall_ttft)
+    server, base_url = start_fake_openai_server(config)
+    set_tracing_disabled(True)
+    set_default_openai_client(create_async_openai_client(base_url=base_url, api_key="fake"))
+
+    # Imported late so the agents pick up the environment configured above.
+    from src.agents_crew.copywriter import copywriter_agent
+    from src.agents_crew.tools import _run_agent_as_streaming_tool
+    from src.utils.hedging import latency_tracker
+
+    # Warm up the latency tracker on healthy requests so the hedge delay reflects the normal p95.
+    config.stall_rate = 0.0
+    for i in range(args.warmup):
+        try:
+            await _run_agent_as_streaming_tool(copywriter_agent, f"Warm-up #{i}.", None, hedge=False)
+        except Exception:
+            pass
+    config.stall_rate = args.stall_rate
+    warm_samples = latency_tracker.snapshot(copywriter_agent.name)
+
+    report = {}
+    for mode, hedge in (("without_hedging", False), ("with_hedging", True)):
+        latency_tracker.restore(copywriter_agent.name, warm_samples)
+        report[mode] = await run_mode(_run_agent_as_streaming_tool, copywriter_agent, args.runs, hedge, latency_tracker)
+    report["server_requests"] = config.request_count
+    server.shutdown()
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=40)
+    parser.add_argument("--warmup", type=int, default=20, help="Un-hedged, non-stalled runs used to seed the p95 latency.")
+    parser.add_argument("--ttft", type=float, default=0.1)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--stall-rate", type=float, default=0.05)
+    parser.add_argument("--stall-ttft", type=float, default=3.0)
+    args = parser.parse_args()
+    asyncio.run(run_check(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,49 @@
 import json
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
 import chromadb
+from src.db.post_index import (
+    CHROMA_PATH, COLLECTION_NAME, SCHEMA_VERSION, get_or_create_collection, index_changes, migrate_collection, post_metadata,
+    requested_dimensions, schema_version,
+)
+from src.db.quantized_vectors import load_for_collection
+from src.utils import console
+from src.utils.rate_limiter import create_openai_client
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Initialize OpenAI client (shares the process-wide rate limiter)
+client = create_openai_client()
 
 # Initialize ChromaDB client
 # This will create a local ChromaDB instance in the current directory
-chroma_client = chromadb.PersistentClient(path="./chroma_db")
+chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
 
-# Get or create a collection
-collection_name = "calcularte_posts"
-try:
-    collection = chroma_client.get_collection(name=collection_name)
-except:
-    collection = chroma_client.create_collection(name=collection_name)
+# Get or create a collection (new collections use the current schema, see src/db/post_index.py)
+collection = get_or_create_collection(chroma_client)
 
-def get_embedding(text: str, model: str = "text-embedding-3-small"):
-    """Generates an embedding for the given text using OpenAI's API."""
+def get_embedding(text: str, model: str = "text-embedding-3-small", dimensions: int = None):
+    """Generates an embedding for the given text using OpenAI's API (at `dimensions`, if given)."""
     text = text.replace("\n", " ")
-    response = client.embeddings.create(input=[text], model=model)
+    extra = {"dimensions": dimensions} if dimensions else {}
+    response = client.embeddings.create(input=[text], model=model, **extra)
     return response.data[0].embedding
 
 def ingest_data(file_path: str):
     """
     Loads data from a JSONL file, generates embeddings, and stores them in ChromaDB.
     """
-    print(f"Ingesting data from {file_path}...")
+    global collection
+    if schema_version(collection) < SCHEMA_VERSION or "dimensions" in index_changes(collection):
+        # New posts are written in the current schema and embedding size, so the collection is upgraded first.
+        console.echo(f"Migrating '{COLLECTION_NAME}' to schema {SCHEMA_VERSION} and the configured embedding size first...")
+        migrate_collection(chroma_client)
+        collection = chroma_client.get_collection(name=COLLECTION_NAME)
+    # Posts are embedded at the size the collection stores, so queries and posts always match.
+    dimensions = requested_dimensions(collection)
+
+    console.echo(f"Ingesting data from {file_path}...")
     with open(file_path, 'r', encoding='utf-8') as f:
         for i, line in enumerate(f):
             data = json.loads(line)
@@ -39,16 +51,9 @@ def ingest_data(file_path: str):
             post_id = data.get("id", f"post_{i}") # Use 'id' field or generate a unique one
 
             if caption:
-                embedding = get_embedding(caption)
-                # Store the original caption and other metadata
-                metadata = {
-                    "caption": caption,
-                    "hashtags": ", ".join(data.get("hashtags", [])), # Convert list to string
-                    "timestamp": data.get("timestamp"),
-                    "likesCount": data.get("likesCount"),
-                    "commentsCount": data.get("commentsCount"),
-                    "url": data.get("url")
-                }
+                embedding = get_embedding(caption, dimensions=dimensions)
+                # The caption is stored once, as the document; the metadata is compact
+                metadata = post_metadata(data)
                 collection.add(
                     embeddings=[embedding],
                     documents=[caption], # Storing the caption as the document
@@ -56,8 +61,10 @@ def ingest_data(file_path: str):
                     ids=[post_id]
                 )
                 if (i + 1) % 10 == 0:
-                    print(f"Processed {i + 1} posts.")
-    print(f"Data ingestion complete from {file_path}.")
+                    console.echo(f"Processed {i + 1} posts.")
+    # Refresh the quantized vectors now rather than on the first query (a no-op without EMBEDDING_QUANTIZATION).
+    load_for_collection(collection)
+    console.echo(f"Data ingestion complete from {file_path}.")
 
 if __name__ == "__main__":
     # Use the sample dataset for development
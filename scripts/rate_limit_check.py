@@ -0,0 +1,120 @@
+"""
+Exercises the shared OpenAI rate limiter against a local mock server that injects 429s.
+
+The mock server answers `POST /v1/embeddings` and returns HTTP 429 (with a `retry-after`
+header) whenever more than `--server-concurrency` requests are in flight, or at random
+with probability `--error-rate`. The script fires `--requests` concurrent embedding calls
+through a rate-limited client and reports how many succeeded, how many 429s were absorbed,
+and the concurrency limit the AIMD controller settled on.
+
+Usage:
+    python -m scripts.rate_limit_check --requests 200 --server-concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from openai import AsyncOpenAI
+from src.utils.rate_limiter import AsyncRateLimitedTransport, RateLimiter
+
+
+def make_handler(server_concurrency: int, error_rate: float, latency: float, retry_after: float, stats: dict):
+    lock = threading.Lock()
+    in_flight = [0]
+
+    class MockHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("content-length", 0)))
+            with lock:
+                in_flight[0] += 1
+                overloaded = in_flight[0] > server_concurrency or random.random() < error_rate
+            try:
+                if overloaded:
+                    stats["throttled"] += 1
+                    payload = json.dumps({"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}).encode()
+                    self.send_response(429)
+                    self.send_header("retry-after", str(retry_after))
+                else:
+                    time.sleep(latency)
+                    stats["served"] += 1
+                    request = json.loads(body or b"{}")
+                    payload = json.dumps({
+                        "object": "list",
+                        "data": [{"object": "embedding", "index": 0, "embedding": [0.0] * 8}],
+                        "model": request.get("model", "mock"),
+                        "usage": {"prompt_tokens": 1, "total_tokens": 1},
+                    }).encode()
+                    self.send_response(200)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+    return MockHandler
+
+
+async def run_check(args):
+    stats = {"served": 0, "throttled": 0}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.server_concurrency, args.error_rate, args.latency, args.retry_after, stats))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    limiter = RateLimiter(requests_per_minute=args.rpm, max_concurrency=args.max_concurrency)
+    client = AsyncOpenAI(
+        api_key="mock",
+        base_url=base_url,
+        http_client=httpx.AsyncClient(transport=AsyncRateLimitedTransport(limiter, max_retries=args.max_retries)),
+        max_retries=0,
+    )
+
+    async def one_call(i: int):
+        try:
+            await client.embeddings.create(input=[f"post {i}"], model="mock-embedding")
+            return True
+        except Exception:
+            return False
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one_call(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    report = {
+        "requests": args.requests,
+        "succeeded": sum(results),
+        "failed": len(results) - sum(results),
+        "server_429s": stats["throttled"],
+        "limiter_429s": limiter.rate_limited_count,
+        "final_concurrency_limit": int(limiter.concurrency_limit),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(args.requests / elapsed, 2),
+    }
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--server-concurrency", type=int, default=4, help="In-flight requests above which the mock server answers 429.")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="Probability of a random 429.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds the mock server takes per successful request.")
+    parser.add_argument("--retry-after", type=float, default=0.2, help="Value of the retry-after header on 429s.")
+    parser.add_argument("--rpm", type=int, default=0, help="Client-side requests-per-minute limit (0 = unlimited).")
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--max-retries", type=int, default=8)
+    asyncio.run(run_check(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Retrieval scaling benchmark: ingests synthetic profiles (scripts/synthetic_profile.py) of
+increasing size into ChromaDB and measures, at each scale:
+
+- ingest throughput: bulk batched adds, and per-post adds as `ingest_data` does them (on
+  a sample of `--per-post-sample` posts). Embeddings are precomputed, so only ChromaDB is
+  timed.
+- `query_brand_voice` latency (p50/p95 over `--queries` runs) for the "*" newest-posts
+  path and for a semantic query, each with and without diversification. Query embeddings
+  come from the in-process fake OpenAI server.
+- peak RSS after ingest and after the queries, and the size of `chroma_db` on disk.
+
+Posts are stored in the current collection schema and index settings (src/db/post_index.py),
+or with `--legacy-schema` in schema 1 (caption repeated in the metadata) with Chroma's
+default index, to compare the two.
+
+Each scale runs in its own process and scratch directory, so memory figures do not carry
+over between scales. Prints one JSON report.
+
+Usage:
+    python -m scripts.retrieval_benchmark --scales 10000 100000 --output retrieval.json
+    python -m scripts.retrieval_benchmark --scales 1000000 --dimensions 256 --queries 5
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+from scripts.fake_openai_server import FakeServerConfig, start_fake_openai_server
+from scripts.synthetic_profile import generate_profile
+from src.db.post_index import CHROMA_PATH, COLLECTION_NAME, SCHEMA_VERSION, create_collection, index_settings, post_metadata
+QUERY_TEXT = "Como calcular o preço de uma peça artesanal?"
+
+
+def _peak_rss_mb() -> float:
+    # Linux reports kilobytes, macOS bytes.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def _dir_size_mb(path: str) -> float:
+    total = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return round(total / (1024 * 1024), 1)
+
+
+def _legacy_metadata(post: Dict[str, Any]) -> Dict[str, Any]:
+    # The metadata `ingest_data` stored for a post in schema 1.
+    return {
+        "caption": post["caption"],
+        "hashtags": ", ".join(post.get("hashtags", [])),
+        "timestamp": post.get("timestamp"),
+        "likesCount": post.get("likesCount"),
+        "commentsCount": post.get("commentsCount"),
+        "url": post.get("url"),
+    }
+
+
+def _latencies(run: Callable[[], Any], runs: int) -> Dict[str, Any]:
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - started)
+    ordered = sorted(durations)
+    pick = lambda pct: round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] * 1000, 1)
+    return {"runs": runs, "p50_ms": pick(50), "p95_ms": pick(95), "mean_ms": round(statistics.mean(durations) * 1000, 1)}
+
+
+def run_scale(args) -> Dict[str, Any]:
+    """Child mode: builds and queries one collection in the current directory."""
+    import chromadb
+
+    result: Dict[str, Any] = {"posts": args.run_scale, "dimensions": args.dimensions, "schema": 1 if args.legacy_schema else SCHEMA_VERSION}
+    client = chromadb.PersistentClient(path=CHROMA_PATH)
+    if args.legacy_schema:
+        collection = client.create_collection(name=COLLECTION_NAME)
+        metadata = _legacy_metadata
+    else:
+        collection = create_collection(client)
+        metadata = post_metadata
+    result["index"] = index_settings(collection)
+    batch_size = min(args.batch_size, client.get_max_batch_size())
+
+    generation_seconds, ingest_seconds = 0.0, 0.0
+    chunks = generate_profile(args.run_scale, seed=args.seed, dimensions=args.dimensions, chunk_size=batch_size)
+    while True:
+        started = time.perf_counter()
+        chunk = next(chunks, None)
+        generation_seconds += time.perf_counter() - started
+        if chunk is None:
+            break
+        posts, vectors = chunk
+        started = time.perf_counter()
+        collection.add(
+            ids=[post["id"] for post in posts],
+            embeddings=vectors,
+            documents=[post["caption"] for post in posts],
+            metadatas=[metadata(post) for post in posts],
+        )
+        ingest_seconds += time.perf_counter() - started
+    result["bulk_ingest"] = {
+        "batch_size": batch_size,
+        "seconds": round(ingest_seconds, 2),
+        "posts_per_second": round(args.run_scale / ingest_seconds, 1) if ingest_seconds else None,
+        "generation_seconds": round(generation_seconds, 2),
+    }
+    result["peak_rss_mb_after_ingest"] = _peak_rss_mb()
+    result["chroma_db_mb"] = _dir_size_mb(CHROMA_PATH)
+
+    # One add per post, as `ingest_data` does, into a separate collection.
+    sample = min(args.per_post_sample, args.run_scale)
+    if sample:
+        probe = client.create_collection(name="per_post_probe")
+        posts, vectors = next(generate_profile(sample, seed=args.seed + 1, dimensions=args.dimensions, chunk_size=sample))
+        started = time.perf_counter()
+        for post, vector in zip(posts, vectors):
+            probe.add(ids=[post["id"]], embeddings=[vector], documents=[post["caption"]], metadatas=[metadata(post)])
+        seconds = time.perf_counter() - started
+        client.delete_collection("per_post_probe")
+        result["per_post_ingest"] = {"posts": sample, "seconds": round(seconds, 2), "posts_per_second": round(sample / seconds, 1)}
+
+    # Imported late so the strategist's clients pick up the fake server and the collection above.
+    from src.agents_crew.brand_strategist import BrandStrategistAgent
+
+    strategist = BrandStrategistAgent()
+    queries = {
+        "newest_posts": lambda: strategist.query_brand_voice("*", args.n_results, diversify=False),
+        "newest_posts_diversified": lambda: strategist.query_brand_voice("*", args.n_results, diversify=True),
+        "semantic": lambda: strategist.query_brand_voice(QUERY_TEXT, args.n_results, diversify=False),
+        "semantic_diversified": lambda: strategist.query_brand_voice(QUERY_TEXT, args.n_results, diversify=True),
+    }
+    result["query_brand_voice"] = {}
+    for name, query in queries.items():
+        query()  # warm-up: loads the index and segment caches
+        result["query_brand_voice"][name] = _latencies(query, args.queries)
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def _child_env(base_url: str, workdir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env.update({
+        "PYTHONPATH": os.pathsep.join(filter(None, [repo_root, env.get("PYTHONPATH")])),
+        "OPENAI_API_KEY": "fake",
+        "OPENAI_BASE_URL": base_url,
+        "OPENAI_EMBEDDING_MODEL": "text-embedding-3-small",
+        "LOG_FILE": os.path.join(workdir, "app_run.log"),
+        "LOG_LEVEL": "WARNING",
+    })
+    return env
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    server, base_url = start_fake_openai_server(FakeServerConfig(ttft=0.0, token_delay=0.0, embedding_dimensions=args.dimensions))
+    scales: List[Dict[str, Any]] = []
+    try:
+        for posts in args.scales:
+            print(f"Benchmarking {posts} posts...", file=sys.stderr)
+            workdir = tempfile.mkdtemp(prefix=f"calcularte-retrieval-{posts}-")
+            command = [
+                sys.executable, "-m", "scripts.retrieval_benchmark", "--run-scale", str(posts),
+                "--dimensions", str(args.dimensions), "--queries", str(args.queries), "--n-results", str(args.n_results),
+                "--batch-size", str(args.batch_size), "--per-post-sample", str(args.per_post_sample), "--seed", str(args.seed),
+            ]
+            if args.legacy_schema:
+                command.append("--legacy-schema")
+            try:
+                completed = subprocess.run(command, cwd=workdir, env=_child_env(base_url, workdir), capture_output=True, text=True, timeout=args.timeout)
+                if completed.returncode == 0:
+                    scales.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+                else:
+                    scales.append({"posts": posts, "error": completed.stderr[-2000:]})
+            except subprocess.TimeoutExpired:
+                scales.append({"posts": posts, "error": f"timed out after {args.timeout}s"})
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        server.shutdown()
+    config = {"dimensions": args.dimensions, "queries": args.queries, "n_results": args.n_results, "seed": args.seed, "legacy_schema": args.legacy_schema}
+    return {"config": config, "scales": scales}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000], help="Profile sizes, in posts.")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Embedding dimensions.")
+    parser.add_argument("--queries", type=int, default=20, help="Timed runs per query type.")
+    parser.add_argument("--n-results", type=int, default=20, help="`n_results` of each query.")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Posts per bulk add (capped by ChromaDB's maximum).")
+    parser.add_argument("--per-post-sample", type=int, default=1000, help="Posts added one at a time to measure per-post ingest.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--legacy-schema", action="store_true", help="Store posts in collection schema 1, to compare with the current one.")
+    parser.add_argument("--timeout", type=float, default=7200.0, help="Seconds before a scale is abandoned.")
+    parser.add_argument("--output", help="Also write the report to this file.")
+    parser.add_argument("--run-scale", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scale:
+        print(json.dumps(run_scale(args)))
+        return
+
+    report = run_benchmark(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Generates a synthetic Instagram profile scrape, in the format of
+dataset_instagram_calcularte_profile.jsonl, for testing retrieval at scale (10k, 100k, 1M
+posts). Output is deterministic for a given `--seed` and needs no network.
+
+Captions are assembled from per-pillar Portuguese openers, bodies and calls to action, so
+their lengths, emojis and hashtags look like the real profile; about 2% are reposts of an
+earlier caption with a new ending. With `--embeddings`, a matching `.npy` matrix
+(float32, one unit-length row per post, in file order) is written too: posts of the same
+pillar and template cluster together and reposts sit next to their original, so
+similarity-based code (near-duplicate collapsing, MMR, HNSW) sees realistic structure.
+
+Usage:
+    python -m scripts.synthetic_profile --posts 100000 --output synthetic_100k.jsonl --embeddings synthetic_100k.npy
+"""
+import argparse
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+PILLARS: Dict[str, Dict[str, List[str]]] = {
+    "Precificação": {
+        "openers": [
+            "💰 Você sabe quanto vale a sua hora de trabalho?",
+            "Preço justo não é chute! 🎯",
+            "Quanto custa, de verdade, cada peça que você produz?",
+            "Vender muito e não ver o dinheiro sobrar? 🤔",
+        ],
+        "bodies": [
+            "Na hora de precificar, some os materiais, a sua mão de obra, os custos fixos e a margem de lucro. Esquecer qualquer um deles é trabalhar de graça.",
+            "Muitas artesãs copiam o preço da concorrência e acabam pagando para trabalhar. Cada negócio tem custos diferentes, e o seu preço precisa refletir os seus.",
+            "Dividir os custos fixos do mês pelo número de peças produzidas mostra quanto cada produto precisa cobrir antes de gerar lucro.",
+        ],
+    },
+    "Organização Financeira": {
+        "openers": [
+            "💡 Você tem clareza dos números do seu negócio?",
+            "Separar o dinheiro da casa do dinheiro do ateliê muda tudo! 🏠➡️🧵",
+            "Fluxo de caixa parece complicado? Não precisa ser.",
+        ],
+        "bodies": [
+            "Registrar cada venda e cada compra é o primeiro passo para saber se o negócio dá lucro. Sem números, as decisões viram palpite.",
+            "Defina um pró-labore fixo e pague a si mesma todo mês. O que sobra fica no caixa do negócio para investir e cobrir imprevistos.",
+            "Acompanhar os gráficos de faturamento mês a mês mostra as épocas fortes e fracas e ajuda a planejar as compras de material.",
+        ],
+    },
+    "Humor": {
+        "openers": [
+            "Quem nunca comprou material \"só para testar\" e lotou o ateliê? 😂",
+            "A cliente: \"faz um descontinho?\" Eu, olhando a planilha de custos: 🙃",
+            "Artesã em dezembro: dorme? Não conheço. 😅",
+        ],
+        "bodies": [
+            "Marca aqui aquela amiga que também tem uma gaveta inteira de fitas, papéis e tecidos que ainda vão virar alguma coisa.",
+            "Rir é o melhor remédio, mas organizar os pedidos é o que garante as noites de sono na alta temporada.",
+        ],
+    },
+    "Empatia/Motivação": {
+        "openers": [
+            "Empreender sozinha cansa, e tudo bem admitir isso. 💛",
+            "Cada peça que sai das suas mãos carrega uma história. ✨",
+            "Se hoje foi difícil, lembre do porquê você começou.",
+        ],
+        "bodies": [
+            "O artesanato é arte, mas também é negócio. Valorizar o seu trabalho começa por cobrar o que ele realmente vale.",
+            "Pequenos passos todos os dias constroem um negócio sólido. Comemore cada venda e cada cliente que volta.",
+        ],
+    },
+    "Produto/Funcionalidade": {
+        "openers": [
+            "Conhece o controle de estoque do Calcularte? 📦",
+            "Novidade no app! 🚀",
+            "Seus pedidos organizados em um só lugar. 📋",
+        ],
+        "bodies": [
+            "Com o Calcularte você cadastra materiais, calcula o preço de cada produto e acompanha os pedidos, o estoque e o financeiro em um só lugar.",
+            "Os relatórios mostram quanto você vendeu, quanto foi para custos e quanto virou lucro, tudo com gráficos fáceis de entender.",
+        ],
+    },
+    "Sazonalidade": {
+        "openers": [
+            "Dia das Mães chegando! 🌷 Seu estoque está preparado?",
+            "Natal é a época mais movimentada do ano para o artesanato. 🎄",
+            "Volta às aulas: hora de caprichar na papelaria personalizada! ✏️",
+        ],
+        "bodies": [
+            "Planeje a produção com antecedência, calcule a quantidade de material e defina prazos de entrega realistas para não perder vendas.",
+            "Datas comemorativas aumentam a procura. Revise seus preços antes da temporada para não vender no prejuízo.",
+        ],
+    },
+}
+
+CALLS_TO_ACTION = [
+    "Comece agora: www.calcularte.com.br (link na bio)",
+    "Salve este post para consultar depois! 📌",
+    "Conta aqui nos comentários como você faz! 👇",
+    "Compartilhe com uma amiga artesã que precisa ver isso.",
+    "Teste grátis por 7 dias, link na bio. 😉",
+]
+
+HASHTAGS = [
+    "calcularte", "artesanato", "mei", "sebrae", "precificação", "controlefinanceiro", "confeitaria",
+    "empreendedorismofeminino", "papelariapersonalizada", "costuracriativa", "cartonagem", "velasaromaticas",
+    "sublimação", "encadernaçãoartesanal", "feitoamão", "organização", "lucro", "artesãs",
+]
+
+POST_TYPES = ["Image", "Sidecar", "Video"]
+REPOST_RATE = 0.02
+START = datetime(2025, 6, 30, 12, tzinfo=timezone.utc)
+# A post a day, squeezed into at most 20 years for very large profiles.
+MAX_SPAN_HOURS = 20 * 365 * 24
+
+_PILLAR_NAMES = list(PILLARS)
+
+
+def _short_code(rng: np.random.Generator) -> str:
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-"
+    return "".join(alphabet[i] for i in rng.integers(0, len(alphabet), 11))
+
+
+def _caption(rng: np.random.Generator, pillar: str) -> Tuple[str, int, List[str]]:
+    """A caption, the index of its template (opener) and its hashtags."""
+    parts = PILLARS[pillar]
+    opener = int(rng.integers(len(parts["openers"])))
+    bodies = rng.choice(parts["bodies"], size=int(rng.integers(1, len(parts["bodies"]) + 1)), replace=False)
+    hashtags = ["calcularte"] + list(rng.choice(HASHTAGS[1:], size=int(rng.integers(3, 12)), replace=False))
+    caption = "\n\n".join([parts["openers"][opener], *bodies, CALLS_TO_ACTION[int(rng.integers(len(CALLS_TO_ACTION)))]])
+    caption += "\n\n" + " ".join(f"#{tag}" for tag in hashtags)
+    return caption, opener, hashtags
+
+
+def _post(rng: np.random.Generator, index: int, caption: str, hashtags: List[str], spacing_hours: float) -> Dict[str, Any]:
+    # Newest first, with some jitter around the average spacing.
+    timestamp = START - timedelta(hours=(index + float(rng.uniform(-0.4, 0.4))) * spacing_hours)
+    short_code = _short_code(rng)
+    post_id = str(3_000_000_000_000_000_000 + index)
+    image = f"https://scontent.cdninstagram.com/v/synthetic/{post_id}.jpg"
+    return {
+        "caption": caption,
+        "images": [image],
+        "hashtags": hashtags,
+        "type": POST_TYPES[int(rng.integers(len(POST_TYPES)))],
+        "inputUrl": "https://www.instagram.com/calcularte/",
+        "timestamp": timestamp.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "likesCount": int(rng.gamma(2.0, 20.0)),
+        "displayUrl": image,
+        "commentsCount": int(rng.poisson(2)),
+        "shortCode": short_code,
+        "id": post_id,
+        "url": f"https://www.instagram.com/p/{short_code}/",
+    }
+
+
+def generate_profile(num_posts: int, seed: int = 42, dimensions: int = 1536, chunk_size: int = 10_000) -> Iterator[Tuple[List[Dict[str, Any]], np.ndarray]]:
+    """
+    Yields the profile in chunks of (posts, embeddings), newest post first. Embeddings are
+    float32 unit vectors: a pillar direction, plus a template direction, plus noise.
+    """
+    rng = np.random.default_rng(seed)
+    pillar_vectors = rng.standard_normal((len(_PILLAR_NAMES), dimensions)).astype(np.float32)
+    template_vectors = {
+        pillar: rng.standard_normal((len(PILLARS[pillar]["openers"]), dimensions)).astype(np.float32)
+        for pillar in _PILLAR_NAMES
+    }
+    recent: List[Tuple[str, List[str], np.ndarray]] = []
+    spacing_hours = min(24.0, MAX_SPAN_HOURS / max(1, num_posts))
+
+    for start in range(0, num_posts, chunk_size):
+        count = min(chunk_size, num_posts - start)
+        posts, vectors = [], np.empty((count, dimensions), dtype=np.float32)
+        noise = rng.standard_normal((count, dimensions)).astype(np.float32)
+        for offset in range(count):
+            if recent and rng.random() < REPOST_RATE:
+                # A repost: the same caption with a new call to action, right next to the original.
+                caption, hashtags, original = recent[int(rng.integers(len(recent)))]
+                caption = caption + "\n\n" + CALLS_TO_ACTION[int(rng.integers(len(CALLS_TO_ACTION)))]
+                vector = original + 0.05 * noise[offset]
+            else:
+                pillar_index = int(rng.integers(len(_PILLAR_NAMES)))
+                pillar = _PILLAR_NAMES[pillar_index]
+                caption, template, hashtags = _caption(rng, pillar)
+                vector = 0.8 * pillar_vectors[pillar_index] + 0.6 * template_vectors[pillar][template] + 0.9 * noise[offset]
+            vector /= np.linalg.norm(vector)
+            vectors[offset] = vector
+            posts.append(_post(rng, start + offset, caption, hashtags, spacing_hours))
+            recent.append((caption, hashtags, vector))
+            if len(recent) > 200:
+                recent.pop(0)
+        yield posts, vectors
+
+
+def write_profile(output: str, num_posts: int, seed: int = 42, embeddings: Optional[str] = None, dimensions: int = 1536) -> Dict[str, Any]:
+    """Writes the JSONL (and optionally the `.npy` embeddings) without holding the profile in memory."""
+    matrix = np.lib.format.open_memmap(embeddings, mode="w+", dtype=np.float32, shape=(num_posts, dimensions)) if embeddings else None
+    written = 0
+    with open(output, "w", encoding="utf-8") as f:
+        for posts, vectors in generate_profile(num_posts, seed=seed, dimensions=dimensions):
+            for post in posts:
+                f.write(json.dumps(post, ensure_ascii=False) + "\n")
+            if matrix is not None:
+                matrix[written:written + len(posts)] = vectors
+            written += len(posts)
+    if matrix is not None:
+        matrix.flush()
+    return {"posts": written, "output": output, "embeddings": embeddings, "dimensions": dimensions if embeddings else None, "seed": seed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=10_000)
+    parser.add_argument("--output", required=True, help="The JSONL file to write.")
+    parser.add_argument("--embeddings", help="Also write the embeddings to this .npy file.")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(json.dumps(write_profile(args.output, args.posts, seed=args.seed, embeddings=args.embeddings, dimensions=args.dimensions), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,28 @@
 import asyncio
 import chromadb
-from openai import OpenAI
 import os
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import date
 from agents import Agent, Runner, Session
+from src.db.post_index import CHROMA_PATH, COLLECTION_NAME, get_by_ids, newest_post_ids, recover_interrupted_swap, requested_dimensions, to_sample
+from src.db.quantized_vectors import load_for_collection
 from src.utils.logging import log
+from src.utils.model_profiles import ModelProfile
+from src.utils.profiling import stage
+from src.utils.rate_limiter import create_openai_client
+from src.utils.retrieval import collapse_near_duplicates, cosine_similarity, mmr_rerank, rank_by_brand_similarity
 
 # Load environment variables
 load_dotenv()
 
+# --- Retrieval Diversity Settings from .env ---
+MMR_ENABLED = os.getenv("MMR_ENABLED", "true").lower() == "true"
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", 0.5))
+MMR_FETCH_MULTIPLIER = int(os.getenv("MMR_FETCH_MULTIPLIER", 4))
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", 0.95))
+
 
 class PlannedPost(BaseModel):
     day_or_sequence: str  # e.g., "Monday", "Post 1"
@@ -37,12 +48,13 @@ class BrandVoiceReport(BaseModel):
     hashtag_strategy_summary: str
 
 class PostMetadata(BaseModel):
-    caption: str
-    hashtags: str
-    timestamp: str
-    likesCount: int
-    commentsCount: int
-    url: str
+    # Only engagement is always present: tool output projections (src/utils/tool_projections.py) drop the rest.
+    caption: Optional[str] = None
+    hashtags: Optional[str] = None
+    timestamp: Optional[str] = None
+    likesCount: int = 0
+    commentsCount: int = 0
+    url: Optional[str] = None
 
 class PostSample(BaseModel):
     caption: str
@@ -121,73 +133,162 @@ Instructions for Analysis:
 
 class BrandStrategistAgent:
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.chroma_client = chromadb.PersistentClient(path="./chroma_db")
-        self.collection_name = "calcularte_posts"
+        self.client = create_openai_client()
+        self.chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
+        self.collection_name = COLLECTION_NAME
+        self.connect_collection()
+
+    def connect_collection(self):
+        """(Re)connects to the brand voice collection, e.g. after an ingest in a long-lived process."""
         try:
+            # A migration that died between its two renames left the posts under a backup name.
+            recover_interrupted_swap(self.chroma_client, self.collection_name)
             self.collection = self.chroma_client.get_collection(name=self.collection_name)
             log.info(f"Successfully connected to ChromaDB collection: '{self.collection_name}'.")
         except Exception as e:
             log.warning(f"Collection '{self.collection_name}' not found. Please run data ingestion first. Error: {e}")
             self.collection = None
 
-    def get_embedding(self, text: str, model: str = os.getenv("OPENAI_EMBEDDING_MODEL")):
+    def _embed(self, texts: List[str], model: Optional[str] = None) -> List[List[float]]:
+        """Embeds `texts` in one request, at the embedding size the collection stores."""
+        dimensions = requested_dimensions(self.collection) if self.collection else None
+        extra = {"dimensions": dimensions} if dimensions else {}
+        with stage("embeddings"):
+            response = self.client.embeddings.create(
+                input=[text.replace("\n", " ") for text in texts], model=model or os.getenv("OPENAI_EMBEDDING_MODEL"), **extra
+            )
+        return [item.embedding for item in response.data]
+
+    def get_embedding(self, text: str, model: Optional[str] = None):
         """Generates an embedding for the given text."""
-        text = text.replace("\n", " ")
-        response = self.client.embeddings.create(input=[text], model=model)
-        return response.data[0].embedding
+        return self._embed([text], model)[0]
 
-    def query_brand_voice(self, query_text: str, n_results: int = 3) -> List[PostSample]:
+    def _nearest_posts(self, query_embeddings: List[List[float]], n_results: int, include: List[str]) -> Dict[str, Any]:
+        """
+        `collection.query` results (ids plus the `include` fields, one list per query). With
+        EMBEDDING_QUANTIZATION set, neighbours come from an exact scan of the quantized vectors
+        and only the other fields are read from Chroma.
+        """
+        store = load_for_collection(self.collection)
+        if store is None:
+            with stage("chroma"):
+                return self.collection.query(query_embeddings=query_embeddings, n_results=n_results, include=include)
+        with stage("quantized search"):
+            rows = store.search(query_embeddings, n_results)
+        results: Dict[str, Any] = {"ids": [[store.ids[row] for row in query_rows] for query_rows in rows]}
+        if 'embeddings' in include:
+            results['embeddings'] = [store.vectors(query_rows) for query_rows in rows]
+        fields = [field for field in include if field != 'embeddings']
+        for field in fields:
+            results[field] = []
+        with stage("chroma"):
+            for ids in results['ids']:
+                posts = get_by_ids(self.collection, ids, fields) if fields else {}
+                for field in fields:
+                    results[field].append(posts[field])
+        return results
+
+    def query_brand_voice(self, query_text: str, n_results: int = 3, diversify: Optional[bool] = None) -> List[PostSample]:
         """
         Queries the ChromaDB for content semantically similar to the query text.
         Returns the most relevant captions and their metadata.
+
+        When `diversify` is enabled (defaults to MMR_ENABLED), near-duplicate captions are
+        collapsed and semantic results are re-ranked with Maximal Marginal Relevance, so
+        the returned samples carry more distinct signal per prompt token.
         """
         if not self.collection:
             log.error("Brand voice collection not initialized. Cannot query.")
             return "Brand voice collection not initialized. Please ingest data."
 
-        log.debug(f"Querying brand voice with text: '{query_text}'")
+        if diversify is None:
+            diversify = MMR_ENABLED
+
+        log.debug(f"Querying brand voice with text: '{query_text}' (diversify={diversify})")
         
-        # If the query is a wildcard, we fetch all posts and sort by date.
+        # If the query is a wildcard, we find the newest posts from their metadata alone and
+        # fetch captions (and embeddings, to skip repeated captions) only for those.
         if query_text == "*":
-            log.info("Wildcard query detected. Fetching all posts and sorting by newest first.")
-            all_posts = self.collection.get(include=['documents', 'metadatas'])
-            if not all_posts or not all_posts.get('documents'):
+            log.info("Wildcard query detected. Fetching the newest posts.")
+            if diversify:
+                # Walk newest-first and skip captions that repeat an already-kept one, widening
+                # the window of candidates until enough distinct posts are found.
+                window = n_results * MMR_FETCH_MULTIPLIER
+                while True:
+                    with stage("chroma"):
+                        candidates = newest_post_ids(self.collection, window)
+                        embeddings = get_by_ids(self.collection, candidates, ['embeddings'])['embeddings']
+                    kept = collapse_near_duplicates(embeddings, threshold=DUPLICATE_THRESHOLD, limit=n_results)
+                    if len(kept) >= n_results or len(candidates) < window:
+                        break
+                    window *= 2
+                selected = [candidates[i] for i in kept]
+            else:
+                with stage("chroma"):
+                    selected = newest_post_ids(self.collection, n_results)
+            if not selected:
                 return []
 
-            combined_posts = [
-                {'caption': doc, 'metadata': meta}
-                for doc, meta in zip(all_posts['documents'], all_posts['metadatas'])
-            ]
-            sorted_posts = sorted(
-                combined_posts,
-                key=lambda p: p['metadata'].get('timestamp', '1970-01-01T00:00:00+0000'),
-                reverse=True
-            )
-            relevant_content = sorted_posts[:n_results]
+            with stage("chroma"):
+                posts = get_by_ids(self.collection, selected, ['documents', 'metadatas'])
+            relevant_content = [to_sample(document, metadata) for document, metadata in zip(posts['documents'], posts['metadatas'])]
         else:
-            # For semantic search, use the original query method.
+            # For semantic search, over-fetch candidates when diversifying so MMR has room to choose.
             query_embedding = self.get_embedding(query_text)
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results,
-                include=['documents', 'metadatas']
-            )
+            fetch_k = n_results * MMR_FETCH_MULTIPLIER if diversify else n_results
+            include = ['documents', 'metadatas', 'embeddings'] if diversify else ['documents', 'metadatas']
+            results = self._nearest_posts([query_embedding], fetch_k, include)
             relevant_content = []
             if results and results['documents']:
-                for i in range(len(results['documents'][0])):
-                    content = {
-                        "caption": results['documents'][0][i],
-                        "metadata": results['metadatas'][0][i]
-                    }
-                    relevant_content.append(content)
+                documents = results['documents'][0]
+                metadatas = results['metadatas'][0]
+                selected = range(len(documents))
+                if diversify and len(documents) > 0:
+                    embeddings = results['embeddings'][0]
+                    unique = collapse_near_duplicates(embeddings, threshold=DUPLICATE_THRESHOLD)
+                    reranked = mmr_rerank(
+                        query_embedding,
+                        [embeddings[i] for i in unique],
+                        k=n_results,
+                        lambda_mult=MMR_LAMBDA,
+                    )
+                    selected = [unique[i] for i in reranked]
+                    log.debug(f"MMR kept {len(selected)} of {len(documents)} candidates ({len(documents) - len(unique)} near-duplicates collapsed).")
+
+                for i in selected:
+                    relevant_content.append(to_sample(documents[i], metadatas[i]))
 
         log.debug(f"Found {len(relevant_content)} relevant documents.")
         return relevant_content
 
-    def get_specialized_context(self, context_type: str, query: str, num_samples: int = 3) -> List[str]:
+    def max_corpus_similarity(self, text: str) -> Optional[float]:
+        """Cosine similarity between `text` and the closest post in the collection, or None without a collection."""
+        if not self.collection:
+            return None
+        embedding = self.get_embedding(text)
+        results = self._nearest_posts([embedding], 1, ['embeddings'])
+        if not results or results.get('embeddings') is None or len(results['embeddings'][0]) == 0:
+            return None
+        return cosine_similarity(embedding, results['embeddings'][0][0])
+
+    def rank_candidates(self, texts: List[str], n_neighbours: int = 5, max_similarity: float = 0.95) -> Optional[List[int]]:
+        """
+        Ranks alternative drafts by similarity to their nearest posts in the collection (see
+        `rank_by_brand_similarity`), best first. Embeds all drafts in one request. Returns
+        None without a collection.
+        """
+        if not self.collection or not texts:
+            return None
+        embeddings = self._embed(texts)
+        results = self._nearest_posts(embeddings, n_neighbours, ['embeddings'])
+        if not results or results.get('embeddings') is None:
+            return None
+        return rank_by_brand_similarity(embeddings, results['embeddings'], max_similarity=max_similarity)
+
+    def get_specialized_context(self, context_type: str, query: str, num_samples: int = 3, diversify: Optional[bool] = None) -> List[str]:
         """
         Retrieves specialized context from the vector database based on a type and query.
+        Results are diversified the same way as `query_brand_voice`.
         """
         if not self.collection:
             log.error("Brand voice collection not initialized. Cannot get specialized context.")
@@ -197,7 +298,7 @@ class BrandStrategistAgent:
         specialized_query = f"Find examples of '{context_type}' related to the topic: '{query}'"
         log.info(f"Fetching specialized context with query: '{specialized_query}'")
         
-        results = self.query_brand_voice(specialized_query, n_results=num_samples)
+        results = self.query_brand_voice(specialized_query, n_results=num_samples, diversify=diversify)
 
         # Return only the captions for focused context
         captions = [item['caption'] for item in results if 'caption' in item]
@@ -251,6 +352,15 @@ class BrandStrategistAgent:
         Generates an unconventional or surprising angle for a given content pillar,
         considering the overall brand voice.
         """
+        wildcard_angle = self.wildcard_angle_response(pillar, brand_voice_report).output_text.strip()
+        log.debug(f"Generated wildcard angle: '{wildcard_angle}'")
+        return wildcard_angle
+
+    def wildcard_angle_response(self, pillar: str, brand_voice_report: str, profile: Optional[ModelProfile] = None):
+        """
+        The raw Responses API response behind `propose_wildcard_angle` (for its usage). A model
+        profile overrides the model and the default temperature and output limit.
+        """
         log.info(f"Generating wildcard angle for pillar: '{pillar}'")
         
         instructions = """
@@ -275,17 +385,18 @@ class BrandStrategistAgent:
         Return only the single sentence describing the angle.
         """
         
-        response = self.client.responses.create(
-            model=os.getenv("OPENAI_MODEL"),
+        options = {
+            "temperature": 1.1, # Higher temperature for more creativity
+            "max_output_tokens": 5000,
+        }
+        if profile:
+            options.update(profile.request_options())
+        return self.client.responses.create(
+            model=(profile.model if profile and profile.model else None) or os.getenv("OPENAI_MODEL"),
             instructions=instructions,
             input=user_input,
-            temperature=1.1, # Higher temperature for more creativity
-            max_output_tokens=5000,
+            **options,
         )
-        
-        wildcard_angle = response.output_text.strip()
-        log.debug(f"Generated wildcard angle: '{wildcard_angle}'")
-        return wildcard_angle
 
 
 if __name__ == "__main__":
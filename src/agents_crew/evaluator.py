@@ -31,7 +31,7 @@ Judge the content against these core Calcularte principles:
 - **Is there a clear connection to Calcularte's solution?**
 
 Your evaluation must be rigorous. Follow these rules:
-1.  **Never approve on the first try.** Always find at least one area for improvement in the initial submission to encourage refinement.
+1.  **Judge on merit.** Content reaches you only after passing automated checks for length, hashtags, call to action, language and originality, so do not re-check those. Approve content that meets the principles; ask for improvements only when you can name them specifically.
 2.  **Provide actionable feedback.** If the content 'needs_improvement', your feedback must be specific, constructive, and clearly explain what needs to change to meet the brand standards.
 3.  **Avoid perfectionism.** After one or two rounds of feedback, if the content is good enough and aligns well with the brand, approve it. Do not get stuck in endless loops of minor tweaks.
 4.  **Output format:** Your response must be a single JSON object that conforms to the `EvaluationResult` model.
@@ -39,3 +39,21 @@ Your evaluation must be rigorous. Follow these rules:
     output_type=EvaluationResult,
     model=os.getenv("OPENAI_MODEL"),
 )
+
+
+class CandidateChoice(BaseModel):
+    reasoning: str = Field(description="A short comparison of the candidates against the brand principles.")
+    best_candidate: int = Field(description="The number of the best candidate, as numbered in the input (starting at 1).")
+
+candidate_selector_agent = Agent(
+    name="Candidate Selector Agent",
+    instructions="""
+You are the Candidate Selector Agent for 'Calcularte'. You receive several alternative versions of the same piece of content (e.g., a caption or a set of post ideas), numbered from 1, each written independently for the same brief.
+
+Compare them against the Calcularte principles: empathy with a real pain point of the 'Calculover', didactic value, empowerment, and a clear connection to Calcularte's solution. Prefer the candidate that delivers the most genuine value in the brand's voice; do not reward length for its own sake.
+
+You pick exactly one candidate; you do not edit or merge them. Keep your reasoning brief and answer with a single JSON object that conforms to the `CandidateChoice` model.
+""",
+    output_type=CandidateChoice,
+    model=os.getenv("OPENAI_MODEL"),
+)
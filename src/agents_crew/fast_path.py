@@ -0,0 +1,212 @@
+"""
+Fast path for requests whose tool sequence is known in advance (a caption, a content plan
+for N posts, ideas for a pillar, a refinement of the last caption). Instead of letting the
+Maestro spend LLM turns deciding the obvious, a fixed pipeline runs the same tools
+directly. Everything else still goes to the Maestro.
+
+Intents are recognized by rules first (src/agents_crew/intent_classifier.py); with
+FAST_PATH_MODEL_CLASSIFIER, unmatched requests get one call to a small classifier model.
+Each pipeline stores its steps in the session as tool calls and outputs, exactly as a Maestro
+turn would, so history lookups and later refinements see them.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from agents import RunContextWrapper
+from agents.memory import SessionABC
+from agents.tool_context import ToolContext
+from pydantic import BaseModel
+from src.agents_crew.brand_strategist import BrandContext, BrandVoiceReport, ContentPlan, PostSample, brand_reporter_agent, content_planner_agent
+from src.agents_crew.creative_director import GeneratedIdeas, creative_director_agent
+from src.agents_crew.intent_classifier import Intent, classify_by_rules, intent_classifier_agent, refers_to_earlier_turn
+from src.agents_crew.reviewer import reviewer_agent
+from src.agents_crew.run_context import MaestroContext
+from src.agents_crew.tools import (
+    Asset,
+    _best_of_n,
+    _caption_asset,
+    _idea_asset,
+    _ideas_prompt,
+    _render_ideas,
+    _run_agent_as_streaming_tool,
+    _search_current_session,
+    _store_assets,
+    _write_caption,
+    brand_strategist,
+)
+from src.utils import console
+from src.utils.logging import log
+from src.utils.profiling import profiler
+from src.utils.run_budget import BudgetExhausted, current_budget, partial_response
+
+load_dotenv()
+
+# --- Fast Path Settings from .env ---
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+FAST_PATH_MODEL_CLASSIFIER = os.getenv("FAST_PATH_MODEL_CLASSIFIER", "false").lower() == "true"
+FAST_PATH_DEFAULT_IDEAS = int(os.getenv("FAST_PATH_DEFAULT_IDEAS", 3))
+N_SAMPLE_POSTS = int(os.getenv("N_SAMPLE_POSTS", 100))
+
+
+@dataclass
+class _Turn:
+    """The steps of one fast-path turn, recorded as session items at the end."""
+    run_context: MaestroContext
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    started: Dict[str, float] = field(default_factory=dict)
+
+    def step(self, tool_name: str, arguments: Dict[str, Any]) -> ToolContext:
+        """A tool context for one pipeline step, so routing, usage and assets see the tool name."""
+        ctx = ToolContext(
+            context=self.run_context,
+            tool_name=tool_name,
+            tool_call_id=f"call_{uuid.uuid4().hex[:24]}",
+            tool_arguments=json.dumps(arguments, ensure_ascii=False),
+        )
+        self.started[ctx.tool_call_id] = time.perf_counter()
+        return ctx
+
+    def record(self, ctx: ToolContext, output: Any):
+        profiler.record(f"tool: {ctx.tool_name}", self.started.pop(ctx.tool_call_id, time.perf_counter()))
+        text = output.model_dump_json() if isinstance(output, BaseModel) else str(output)
+        self.items.append({"type": "function_call", "call_id": ctx.tool_call_id, "name": ctx.tool_name, "arguments": ctx.tool_arguments})
+        self.items.append({"type": "function_call_output", "call_id": ctx.tool_call_id, "output": text})
+
+
+async def classify(prompt: str, run_context: MaestroContext) -> Optional[Intent]:
+    """The intent of a request, or None when it should go to the Maestro."""
+    intent = classify_by_rules(prompt)
+    if intent is None and FAST_PATH_MODEL_CLASSIFIER:
+        ctx = ToolContext(context=run_context, tool_name="classify_intent", tool_call_id="classify", tool_arguments="{}")
+        try:
+            intent = await _run_agent_as_streaming_tool(intent_classifier_agent, prompt, ctx, echo=False)
+        except Exception as e:
+            log.warning(f"Intent classification failed ({e}). Handing the request to the Maestro.")
+            return None
+    if intent is None or intent.kind == "other" or (intent.kind != "plan" and not intent.topic.strip()):
+        return None
+    if intent.kind in ("caption", "ideas") and refers_to_earlier_turn(intent.topic):
+        return None
+    return intent
+
+
+# --- Pipeline steps ---
+
+async def _brand_context(turn: _Turn) -> Optional[BrandContext]:
+    """The Maestro's standard context package: the newest brand posts and a brand voice report."""
+    budget = current_budget()
+    num_samples = budget.shrink(N_SAMPLE_POSTS) if budget else N_SAMPLE_POSTS
+    samples = await asyncio.to_thread(brand_strategist.query_brand_voice, "*", num_samples)
+    if not isinstance(samples, list) or not samples:
+        log.warning("No brand posts to build the context package from. Continuing without it.")
+        return None
+    post_samples = [PostSample.model_validate(sample) for sample in samples]
+    ctx = turn.step("generate_brand_voice_report", {"post_samples": len(post_samples)})
+    analysis_input = f"Here are the post samples to analyze:\n{ [sample.model_dump_json() for sample in post_samples] }"
+    report: BrandVoiceReport = await _run_agent_as_streaming_tool(brand_reporter_agent, analysis_input, ctx)
+    return BrandContext(report=report, samples=post_samples)
+
+
+async def _ideas(turn: _Turn, ideas_input: str, brand_context: Optional[BrandContext]) -> GeneratedIdeas:
+    ctx = turn.step("generate_creative_ideas", {"ideas_input": ideas_input})
+    ideas: GeneratedIdeas = await _best_of_n(ctx, creative_director_agent, _ideas_prompt(ideas_input, brand_context), "ideas", render=_render_ideas)
+    await _store_assets(ctx, [_idea_asset(idea, "generate_creative_ideas") for idea in ideas.ideas])
+    turn.record(ctx, ideas)
+    return ideas
+
+
+# --- Pipelines ---
+
+async def _caption_pipeline(turn: _Turn, intent: Intent) -> str:
+    brand_context = await _brand_context(turn)
+    ideas = await _ideas(turn, f"Develop one creative post idea about: {intent.topic}", brand_context)
+    if not ideas.ideas:
+        return "The Creative Director returned no idea for this topic."
+    idea = ideas.ideas[0]
+    ctx = turn.step("write_post_caption", {"post_idea": idea.model_dump()})
+    caption = await _write_caption(ctx, idea, brand_context)
+    await _store_assets(ctx, [_caption_asset(idea, caption, "write_post_caption")])
+    turn.record(ctx, caption)
+    return f"Post Idea: {idea.title}\n\nGenerated Caption:\n{caption}"
+
+
+async def _ideas_pipeline(turn: _Turn, intent: Intent) -> str:
+    brand_context = await _brand_context(turn)
+    count = intent.count or FAST_PATH_DEFAULT_IDEAS
+    ideas = await _ideas(turn, f"Generate {count} creative post ideas about: {intent.topic}", brand_context)
+    blocks = [
+        f"{number}. {idea.title} ({idea.content_pillar}, {idea.suggested_format})\n{idea.defense_of_idea}\nExpected results: {idea.expected_results}"
+        for number, idea in enumerate(ideas.ideas, start=1)
+    ]
+    return "Generated Ideas:\n\n" + "\n\n".join(blocks)
+
+
+async def _plan_pipeline(turn: _Turn, intent: Intent) -> str:
+    plan_input = await asyncio.to_thread(brand_strategist.get_context_for_content_plan, None, intent.count)
+    ctx = turn.step("propose_content_plan", {"plan_input": plan_input})
+    plan: ContentPlan = await _run_agent_as_streaming_tool(content_planner_agent, plan_input, ctx)
+    await _store_assets(ctx, [Asset("content_plan", plan.model_dump_json(), tool_name="propose_content_plan")])
+    turn.record(ctx, plan)
+    lines = [f"- {post.day_or_sequence} | {post.pillar}: {post.reasoning}" for post in plan.plan]
+    return "Content Plan:\n" + "\n".join(lines)
+
+
+async def _refine_pipeline(turn: _Turn, intent: Intent) -> Optional[str]:
+    matches = await _search_current_session(RunContextWrapper(turn.run_context), asset_types=("revision", "caption"), limit=1)
+    if not matches:
+        log.info("No caption in this session to refine. Handing the request to the Maestro.")
+        return None
+    original = matches[0]["body"]
+    brand_context = await _brand_context(turn)
+    revision_input = f"Original content:\n{original}\n\nUser feedback:\n{intent.topic}"
+    if brand_context:
+        revision_input += f"\n\nBrand context:\n{brand_context.model_dump_json()}"
+    ctx = turn.step("refine_creative_content", {"revision_input": f"Original content:\n{original}\n\nUser feedback:\n{intent.topic}"})
+    revision = await _run_agent_as_streaming_tool(reviewer_agent, revision_input, ctx)
+    await _store_assets(ctx, [Asset("revision", revision, tool_name="refine_creative_content")])
+    turn.record(ctx, revision)
+    return f"Revised Content:\n{revision}"
+
+
+PIPELINES = {
+    "caption": _caption_pipeline,
+    "ideas": _ideas_pipeline,
+    "plan": _plan_pipeline,
+    "refine": _refine_pipeline,
+}
+
+
+async def run_fast_path(prompt: str, session: Optional[SessionABC], db_path: str) -> Optional[str]:
+    """
+    Runs the request through its fixed pipeline and returns the final response, or None when
+    the request is not a known intent (or a pipeline cannot apply), in which case nothing
+    was stored and the caller should run the Maestro.
+    """
+    if not FAST_PATH_ENABLED:
+        return None
+    run_context = MaestroContext(session=session, db_path=db_path)
+    intent = await classify(prompt, run_context)
+    if intent is None:
+        return None
+    log.info(f"Fast path: '{intent.kind}' request (topic: '{intent.topic[:80]}', count: {intent.count}). Skipping the Maestro.")
+    console.echo(f"Fast path: {intent.kind}")
+
+    turn = _Turn(run_context)
+    try:
+        final_output = await PIPELINES[intent.kind](turn, intent)
+    except BudgetExhausted as e:
+        # The steps that finished are still stored, and the response lists what they produced.
+        log.warning(f"Fast path stopped by the run budget: {e}")
+        final_output = partial_response(current_budget())
+    if final_output is None:
+        return None
+    if session is not None:
+        await session.add_items(
+            [{"role": "user", "content": prompt}] + turn.items + [{"role": "assistant", "content": final_output}]
+        )
+    return final_output
@@ -0,0 +1,123 @@
+import os
+import re
+from dotenv import load_dotenv
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional, Pattern, Tuple
+from agents import Agent
+
+load_dotenv()
+
+IntentKind = Literal["caption", "plan", "ideas", "refine", "other"]
+
+class Intent(BaseModel):
+    kind: IntentKind = Field(description="'caption', 'plan', 'ideas', 'refine', or 'other' for anything else.")
+    topic: str = Field(default="", description="The subject, content pillar or feedback the request is about, as the user wrote it.")
+    count: Optional[int] = Field(default=None, description="The number of posts or ideas requested, if the user gave one.")
+
+# --- Rules ---
+# Each rule matches a whole request, so requests with extra instructions ("... and then ...")
+# fall through to the Maestro. Patterns cover Portuguese and English phrasings. Caption and
+# ideas requests either start with an imperative verb or are a bare noun phrase
+# ("legenda sobre gatos"); see `classify_by_rules` for what a bare phrase may contain.
+
+_POLITE = r"(?:(?:por favor|please|pode|poderia|can you|could you)[,\s]+)?"
+_COUNT = r"(?P<count>\d{1,2})"
+
+INTENT_RULES: List[Tuple[IntentKind, Pattern]] = [
+    ("plan", re.compile(
+        rf"^{_POLITE}(?:crie|cria|faça|faz|monte|gere|create|make|build|draft)?\s*(?:um|uma|a|an)?\s*"
+        rf"(?:plano|planejamento|calend[aá]rio|plan|calendar)(?:\s+(?:de conte[uú]do|editorial|content))?\s+"
+        rf"(?:(?:com|de|para|for|with|of)\s+)?{_COUNT}\s+(?:posts?|publica[çc](?:ão|ões|ao|oes))\W*$",
+        re.IGNORECASE,
+    )),
+    ("plan", re.compile(
+        rf"^{_POLITE}(?:planeje|planejar|planeja|plan)\s+(?:os\s+|the\s+)?(?:pr[oó]ximos\s+|next\s+)?{_COUNT}\s+"
+        rf"(?:posts?|publica[çc](?:ão|ões|ao|oes))\W*$",
+        re.IGNORECASE,
+    )),
+    ("ideas", re.compile(
+        rf"^{_POLITE}(?:(?P<verb>(?:me\s+)?(?:d[eê]|gere|crie|cria|faça|faz|sugira|traga|liste|give me|generate|create|make|suggest|brainstorm|list))\s+)?"
+        rf"(?P<article>(?:umas|algumas|some|the)\s+)?(?:{_COUNT}\s+)?(?:ideias?|ideas?)(?:\s+(?:de\s+)?posts?)?\s+"
+        rf"(?:sobre|para o pilar|do pilar|para|about|for the pillar|for|on)\s+(?P<topic>.+?)\W*$",
+        re.IGNORECASE,
+    )),
+    ("caption", re.compile(
+        rf"^{_POLITE}(?:(?P<verb>escreva|escreve|crie|cria|gere|faça|faz|write|create|make|generate)\s+)?(?P<article>(?:uma|a|the)\s+)?(?:legenda|caption)\s+"
+        rf"(?:sobre|para|about|for|on)\s+(?P<topic>.+?)\W*$",
+        re.IGNORECASE,
+    )),
+    ("refine", re.compile(
+        r"^(?:refine|revise|reescreva|rewrite|melhore|improve|ajuste|deixe|make|torne)\b.*"
+        r"\b(?:(?:[uú]ltima|essa|esta|a)\s+legenda|legenda\s+anterior|(?:the\s+)?(?:last|previous|that)\s+caption)\b.*$",
+        re.IGNORECASE,
+    )),
+]
+
+
+# A request that asks for more than the pipeline does ("... and then the images") is a brief
+# for the Maestro, as is a long or multi-line one.
+MULTI_STEP_PATTERN = re.compile(
+    r"\b(?:e depois|e então|e tamb[eé]m|al[eé]m disso|em seguida|and then|and also|then|imagens?|images?|prompts?|carross[eé]is|carousels?)\b|;",
+    re.IGNORECASE,
+)
+RULE_MAX_CHARS = 200
+
+# A topic that points at earlier turns ("isso", "it", "o tema anterior") only makes sense with
+# the conversation history, which the fast path does not read.
+REFERENCE_TOPIC_PATTERN = re.compile(
+    r"^(?:(?:o|a|os|as|the)\s+)?(?:isso|isto|aquilo|esse|essa|esses|essas|este|esta|estes|estas|"
+    r"it|that|this|these|those|them)\b|\b(?:anterior(?:es)?|previous|above|acima|mesmo tema|same topic|last one)\b",
+    re.IGNORECASE,
+)
+# Without a leading verb, a caption or ideas request is a bare noun phrase. Punctuation or a
+# verb after the topic makes it a remark ("a legenda sobre gatos ficou ótima, obrigado").
+REMARK_PATTERN = re.compile(
+    r"[,.!?]|\b(?:ficou|ficaram|est[aá]|estava|foi|[eé]|s[aã]o|was|is|are|looks?|looked|"
+    r"obrigad[oa]s?|valeu|thanks|thank you|gostei|adorei|loved|liked)\b",
+    re.IGNORECASE,
+)
+
+
+def refers_to_earlier_turn(topic: str) -> bool:
+    """Whether the request's subject is a reference to earlier messages rather than a subject."""
+    return bool(REFERENCE_TOPIC_PATTERN.search(topic.strip()))
+
+
+def classify_by_rules(prompt: str) -> Optional[Intent]:
+    """The request's intent when a rule recognizes it, or None for open-ended requests."""
+    text = " ".join(prompt.split())
+    if "\n" in prompt.strip() or len(text) > RULE_MAX_CHARS or MULTI_STEP_PATTERN.search(text):
+        return None
+    for kind, pattern in INTENT_RULES:
+        match = pattern.match(text)
+        if not match:
+            continue
+        groups = match.groupdict()
+        count = int(groups["count"]) if groups.get("count") else None
+        # A refinement's "topic" is the feedback itself.
+        topic = text if kind == "refine" else (groups.get("topic") or "").strip()
+        if kind in ("caption", "ideas"):
+            if refers_to_earlier_turn(topic):
+                return None
+            # "a legenda sobre ..." names something that already exists; a bare request has no article.
+            if not groups.get("verb") and (groups.get("article") or REMARK_PATTERN.search(topic)):
+                return None
+        return Intent(kind=kind, topic=topic, count=count)
+    return None
+
+
+intent_classifier_agent = Agent(
+    name="Intent Classifier Agent",
+    instructions="""
+You classify a request to Calcularte's content assistant into one of these intents:
+- 'caption': write one caption about a given subject.
+- 'plan': a content plan for a given number of posts.
+- 'ideas': post ideas about a given subject or content pillar.
+- 'refine': revise the last caption according to feedback.
+- 'other': anything else, including complete posts, image prompts, reports, questions, and any request with several steps or extra constraints.
+
+When in doubt, answer 'other'. Answer 'other' as well when the subject refers to earlier messages ("isso", "esse tema", "it", "the previous topic") instead of naming one. Copy the subject (or, for 'refine', the whole request) into `topic` without rewriting it. Do not explain; answer with the `Intent` JSON object only.
+""",
+    output_type=Intent,
+    model=os.getenv("OPENAI_MODEL"),
+)
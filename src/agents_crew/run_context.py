@@ -0,0 +1,13 @@
+from dataclasses import dataclass
+from typing import Optional
+from agents.memory import SessionABC
+
+
+@dataclass
+class MaestroContext:
+    """
+    The run context of a Maestro turn, available to tools as `ctx.context`: the session the
+    turn belongs to and the database it is stored in.
+    """
+    session: Optional[SessionABC] = None
+    db_path: Optional[str] = None
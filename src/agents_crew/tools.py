@@ -1,7 +1,9 @@
 import asyncio
-import typer
+import os
+import sqlite3
+import time
 from datetime import date
-from typing import Optional, List, Any, Dict
+from typing import Optional, List, Any, Awaitable, Dict, Callable, TypeVar
 
 from agents import function_tool, RunContextWrapper, Runner
 from src.agents_crew.brand_strategist import (
@@ -15,11 +17,53 @@ from src.agents_crew.brand_strategist import (
 )
 from src.agents_crew.creative_director import creative_director_agent, GeneratedIdeas, PostIdea
 from src.agents_crew.copywriter import copywriter_agent
+from src.agents_crew.evaluator import CandidateChoice, EvaluationResult, candidate_selector_agent, evaluator_agent
 from src.agents_crew.art_director import art_director_agent, GeneratedImagePrompts
 from src.agents_crew.reviewer import reviewer_agent
+from src.agents_crew.run_context import MaestroContext
 from src.agents_crew.session_analyst import session_analyst_agent
+from src.db.asset_store import ASSET_DB_FILE, ASSET_STORE_ENABLED, Asset, content_hash, get_verdict, save_assets, save_verdict
+from src.db.session_db import search_session
+from src.db.session_search import ASSET_TYPES
+from src.db.usage_store import record_usage
+from src.utils import console
+from src.utils.context_packer import pack_brand_context
+from src.utils.hedging import (
+    AGENT_HEDGING_ENABLED,
+    AGENT_TTFT_TIMEOUT_SECONDS,
+    AgentDeadlineExceeded,
+    agent_deadline,
+    latency_tracker,
+    run_hedged,
+)
 from src.utils.logging import log
-from pydantic import BaseModel
+from src.utils.model_profiles import model_registry
+from src.utils.profiling import stage
+from src.utils.quality_checks import QUALITY_LOOP_ENABLED, QUALITY_MAX_CORPUS_SIMILARITY, QUALITY_MAX_ROUNDS, caption_issues, image_prompt_issues
+from src.utils.run_budget import BudgetExhausted, budget_degraded, charge_response_event, current_budget
+from src.utils.streaming_json import IncrementalArrayParser
+from src.utils.tool_projections import (
+    TOOL_PROJECTION_QUERY_BRAND_VOICE,
+    TOOL_PROJECTION_SPECIALIZED_CONTEXT,
+    get_projection,
+    project_captions,
+    project_samples,
+)
+from pydantic import BaseModel, ValidationError
+
+T = TypeVar("T")
+
+# --- Session History Settings from .env ---
+SESSION_ANALYST_EXCERPTS = int(os.getenv("SESSION_ANALYST_EXCERPTS", 8))
+SESSION_EXCERPT_MAX_CHARS = int(os.getenv("SESSION_EXCERPT_MAX_CHARS", 2000))
+
+# --- Wildcard Angle Settings from .env ---
+WILDCARD_REPORT_SAMPLES = int(os.getenv("WILDCARD_REPORT_SAMPLES", 20))  # newest posts behind the brand report
+
+# --- Best-of-N Settings from .env ---
+BEST_OF_N = int(os.getenv("BEST_OF_N", 1))  # 1 disables best-of-N
+BEST_OF_N_SELECTOR = os.getenv("BEST_OF_N_SELECTOR", "embedding").lower()  # "embedding" or "judge"
+BEST_OF_N_NEIGHBOURS = int(os.getenv("BEST_OF_N_NEIGHBOURS", 5))
 
 # --- Pydantic Models for Tool Inputs ---
 class ArtDirectorInput(BaseModel):
@@ -27,45 +71,166 @@ class ArtDirectorInput(BaseModel):
     post_idea: PostIdea
     caption: str
 
+# --- Pydantic Models for Tool Outputs ---
+class CompletePost(BaseModel):
+    """A fully developed post: the original idea, its caption and its image prompts."""
+    idea: PostIdea
+    caption: str
+    image_prompts: GeneratedImagePrompts
+
+class CompletePosts(BaseModel):
+    posts: List[CompletePost]
+
+class SessionMatch(BaseModel):
+    """A piece of content found in the session history."""
+    asset_type: str
+    title: str
+    content: str
+    created_at: str
+
 # --- Instantiate Agents/Classes ---
 brand_strategist = BrandStrategistAgent()
 
 # --- Helper function for streaming sub-agents ---
-async def _run_agent_as_streaming_tool(agent, prompt, ctx):
-    """Helper to run an agent and stream its thoughts to the log."""
-    log.info(f"Maestro is calling a sub-agent: {agent.name}")
-    typer.echo(f"\n\n--- Calling {agent.name}... ---")
-    
+async def _stream_agent_run(agent, prompt, echo: bool = True, item_key: Optional[str] = None, on_item: Optional[Callable[[Dict[str, Any]], None]] = None):
+    """
+    Streams a single run of an agent, logging its thoughts.
+    Raises AgentDeadlineExceeded if no token arrives within the time-to-first-token watchdog.
+
+    If `item_key` and `on_item` are given, the streamed structured output is parsed
+    incrementally and `on_item` is called with each element of the `item_key` array
+    as soon as it is complete.
+
+    Returns the finished streamed run (its `final_output` and `context_wrapper.usage`).
+    """
     thought_buffer = "" # Buffer to accumulate thought chunks
+    item_parser = IncrementalArrayParser(item_key) if item_key and on_item else None
+    received_first_token = False
+    stalled = False
+    budget = current_budget()
 
     # The session is implicitly managed by the Runner when a tool is called.
     # We don't need to (and cannot) pass it explicitly here.
     result = Runner.run_streamed(agent, prompt)
-    
-    async for event in result.stream_events():
-        if event.type == "raw_response_event" and hasattr(event.data, 'delta') and event.data.delta:
-            # Accumulate the thought chunks
-            thought_buffer += event.data.delta
-            # Use typer.secho for direct, unformatted console output
-            typer.secho(event.data.delta, nl=False, fg="cyan")
-        
-        # Log the complete thought when a new run item is processed (signaling the end of a thought)
-        elif event.type == "run_item_stream_event":
-            if thought_buffer:
-                log.log("THOUGHT", thought_buffer.replace("{", "{{").replace("}", "}}"))
-                thought_buffer = "" # Reset buffer
-            
-            # If the item is a tool call, log it for clarity
-            if hasattr(event.item, 'type') and event.item.type == "tool_call_item":
-                typer.echo() # Newline for console
-                log.info(f"Sub-agent tool call: {event.item.raw_item.name} with args: {event.item.raw_item.arguments}")
+
+    async def first_token_watchdog():
+        nonlocal stalled
+        await asyncio.sleep(AGENT_TTFT_TIMEOUT_SECONDS)
+        if not received_first_token:
+            stalled = True
+            result.cancel()
+
+    watchdog = asyncio.ensure_future(first_token_watchdog())
+    try:
+        async for event in result.stream_events():
+            if event.type == "raw_response_event":
+                charge_response_event(event.data)
+            if event.type == "raw_response_event" and hasattr(event.data, 'delta') and event.data.delta:
+                received_first_token = True
+                # Accumulate the thought chunks
+                thought_buffer += event.data.delta
+                if item_parser:
+                    for item in item_parser.feed(event.data.delta):
+                        on_item(item)
+                # Direct, unformatted console output (streamed to the client when served by the daemon)
+                if echo:
+                    console.echo(event.data.delta, nl=False, fg="cyan")
+
+            # Log the complete thought when a new run item is processed (signaling the end of a thought)
+            elif event.type == "run_item_stream_event":
+                if thought_buffer:
+                    log.log("THOUGHT", thought_buffer.replace("{", "{{").replace("}", "}}"))
+                    thought_buffer = "" # Reset buffer
+
+                # If the item is a tool call, log it for clarity
+                if hasattr(event.item, 'type') and event.item.type == "tool_call_item":
+                    if echo:
+                        console.echo() # Newline for console
+                    log.info(f"Sub-agent tool call: {event.item.raw_item.name} with args: {event.item.raw_item.arguments}")
+
+            if budget is not None and budget.spent():
+                raise BudgetExhausted(f"The run budget ({budget.spent()}) was reached while {agent.name} was running.")
+    except BaseException:
+        # Stop the background run so an abandoned generation (deadline, lost hedge) does not keep streaming.
+        result.cancel()
+        raise
+    finally:
+        watchdog.cancel()
+
+    if stalled:
+        raise AgentDeadlineExceeded(f"{agent.name} produced no output within {AGENT_TTFT_TIMEOUT_SECONDS:g}s.")
 
     # Log any remaining thoughts in the buffer after the loop finishes
     if thought_buffer:
         log.log("THOUGHT", thought_buffer.replace("{", "{{").replace("}", "}}"))
 
-    typer.echo(f"\n--- {agent.name} finished. ---")
-    return result.final_output
+    return result
+
+async def _run_agent_as_streaming_tool(agent, prompt, ctx, hedge: Optional[bool] = None, echo: bool = True, item_key: Optional[str] = None, on_item: Optional[Callable[[Dict[str, Any]], None]] = None):
+    """
+    Helper to run an agent and stream its thoughts to the log.
+
+    Each run is bounded by a per-agent deadline and a time-to-first-token watchdog. With
+    hedging enabled (AGENT_HEDGING_ENABLED), a second identical run is fired once the first
+    exceeds the agent's p95 latency, and whichever finishes first wins. Runs that emit
+    items incrementally (`on_item`) are never hedged, so no item is emitted twice.
+
+    The agent runs with the model profile routed for it and the calling tool (see
+    src/utils/model_profiles.py), and its latency, tokens and cost are recorded.
+
+    Each run counts against the turn's budget (src/utils/run_budget.py): it raises
+    BudgetExhausted when the budget is spent, its deadline is capped by the budget's
+    remaining wall time, and a nearly spent budget switches it to the degraded profile
+    without hedging.
+    """
+    task = getattr(ctx, "tool_name", None)
+    budget = current_budget()
+    if budget is not None:
+        budget.start_agent_call(agent.name)
+    agent, profile = model_registry.configure(agent, task, budget.degraded_profile() if budget else None)
+    log.info(f"Maestro is calling a sub-agent: {agent.name}")
+    if echo:
+        console.echo(f"\n\n--- Calling {agent.name}... ---")
+
+    deadline = agent_deadline(agent.name)
+    remaining = budget.remaining_seconds() if budget else None
+    if remaining is not None:
+        deadline = min(deadline, remaining)
+    if hedge is None:
+        hedge = AGENT_HEDGING_ENABLED
+    if on_item or (budget and budget.degraded):
+        hedge = False
+    started = time.perf_counter()
+
+    async def attempt(is_hedge: bool):
+        # Only the primary run echoes to the console, so hedged output does not interleave.
+        return await asyncio.wait_for(
+            _stream_agent_run(agent, prompt, echo=echo and not is_hedge, item_key=item_key, on_item=on_item),
+            timeout=deadline,
+        )
+
+    try:
+        with stage(f"agent: {agent.name}"):
+            if hedge:
+                run = await run_hedged(attempt, latency_tracker.hedge_delay(agent.name))
+            else:
+                run = await attempt(False)
+    except AgentDeadlineExceeded as e:
+        # Checked first: it subclasses TimeoutError, which asyncio.TimeoutError aliases.
+        log.error(str(e))
+        raise
+    except asyncio.TimeoutError:
+        if budget is not None and budget.spent():
+            raise BudgetExhausted(f"The run budget ({budget.spent()}) was reached while {agent.name} was running.")
+        log.error(f"{agent.name} did not finish within its {deadline:g}s deadline.")
+        raise AgentDeadlineExceeded(f"{agent.name} did not finish within {deadline:g}s.")
+
+    elapsed = time.perf_counter() - started
+    latency_tracker.record(agent.name, elapsed)
+    await record_usage(getattr(ctx, "context", None), agent.name, profile, elapsed, run.context_wrapper.usage, task=task)
+    if echo:
+        console.echo(f"\n--- {agent.name} finished. ---")
+    return run.final_output
 
 # --- Define FunctionTools for BrandStrategistAgent ---
 
@@ -85,7 +250,7 @@ def get_context_for_content_plan(ctx: RunContextWrapper, time_frame: Optional[st
 
 
 @function_tool(name_override="get_specialized_context")
-def get_specialized_context(ctx: RunContextWrapper, context_type: str, query: str, num_samples: int = 3) -> List[str]:
+def get_specialized_context(ctx: RunContextWrapper, context_type: str, query: str, num_samples: int = 3, projection: Optional[str] = None) -> List[str]:
     """
     Retrieves highly focused, topic-specific examples (e.g., captions, post ideas) from the brand's memory to provide context for a creative task.
     
@@ -93,19 +258,25 @@ def get_specialized_context(ctx: RunContextWrapper, context_type: str, query: st
         context_type: The type of context to fetch (e.g., 'relevant captions').
         query: The specific topic to get context for.
         num_samples: The number of examples to retrieve.
+        projection: "compact" (shortened captions without hashtags or repeated paragraphs), "standard" (the same, uncut) or "full" (captions verbatim). Omit for the default.
     """
-    return brand_strategist.get_specialized_context(context_type, query, num_samples)
+    captions = brand_strategist.get_specialized_context(context_type, query, num_samples)
+    return project_captions(captions, get_projection(projection, TOOL_PROJECTION_SPECIALIZED_CONTEXT))
 
 @function_tool(name_override="query_brand_voice")
-def query_brand_voice(ctx: RunContextWrapper, query_text: str, n_results: int = 3) -> List[PostSample]:
+def query_brand_voice(ctx: RunContextWrapper, query_text: str, n_results: int = 3, projection: Optional[str] = None) -> List[PostSample]:
     """
     Performs a general semantic search on the brand's memory (vector database) to find relevant historical posts based on a query.
     
     Args:
         query_text: The text to search for.
         n_results: The number of results to return.
+        projection: "standard" (captions without hashtag blocks or repeated paragraphs; hashtags, date and engagement as metadata), "compact" (shortened captions and engagement only) or "full" (everything stored, including URLs). Omit for the default.
     """
-    return brand_strategist.query_brand_voice(query_text, n_results)
+    samples = brand_strategist.query_brand_voice(query_text, n_results)
+    if not isinstance(samples, list):
+        return samples
+    return project_samples(samples, get_projection(projection, TOOL_PROJECTION_QUERY_BRAND_VOICE))
 
 @function_tool(name_override="propose_wildcard_angle")
 async def propose_wildcard_angle(ctx: RunContextWrapper, pillar: str) -> str:
@@ -116,10 +287,16 @@ async def propose_wildcard_angle(ctx: RunContextWrapper, pillar: str) -> str:
     Args:
         pillar: The content pillar to generate a wildcard angle for.
     """
+    if budget_degraded():
+        log.info("Run budget nearly spent: skipping the wildcard angle.")
+        return "Skipped: the run budget is nearly spent. Continue without a wildcard angle."
     log.info(f"Wildcard tool invoked for pillar: '{pillar}'. Starting chained operation.")
     
     log.debug("Step 1: Getting samples for brand voice report.")
-    report_samples = brand_strategist.get_samples_for_brand_voice_report(post_samples=None)
+    samples = await asyncio.to_thread(brand_strategist.query_brand_voice, "*", WILDCARD_REPORT_SAMPLES)
+    if not isinstance(samples, list):
+        return str(samples)
+    report_samples = f"Here are the post samples to analyze:\n{ [PostSample.model_validate(sample).model_dump_json() for sample in samples] }"
     
     log.debug("Step 2: Generating brand voice report to use as context.")
     report: BrandVoiceReport = await _run_agent_as_streaming_tool(brand_reporter_agent, report_samples, ctx)
@@ -127,8 +304,245 @@ async def propose_wildcard_angle(ctx: RunContextWrapper, pillar: str) -> str:
     report_str = report.model_dump_json(indent=2)
 
     log.debug("Step 3: Calling propose_wildcard_angle with the generated report.")
-    return brand_strategist.propose_wildcard_angle(pillar=pillar, brand_voice_report=report_str)
+    budget = current_budget()
+    if budget is not None:
+        budget.start_agent_call("Wildcard Angle")
+    profile = model_registry.resolve("Wildcard Angle", "propose_wildcard_angle")
+    started = time.perf_counter()
+    response = brand_strategist.wildcard_angle_response(pillar=pillar, brand_voice_report=report_str, profile=profile)
+    await record_usage(ctx.context, "Wildcard Angle", profile, time.perf_counter() - started, response.usage, task="propose_wildcard_angle")
+    if budget is not None and response.usage:
+        budget.charge_tokens(response.usage.input_tokens, response.usage.output_tokens)
+    angle = response.output_text.strip()
+    log.debug(f"Generated wildcard angle: '{angle}'")
+    await _store_assets(ctx, [Asset("wildcard_angle", angle, pillar=pillar, tool_name="propose_wildcard_angle")])
+    return angle
+
+
+# --- Asset store ---
+
+async def _store_assets(ctx: RunContextWrapper, assets: List[Asset]):
+    """Records generated assets in the asset store (src/db/asset_store.py), under the run's session."""
+    budget = current_budget()
+    if budget is not None:
+        # Kept for the partial response of a turn its budget stops.
+        budget.assets.extend(assets)
+    if not ASSET_STORE_ENABLED:
+        return
+    session = getattr(ctx.context, "session", None)
+    db_path = getattr(ctx.context, "db_path", None) or ASSET_DB_FILE
+    try:
+        stored = await asyncio.to_thread(save_assets, db_path, session.session_id if session else None, assets)
+        log.debug(f"Stored {stored} new assets ({', '.join(asset.asset_type for asset in assets)}).")
+    except sqlite3.Error as e:
+        # The generated content still reaches the user; only its reuse is lost.
+        log.error(f"Could not store generated assets: {e}")
+
+def _idea_asset(idea: PostIdea, tool_name: str) -> Asset:
+    return Asset("idea", idea.model_dump_json(), idea_title=idea.title, pillar=idea.content_pillar, tool_name=tool_name)
+
+def _caption_asset(idea: PostIdea, caption: str, tool_name: str) -> Asset:
+    return Asset("caption", caption, idea_title=idea.title, pillar=idea.content_pillar, tool_name=tool_name)
+
+def _image_prompts_asset(idea: PostIdea, image_prompts: GeneratedImagePrompts, tool_name: str) -> Asset:
+    return Asset("image_prompts", image_prompts.model_dump_json(), idea_title=idea.title, pillar=idea.content_pillar, tool_name=tool_name)
+
+
+# --- Best-of-N generation (BEST_OF_N) ---
+
+async def _select_candidate(ctx: RunContextWrapper, asset_type: str, texts: List[str]) -> int:
+    """
+    Index of the best of several candidates. The "embedding" selector ranks them locally by
+    similarity to the brand's posts and falls back to the judge without a collection; the
+    "judge" selector asks the Candidate Selector Agent once. Falls back to the first candidate.
+    """
+    if BEST_OF_N_SELECTOR == "embedding":
+        try:
+            ranking = await asyncio.to_thread(brand_strategist.rank_candidates, texts, BEST_OF_N_NEIGHBOURS, QUALITY_MAX_CORPUS_SIMILARITY)
+            if ranking:
+                return ranking[0]
+            log.warning("No brand collection to rank candidates against. Asking the judge instead.")
+        except Exception as e:
+            log.warning(f"Could not rank the {asset_type} candidates by embedding: {e}. Asking the judge instead.")
+
+    numbered = "\n\n".join(f"--- Candidate {number} ---\n{text}" for number, text in enumerate(texts, start=1))
+    try:
+        choice: CandidateChoice = await _run_agent_as_streaming_tool(
+            candidate_selector_agent, f"Content type: {asset_type}\n\n{numbered}", ctx, echo=False
+        )
+    except Exception as e:
+        log.warning(f"Could not select the best {asset_type} candidate: {e}. Keeping the first one.")
+        return 0
+    log.debug(f"Candidate selector reasoning: {choice.reasoning}")
+    return min(max(choice.best_candidate, 1), len(texts)) - 1
+
+async def _best_of_n(ctx: RunContextWrapper, agent, prompt: str, asset_type: str, render: Callable[[Any], str], echo: bool = True):
+    """
+    Runs BEST_OF_N independent generations of `agent` concurrently and returns the selected
+    one, so the wall-clock cost stays that of a single generation. Candidates that fail are
+    dropped; with BEST_OF_N <= 1, or a nearly spent run budget, this is a single ordinary run.
+    """
+    if BEST_OF_N <= 1 or budget_degraded():
+        return await _run_agent_as_streaming_tool(agent, prompt, ctx, echo=echo)
+
+    if echo:
+        console.echo(f"\n\n--- Calling {agent.name} for {BEST_OF_N} candidates... ---")
+    # Candidates are already parallel, so they are not hedged, and none echoes (they would interleave).
+    results = await asyncio.gather(
+        *(_run_agent_as_streaming_tool(agent, prompt, ctx, hedge=False, echo=False) for _ in range(BEST_OF_N)),
+        return_exceptions=True,
+    )
+    candidates = [result for result in results if not isinstance(result, BaseException)]
+    if not candidates:
+        raise results[0]
+    if len(candidates) < len(results):
+        log.warning(f"{len(results) - len(candidates)} of {len(results)} {asset_type} candidates failed.")
+
+    index = await _select_candidate(ctx, asset_type, [render(candidate) for candidate in candidates]) if len(candidates) > 1 else 0
+    log.info(f"Selected {asset_type} candidate {index + 1} of {len(candidates)}.")
+    if echo:
+        console.echo(f"\n{render(candidates[index])}\n--- {agent.name} finished ({len(candidates)} candidates). ---")
+    return candidates[index]
+
+def _render_ideas(ideas: GeneratedIdeas) -> str:
+    return "\n".join(f"- {idea.title} ({idea.content_pillar}): {idea.defense_of_idea}" for idea in ideas.ideas)
+
+
+# --- Quality loop (QUALITY_LOOP_ENABLED) ---
+
+async def _judge(ctx: RunContextWrapper, asset_type: str, text: str) -> EvaluationResult:
+    """The Evaluator Agent's verdict on `text`, cached by content hash in the asset store."""
+    db_path = getattr(ctx.context, "db_path", None) or ASSET_DB_FILE
+    digest = content_hash(text)
+    cached = await asyncio.to_thread(get_verdict, db_path, asset_type, digest)
+    if cached:
+        log.info(f"Reusing the cached verdict for this {asset_type}: {cached['score']}.")
+        return EvaluationResult(**cached)
+    verdict: EvaluationResult = await _run_agent_as_streaming_tool(
+        evaluator_agent, f"Content type: {asset_type}\n\nContent:\n{text}", ctx, echo=False
+    )
+    await asyncio.to_thread(save_verdict, db_path, asset_type, digest, verdict.score, verdict.feedback)
+    return verdict
+
+async def _refine_until_approved(
+    ctx: RunContextWrapper,
+    asset_type: str,
+    draft: T,
+    render: Callable[[T], str],
+    local_issues: Callable[[T], Awaitable[List[str]]],
+    revise: Callable[[T, str], Awaitable[T]],
+) -> T:
+    """
+    Runs up to QUALITY_MAX_ROUNDS review rounds on a draft. Each round runs the cheap local
+    checks first; only a draft that passes them goes to the Evaluator Agent. Failed checks or
+    a "needs_improvement" verdict become the feedback for the next revision. Returns the
+    approved draft, or the last one when the rounds run out or the run budget is nearly spent.
+    """
+    for round_number in range(1, QUALITY_MAX_ROUNDS + 1):
+        if budget_degraded():
+            log.info(f"Run budget nearly spent: skipping the review of the {asset_type}.")
+            return draft
+        issues = await local_issues(draft)
+        if issues:
+            log.info(f"Quality round {round_number}: the {asset_type} failed {len(issues)} local checks.")
+            feedback = "Fix these problems:\n- " + "\n- ".join(issues)
+        else:
+            verdict = await _judge(ctx, asset_type, render(draft))
+            if verdict.score == "approved":
+                log.success(f"Quality round {round_number}: the {asset_type} was approved.")
+                return draft
+            log.info(f"Quality round {round_number}: the judge asked for improvements to the {asset_type}.")
+            feedback = verdict.feedback
+        if round_number == QUALITY_MAX_ROUNDS:
+            break
+        draft = await revise(draft, feedback)
+    log.warning(f"The {asset_type} was not approved after {QUALITY_MAX_ROUNDS} rounds. Returning the last draft.")
+    return draft
+
+def _revision_prompt(original_prompt: str, draft: str, feedback: str) -> str:
+    return f"""{original_prompt}
+
+Your previous version:
+{draft}
+
+Feedback for revision:
+{feedback}
+"""
+
+def _render_image_prompts(image_prompts: GeneratedImagePrompts) -> str:
+    return "\n\n".join(f"Slide {number}: {item.prompt}" for number, item in enumerate(image_prompts.prompts, start=1))
 
+async def _caption_issues(caption: str) -> List[str]:
+    try:
+        similarity = await asyncio.to_thread(brand_strategist.max_corpus_similarity, caption)
+    except Exception as e:
+        log.warning(f"Skipping the corpus similarity check: {e}")
+        similarity = None
+    return caption_issues(caption, similarity)
+
+async def _image_prompt_issues(image_prompts: GeneratedImagePrompts) -> List[str]:
+    return image_prompt_issues([item.prompt for item in image_prompts.prompts])
+
+async def _write_caption(ctx: RunContextWrapper, post_idea: PostIdea, brand_context: Optional[BrandContext], echo: bool = True) -> str:
+    prompt = _caption_prompt(post_idea, brand_context)
+    caption = await _best_of_n(ctx, copywriter_agent, prompt, "caption", render=lambda draft: draft, echo=echo)
+    if QUALITY_LOOP_ENABLED:
+        caption = await _refine_until_approved(
+            ctx, "caption", caption,
+            render=lambda draft: draft,
+            local_issues=_caption_issues,
+            revise=lambda draft, feedback: _run_agent_as_streaming_tool(copywriter_agent, _revision_prompt(prompt, draft, feedback), ctx, echo=echo),
+        )
+    return caption
+
+async def _create_image_prompts(ctx: RunContextWrapper, art_director_input: ArtDirectorInput, brand_context: Optional[BrandContext], echo: bool = True) -> GeneratedImagePrompts:
+    prompt = _image_prompts_prompt(art_director_input, brand_context)
+    image_prompts = await _run_agent_as_streaming_tool(art_director_agent, prompt, ctx, echo=echo)
+    if QUALITY_LOOP_ENABLED:
+        image_prompts = await _refine_until_approved(
+            ctx, "image_prompts", image_prompts,
+            render=_render_image_prompts,
+            local_issues=_image_prompt_issues,
+            revise=lambda draft, feedback: _run_agent_as_streaming_tool(
+                art_director_agent, _revision_prompt(prompt, _render_image_prompts(draft), feedback), ctx, echo=echo
+            ),
+        )
+    return image_prompts
+
+
+# --- Prompt builders shared by the creative tools ---
+
+def _ideas_prompt(ideas_input: str, brand_context: Optional[BrandContext]) -> str:
+    context_str = ""
+    if brand_context:
+        context_str = pack_brand_context(brand_context, agent_key="creative_director")
+    return f"{ideas_input}{context_str}"
+
+def _caption_prompt(post_idea: PostIdea, brand_context: Optional[BrandContext]) -> str:
+    context_str = ""
+    if brand_context:
+        context_str = pack_brand_context(brand_context, agent_key="copywriter")
+    
+    # Construct a detailed prompt from the structured PostIdea object
+    return f"""
+Here is the creative concept to develop:
+{post_idea.model_dump_json(indent=2)}
+
+{context_str}
+"""
+
+def _image_prompts_prompt(art_director_input: ArtDirectorInput, brand_context: Optional[BrandContext]) -> str:
+    context_str = ""
+    if brand_context:
+        context_str = pack_brand_context(brand_context, agent_key="art_director")
+    
+    # Construct a detailed prompt from the structured ArtDirectorInput object
+    return f"""
+Here is the creative concept and final caption to develop into a visual storyboard:
+{art_director_input.model_dump_json(indent=2)}
+
+{context_str}
+"""
 
 # --- New Agent-as-Tool Implementations ---
 
@@ -146,69 +560,161 @@ async def propose_content_plan(ctx: RunContextWrapper, plan_input: str) -> Conte
     """
     Generates a strategic content plan based on provided context.
     """
-    return await _run_agent_as_streaming_tool(content_planner_agent, plan_input, ctx)
+    plan: ContentPlan = await _run_agent_as_streaming_tool(content_planner_agent, plan_input, ctx)
+    await _store_assets(ctx, [Asset("content_plan", plan.model_dump_json(), tool_name="propose_content_plan")])
+    return plan
 
 @function_tool(name_override="generate_creative_ideas")
 async def generate_creative_ideas(ctx: RunContextWrapper, ideas_input: str, brand_context: Optional[BrandContext] = None) -> GeneratedIdeas:
     """
     Brainstorms new, on-brand post ideas based on a content pillar and brand context. Use this to generate initial concepts.
     """
-    context_str = ""
-    if brand_context:
-        context_str = f"\n\n--- Brand Context ---\n{brand_context.model_dump_json(indent=2)}\n--- End Context ---"
-    prompt = f"{ideas_input}{context_str}"
-    return await _run_agent_as_streaming_tool(creative_director_agent, prompt, ctx)
+    ideas: GeneratedIdeas = await _best_of_n(ctx, creative_director_agent, _ideas_prompt(ideas_input, brand_context), "ideas", render=_render_ideas)
+    await _store_assets(ctx, [_idea_asset(idea, "generate_creative_ideas") for idea in ideas.ideas])
+    return ideas
 
 @function_tool(name_override="write_post_caption")
 async def write_post_caption(ctx: RunContextWrapper, post_idea: PostIdea, brand_context: Optional[BrandContext] = None) -> str:
     """
     Writes a compelling, empathetic, and valuable Instagram caption for a given post idea.
     """
-    context_str = ""
-    if brand_context:
-        context_str = f"\n\n--- Brand Context ---\n{brand_context.model_dump_json(indent=2)}\n--- End Context ---"
-    
-    # Construct a detailed prompt from the structured PostIdea object
-    prompt = f"""
-Here is the creative concept to develop:
-{post_idea.model_dump_json(indent=2)}
-
-{context_str}
-"""
-    return await _run_agent_as_streaming_tool(copywriter_agent, prompt, ctx)
+    caption = await _write_caption(ctx, post_idea, brand_context)
+    await _store_assets(ctx, [_caption_asset(post_idea, caption, "write_post_caption")])
+    return caption
 
 @function_tool(name_override="create_image_prompts")
 async def create_image_prompts(ctx: RunContextWrapper, art_director_input: ArtDirectorInput, brand_context: Optional[BrandContext] = None) -> GeneratedImagePrompts:
     """
     Translates a post concept and caption into a series of detailed, effective prompts for an image generation model.
     """
-    context_str = ""
-    if brand_context:
-        context_str = f"\n\n--- Brand Context ---\n{brand_context.model_dump_json(indent=2)}\n--- End Context ---"
-    
-    # Construct a detailed prompt from the structured ArtDirectorInput object
-    prompt = f"""
-Here is the creative concept and final caption to develop into a visual storyboard:
-{art_director_input.model_dump_json(indent=2)}
+    image_prompts = await _create_image_prompts(ctx, art_director_input, brand_context)
+    await _store_assets(ctx, [_image_prompts_asset(art_director_input.post_idea, image_prompts, "create_image_prompts")])
+    return image_prompts
 
-{context_str}
-"""
-    return await _run_agent_as_streaming_tool(art_director_agent, prompt, ctx)
+@function_tool(name_override="create_complete_posts")
+async def create_complete_posts(ctx: RunContextWrapper, ideas_input: str, brand_context: Optional[BrandContext] = None) -> CompletePosts:
+    """
+    Brainstorms post ideas and develops every idea into a complete post (caption and image prompts) in one pipelined step.
+    Caption and art direction for each idea start as soon as that idea is generated, while the remaining ideas are still being written.
+    Prefer this over calling generate_creative_ideas, write_post_caption and create_image_prompts one by one when the user wants complete posts.
+    """
+    async def develop(number: int, idea: PostIdea) -> CompletePost:
+        caption = await _write_caption(ctx, idea, brand_context, echo=False)
+        console.echo(f"\n--- Caption ready for idea {number}: '{idea.title}' ---")
+        art_director_input = ArtDirectorInput(post_idea=idea, caption=caption)
+        image_prompts = await _create_image_prompts(ctx, art_director_input, brand_context, echo=False)
+        console.echo(f"\n--- Image prompts ready for idea {number}: '{idea.title}' ---")
+        # Stored as each post completes, so finished posts survive a cancelled batch.
+        await _store_assets(ctx, [
+            _idea_asset(idea, "create_complete_posts"),
+            _caption_asset(idea, caption, "create_complete_posts"),
+            _image_prompts_asset(idea, image_prompts, "create_complete_posts"),
+        ])
+        return CompletePost(idea=idea, caption=caption, image_prompts=image_prompts)
+
+    # Developments by the idea's position in the `ideas` array, so posts keep the ideas' order.
+    developments: Dict[int, asyncio.Future] = {}
+    streamed = 0
+
+    def start_development(position: int, idea: PostIdea):
+        developments[position] = asyncio.ensure_future(develop(len(developments) + 1, idea))
+
+    def on_idea(raw_idea: Dict[str, Any]):
+        nonlocal streamed
+        position, streamed = streamed, streamed + 1
+        try:
+            idea = PostIdea.model_validate(raw_idea)
+        except ValidationError as e:
+            # Left to the final structured output, checked once the run ends.
+            log.warning(f"Streamed idea {position + 1} is not a valid PostIdea yet ({e.error_count()} errors). Skipping it for now.")
+            return
+        log.info(f"Idea {len(developments) + 1} ('{idea.title}') is complete. Starting its caption and art direction.")
+        start_development(position, idea)
+
+    try:
+        ideas: GeneratedIdeas = await _run_agent_as_streaming_tool(
+            creative_director_agent, _ideas_prompt(ideas_input, brand_context), ctx, item_key="ideas", on_item=on_idea
+        )
+        # Any idea the incremental parser did not emit or could not validate is developed now.
+        for position, idea in enumerate(ideas.ideas):
+            if position not in developments:
+                start_development(position, idea)
+        posts = await asyncio.gather(*(developments[position] for position in sorted(developments)))
+    except BaseException:
+        for development in developments.values():
+            development.cancel()
+        raise
+
+    return CompletePosts(posts=list(posts))
 
 @function_tool(name_override="refine_creative_content")
 async def refine_creative_content(ctx: RunContextWrapper, revision_input: str) -> str:
     """
     Performs precise, targeted revisions on existing creative content (like captions or image prompts) based on specific user feedback.
     """
-    return await _run_agent_as_streaming_tool(reviewer_agent, revision_input, ctx)
+    revision = await _run_agent_as_streaming_tool(reviewer_agent, revision_input, ctx)
+    await _store_assets(ctx, [Asset("revision", revision, tool_name="refine_creative_content")])
+    return revision
+
+async def _search_current_session(ctx: RunContextWrapper, **search_args) -> List[Dict[str, Any]]:
+    """Searches the full-text index of the session the current Maestro turn belongs to."""
+    run_context = ctx.context
+    if not isinstance(run_context, MaestroContext) or run_context.session is None or not run_context.db_path:
+        log.warning("No session is attached to this run; session history cannot be searched.")
+        return []
+    # Earlier turns may still be queued for writing (interactive mode).
+    flush = getattr(run_context.session, "flush", None)
+    if flush:
+        await flush()
+    return await asyncio.to_thread(search_session, run_context.db_path, run_context.session.session_id, **search_args)
+
+@function_tool(name_override="find_session_content")
+async def find_session_content(ctx: RunContextWrapper, asset_type: Optional[str] = None, text: Optional[str] = None, limit: int = 3) -> List[SessionMatch]:
+    """
+    Finds content created earlier in this session by exact lookup in a local index. Instant, no model call.
+    Use this to retrieve previous captions, ideas, image prompts, revisions, plans or reports verbatim,
+    e.g. "the last caption" (asset_type="caption") or "the ideas about pricing" (asset_type="ideas", text="pricing").
+    Results are newest first.
+
+    Args:
+        asset_type: ideas, caption, image_prompts, complete_posts, revision, content_plan, brand_report or wildcard_angle; or user / assistant for earlier messages. Omit to search everything.
+        text: Words that must all appear in the content or its title (accents and case are ignored). Omit to get the most recent items.
+        limit: Maximum number of results.
+    """
+    asset_types, kinds = (), ()
+    if asset_type in ASSET_TYPES:
+        asset_types = (asset_type,)
+    elif asset_type in ("user", "assistant"):
+        kinds = (asset_type,)
+    elif asset_type:
+        log.warning(f"Unknown asset type '{asset_type}'; searching all session content.")
+
+    matches = await _search_current_session(ctx, text=text, asset_types=asset_types, kinds=kinds, limit=max(1, limit))
+    log.info(f"find_session_content(asset_type={asset_type!r}, text={text!r}) -> {len(matches)} matches")
+    return [
+        SessionMatch(asset_type=match["asset_type"] or match["kind"], title=match["title"], content=match["body"], created_at=match["created_at"])
+        for match in matches
+    ]
 
 @function_tool(name_override="query_session_history")
 async def query_session_history(ctx: RunContextWrapper, query_input: str) -> str:
     """
-
-    Analyzes the current conversation transcript to answer a specific query about what has happened previously. Use this to find content to refine or to understand the history of the conversation.
+    Answers open-ended questions about the conversation so far that need interpretation, such as summarizing the feedback given or
+    explaining which idea the user preferred and why. This calls a model and is slow: to retrieve a specific earlier caption, idea
+    or prompt, use `find_session_content` instead.
     """
-    return await _run_agent_as_streaming_tool(session_analyst_agent, query_input, ctx)
+    # The analyst reads the passages most relevant to the query plus the latest ones, never the whole transcript.
+    relevant = await _search_current_session(ctx, text=query_input, by_relevance=True, any_word=True, limit=SESSION_ANALYST_EXCERPTS)
+    recent = await _search_current_session(ctx, limit=SESSION_ANALYST_EXCERPTS)
+    excerpts = sorted({entry["id"]: entry for entry in relevant + recent}.values(), key=lambda entry: entry["id"])
+
+    history = "\n\n".join(
+        f"[{entry['created_at']}] {entry['asset_type'] or entry['kind']}{': ' + entry['title'] if entry['title'] else ''}\n"
+        f"{entry['body'][:SESSION_EXCERPT_MAX_CHARS]}"
+        for entry in excerpts
+    )
+    prompt = f"Query: {query_input}\n\nSession history excerpts (oldest first):\n\n{history or '(the session history is empty)'}"
+    return await _run_agent_as_streaming_tool(session_analyst_agent, prompt, ctx)
 
 
 # --- Compile All Tools for Maestro ---
@@ -223,7 +729,9 @@ maestro_tools = [
     generate_creative_ideas,
     write_post_caption,
     create_image_prompts,
+    create_complete_posts,
     refine_creative_content,
+    find_session_content,
     query_session_history,
 ]
 
@@ -0,0 +1,324 @@
+"""
+Long-lived local daemon that keeps the Agents SDK, ChromaDB, the tool schemas, the HTTP
+connection pool and open sessions warm between CLI invocations.
+
+`python -m src.main serve` starts it on a Unix socket (DAEMON_SOCKET, default
+`.calcularte.sock` in the project directory, readable by its owner only) or, with
+DAEMON_PORT/`--port`, on localhost TCP. Over TCP, which any local user can reach, every
+request must carry the token the daemon writes on startup to DAEMON_TOKEN_FILE (mode 0600).
+CLI commands then act as thin clients: they send one JSON request per connection and render
+the events streamed back. Without a reachable daemon they run in-process as before.
+
+Wire protocol (newline-delimited JSON over the socket):
+    client -> {"command": "maestro", "args": {...}, "cwd": "...", "token": "..."}  (token over TCP only)
+    daemon -> {"event": "output", "text", "nl", "fg", "err"}   console output
+              {"event": "log", "level", "message"}              INFO+ log records
+              {"event": "prompt", "text"}                       the client answers {"answer": "..."}
+              {"event": "error", "message"}
+              {"event": "unavailable", "message"}               the client falls back to in-process
+              {"event": "exit", "code"}                         always the last event
+"""
+import asyncio
+import hmac
+import json
+import os
+import secrets
+import signal
+import socket
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional
+import typer
+from dotenv import load_dotenv
+from src.utils import console
+from src.utils.logging import log
+
+load_dotenv()
+
+# --- Daemon Settings from .env ---
+DAEMON_SOCKET = os.getenv("DAEMON_SOCKET", ".calcularte.sock")
+DAEMON_PORT = int(os.getenv("DAEMON_PORT", 0))  # 0 = use the Unix socket
+DAEMON_TOKEN_FILE = os.getenv("DAEMON_TOKEN_FILE", ".calcularte.token")  # TCP mode only
+DAEMON_ENABLED = os.getenv("DAEMON_ENABLED", "true").lower() == "true"
+DAEMON_CONNECT_TIMEOUT_SECONDS = float(os.getenv("DAEMON_CONNECT_TIMEOUT_SECONDS", 0.5))
+
+CommandHandler = Callable[..., Awaitable[Any]]
+
+LOG_LEVEL_COLORS = {
+    "WARNING": typer.colors.YELLOW,
+    "ERROR": typer.colors.RED,
+    "CRITICAL": typer.colors.RED,
+    "SUCCESS": typer.colors.GREEN,
+}
+
+
+def _use_tcp(port: Optional[int]) -> bool:
+    return bool(port) or not hasattr(socket, "AF_UNIX")
+
+
+def _write_token(token_path: str) -> str:
+    """Writes a new random token to `token_path`, readable by its owner only, and returns it."""
+    token = secrets.token_hex(32)
+    if os.path.exists(token_path):
+        os.remove(token_path)
+    fd = os.open(token_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+    return token
+
+
+def _read_token(token_path: str) -> Optional[str]:
+    try:
+        with open(token_path) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+# --- Server ---
+
+class _ClientChannel:
+    """The `console.EventChannel` of one connected client. `send` is safe to call from worker threads."""
+
+    def __init__(self, writer: asyncio.StreamWriter, answers: "asyncio.Queue[Optional[str]]"):
+        self._loop = asyncio.get_running_loop()
+        self._writer = writer
+        self._answers = answers
+
+    def _write(self, data: bytes):
+        if not self._writer.is_closing():
+            self._writer.write(data)
+
+    def send(self, event: dict):
+        data = (json.dumps(event, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._write(data)
+        else:
+            self._loop.call_soon_threadsafe(self._write, data)
+
+    async def ask(self, text: str) -> str:
+        self.send({"event": "prompt", "text": text})
+        answer = await self._answers.get()
+        if answer is None:
+            raise ConnectionResetError("The client disconnected while waiting for an answer.")
+        return answer
+
+    async def drain(self):
+        if not self._writer.is_closing():
+            await self._writer.drain()
+
+
+def _forward_log_record(message):
+    """Loguru sink that streams INFO+ records to the client whose request produced them."""
+    channel = console.current_channel()
+    if channel is not None:
+        record = message.record
+        channel.send({"event": "log", "level": record["level"].name, "message": record["message"]})
+
+
+class Daemon:
+    """Serves CLI requests concurrently; requests for the same session run one at a time."""
+
+    def __init__(self, handlers: Dict[str, CommandHandler], token: Optional[str] = None):
+        self.handlers = handlers
+        self.token = token
+        self._session_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._active_requests = 0
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        answers: asyncio.Queue = asyncio.Queue()
+        channel = _ClientChannel(writer, answers)
+        try:
+            request = json.loads(await reader.readline() or b"{}")
+        except json.JSONDecodeError:
+            request = {}
+
+        command, args = request.get("command"), request.get("args") or {}
+        if self.token is not None and not hmac.compare_digest(str(request.get("token", "")), self.token):
+            log.warning("Rejected a daemon request without a valid token.")
+            channel.send({"event": "error", "message": "Invalid or missing daemon token."})
+            channel.send({"event": "exit", "code": 1})
+        elif command not in self.handlers:
+            channel.send({"event": "error", "message": f"Unknown command: {command!r}"})
+            channel.send({"event": "exit", "code": 1})
+        elif request.get("cwd") and os.path.realpath(request["cwd"]) != os.path.realpath(os.getcwd()):
+            channel.send({"event": "unavailable", "message": f"The daemon serves {os.getcwd()}."})
+        else:
+            await self._run_request(channel, reader, answers, command, args)
+
+        try:
+            await channel.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def _run_request(self, channel: _ClientChannel, reader: asyncio.StreamReader, answers: asyncio.Queue, command: str, args: Dict[str, Any]):
+        self._active_requests += 1
+        log.info(f"Daemon request: {command} ({self._active_requests} in flight)")
+        token = console.bind_channel(channel)
+        try:
+            task = asyncio.ensure_future(self._call_handler(command, args))
+        finally:
+            console.unbind_channel(token)
+
+        async def read_answers():
+            # The only messages after the request are prompt answers; EOF means the client went away.
+            while True:
+                line = await reader.readline()
+                if not line:
+                    await answers.put(None)
+                    if not task.done():
+                        log.warning(f"Client disconnected. Cancelling '{command}'.")
+                        task.cancel()
+                    return
+                await answers.put(json.loads(line).get("answer", ""))
+
+        reader_task = asyncio.ensure_future(read_answers())
+        exit_code = 1
+        try:
+            exit_code = await task
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise
+        except typer.Exit as e:
+            exit_code = e.exit_code
+        except Exception as e:
+            log.exception(f"Daemon request '{command}' failed: {e}")
+            channel.send({"event": "error", "message": f"{type(e).__name__}: {e}"})
+        finally:
+            reader_task.cancel()
+            self._active_requests -= 1
+        channel.send({"event": "exit", "code": exit_code})
+
+    async def _call_handler(self, command: str, args: Dict[str, Any]) -> int:
+        session_id = args.get("session_id")
+        if session_id:
+            async with self._session_locks[session_id]:
+                await self.handlers[command](**args)
+        else:
+            await self.handlers[command](**args)
+        return 0
+
+
+async def _serve(handlers: Dict[str, CommandHandler], socket_path: str, port: int, token_path: str, warm_up: Optional[Callable[[], Awaitable[None]]]):
+    if warm_up:
+        await warm_up()
+
+    if _use_tcp(port):
+        # Any local user can connect to a TCP port, so requests must present the token.
+        daemon = Daemon(handlers, token=_write_token(token_path))
+        server = await asyncio.start_server(daemon.handle_connection, host="127.0.0.1", port=port)
+        address = f"127.0.0.1:{port} (token in {os.path.abspath(token_path)})"
+    else:
+        if os.path.exists(socket_path):
+            existing = _connect(socket_path, None)
+            if existing is not None:
+                existing.close()
+                raise RuntimeError(f"Another daemon is already listening on {socket_path}.")
+            os.remove(socket_path)  # Stale socket left by a daemon that did not shut down cleanly.
+        daemon = Daemon(handlers)
+        # The socket is created owner-only, so it is never reachable with looser permissions.
+        previous_umask = os.umask(0o077)
+        try:
+            server = await asyncio.start_unix_server(daemon.handle_connection, path=socket_path)
+        finally:
+            os.umask(previous_umask)
+        os.chmod(socket_path, 0o600)
+        address = os.path.abspath(socket_path)
+
+    log.success(f"Daemon listening on {address} (Ctrl+C to stop).")
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        if not _use_tcp(port) and os.path.exists(socket_path):
+            os.remove(socket_path)
+        if _use_tcp(port) and os.path.exists(token_path):
+            os.remove(token_path)
+        log.info("Daemon stopped.")
+
+
+def run_daemon(handlers: Dict[str, CommandHandler], socket_path: str = DAEMON_SOCKET, port: int = DAEMON_PORT, warm_up: Optional[Callable[[], Awaitable[None]]] = None, token_path: str = DAEMON_TOKEN_FILE):
+    """
+    Runs the daemon until SIGINT/SIGTERM. `handlers` maps command names to coroutines taking
+    the request args as keyword arguments; `warm_up` runs once before accepting requests.
+    In TCP mode, a new token is written to `token_path` and required from every client.
+    """
+    log.add(_forward_log_record, level="INFO", format="{message}",
+            filter=lambda record: record["level"].name != "THOUGHT" and console.current_channel() is not None)
+    asyncio.run(_serve(handlers, socket_path, port, token_path, warm_up))
+
+
+# --- Client ---
+
+def _connect(socket_path: str, port: Optional[int]) -> Optional[socket.socket]:
+    """Connects to a running daemon, or returns None when none is listening."""
+    try:
+        if _use_tcp(port):
+            sock = socket.create_connection(("127.0.0.1", port), timeout=DAEMON_CONNECT_TIMEOUT_SECONDS)
+        else:
+            if not os.path.exists(socket_path):
+                return None
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(DAEMON_CONNECT_TIMEOUT_SECONDS)
+            sock.connect(socket_path)
+    except OSError:
+        return None
+    sock.settimeout(None)
+    return sock
+
+
+def request_daemon(command: str, args: Dict[str, Any], socket_path: str = DAEMON_SOCKET, port: int = DAEMON_PORT, token_path: str = DAEMON_TOKEN_FILE) -> Optional[int]:
+    """
+    Sends a command to the daemon and renders its events as they stream in.
+
+    Returns the command's exit code, or None when no daemon is available (or DAEMON_ENABLED
+    is false) and the caller should run the command in-process.
+    """
+    if not DAEMON_ENABLED:
+        return None
+    request = {"command": command, "args": args, "cwd": os.getcwd()}
+    if _use_tcp(port):
+        token = _read_token(token_path)
+        if token is None:
+            return None  # Not this user's daemon, or none running.
+        request["token"] = token
+    sock = _connect(socket_path, port)
+    if sock is None:
+        return None
+
+    with sock, sock.makefile("rwb") as stream:
+        stream.write((json.dumps(request) + "\n").encode("utf-8"))
+        stream.flush()
+        for line in stream:
+            event = json.loads(line)
+            kind = event.get("event")
+            if kind == "output":
+                typer.secho(event["text"], nl=event.get("nl", True), fg=event.get("fg"), err=event.get("err", False))
+            elif kind == "log":
+                typer.secho(event["message"], fg=LOG_LEVEL_COLORS.get(event["level"]), err=True)
+            elif kind == "prompt":
+                answer = typer.prompt(event["text"])
+                stream.write((json.dumps({"answer": answer}) + "\n").encode("utf-8"))
+                stream.flush()
+            elif kind == "error":
+                typer.secho(f"Error: {event['message']}", fg=typer.colors.RED, err=True)
+            elif kind == "unavailable":
+                log.warning(f"Daemon unavailable ({event['message']}). Running in-process.")
+                return None
+            elif kind == "exit":
+                return event.get("code", 0)
+
+    typer.secho("Error: The daemon closed the connection before the command finished.", fg=typer.colors.RED, err=True)
+    return 1
@@ -0,0 +1,189 @@
+"""
+Structured store of everything the creative tools generate (ideas, captions, image prompts,
+revisions, plans, wildcard angles), so past assets can be found and reused with an indexed
+query instead of replaying a session or asking a model.
+
+Assets live in the `assets` table of the session database, keyed by session, type, content
+pillar, idea title and creation time, with a SHA-256 of the content. The same content is
+stored once per session and type. Assets outlive their session: `session clear` and
+`session prune` delete history, not generated assets.
+
+The `judge_verdicts` table caches the quality judge's verdict per content hash, so the same
+draft is never sent to the judge twice.
+"""
+import hashlib
+import os
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+from dotenv import load_dotenv
+from src.db.session_db import sqlite_timestamp, configure_connection
+
+load_dotenv()
+
+ASSETS_TABLE = "assets"
+VERDICTS_TABLE = "judge_verdicts"
+
+ASSET_STORE_ENABLED = os.getenv("ASSET_STORE_ENABLED", "true").lower() == "true"
+ASSET_DB_FILE = os.getenv("SESSION_DB_FILE", "sessions.db")
+
+# Database files whose schema was already checked by this process.
+_ensured_paths: Set[str] = set()
+
+ASSET_COLUMNS = ("id", "session_id", "asset_type", "pillar", "idea_title", "tool_name", "content", "content_hash", "created_at")
+
+
+@dataclass
+class Asset:
+    """One generated asset, as written by a creative tool. `content` is plain text or JSON."""
+    asset_type: str
+    content: str
+    idea_title: Optional[str] = None
+    pillar: Optional[str] = None
+    tool_name: Optional[str] = None
+
+
+def ensure_asset_table(conn: sqlite3.Connection):
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {ASSETS_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL DEFAULT '',
+            asset_type TEXT NOT NULL,
+            pillar TEXT COLLATE NOCASE,
+            idea_title TEXT COLLATE NOCASE,
+            tool_name TEXT,
+            content TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (session_id, asset_type, content_hash)
+        )
+        """
+    )
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{ASSETS_TABLE}_session ON {ASSETS_TABLE} (session_id, asset_type, created_at)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{ASSETS_TABLE}_type ON {ASSETS_TABLE} (asset_type, created_at)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{ASSETS_TABLE}_pillar ON {ASSETS_TABLE} (pillar, asset_type, created_at)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{ASSETS_TABLE}_title ON {ASSETS_TABLE} (idea_title)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{ASSETS_TABLE}_hash ON {ASSETS_TABLE} (content_hash)")
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {VERDICTS_TABLE} (
+            asset_type TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            score TEXT NOT NULL,
+            feedback TEXT NOT NULL DEFAULT '',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (asset_type, content_hash)
+        )
+        """
+    )
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    configure_connection(conn)
+    path_key = os.path.abspath(db_path)
+    if path_key not in _ensured_paths:
+        ensure_asset_table(conn)
+        conn.commit()
+        _ensured_paths.add(path_key)
+    return conn
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def save_assets(db_path: str, session_id: Optional[str], assets: Iterable[Asset]) -> int:
+    """Stores the assets of one tool call and returns how many were new."""
+    rows = [
+        (session_id or "", asset.asset_type, asset.pillar, asset.idea_title, asset.tool_name, asset.content, content_hash(asset.content))
+        for asset in assets
+        if asset.content
+    ]
+    if not rows:
+        return 0
+    with closing(_connect(db_path)) as conn:
+        before = conn.total_changes
+        conn.executemany(
+            f"""
+            INSERT OR IGNORE INTO {ASSETS_TABLE} (session_id, asset_type, pillar, idea_title, tool_name, content, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+        conn.commit()
+        return conn.total_changes - before
+
+
+def find_assets(
+    db_path: str,
+    session_id: Optional[str] = None,
+    asset_type: Optional[str] = None,
+    pillar: Optional[str] = None,
+    title: Optional[str] = None,
+    since: Optional[datetime] = None,
+    limit: Optional[int] = 20,
+) -> List[Dict[str, Any]]:
+    """
+    Returns stored assets, newest first. Session, type, pillar and time filters use the
+    table's indexes; `pillar` matches exactly and `title` matches part of the idea title,
+    both ignoring ASCII case (SQLite's NOCASE/LIKE do not fold accented letters).
+    """
+    if not os.path.exists(db_path):
+        return []
+    where, params = [], []
+    if session_id is not None:
+        where.append("session_id = ?")
+        params.append(session_id)
+    if asset_type:
+        where.append("asset_type = ?")
+        params.append(asset_type)
+    if pillar:
+        where.append("pillar = ?")
+        params.append(pillar)
+    if title:
+        where.append("idea_title LIKE ? ESCAPE '\\'")
+        params.append("%" + title.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+    if since is not None:
+        where.append("created_at >= ?")
+        params.append(sqlite_timestamp(since))
+    query = f"SELECT {', '.join(ASSET_COLUMNS)} FROM {ASSETS_TABLE}"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(-1 if limit is None else limit)
+    with closing(_connect(db_path)) as conn:
+        return [dict(zip(ASSET_COLUMNS, row)) for row in conn.execute(query, params)]
+
+
+def get_asset(db_path: str, asset_id: int) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(db_path):
+        return None
+    with closing(_connect(db_path)) as conn:
+        row = conn.execute(f"SELECT {', '.join(ASSET_COLUMNS)} FROM {ASSETS_TABLE} WHERE id = ?", (asset_id,)).fetchone()
+    return dict(zip(ASSET_COLUMNS, row)) if row else None
+
+
+# --- Judge verdict cache ---
+
+def get_verdict(db_path: str, asset_type: str, digest: str) -> Optional[Dict[str, str]]:
+    """The cached judge verdict for this exact content, if it was judged before."""
+    if not os.path.exists(db_path):
+        return None
+    with closing(_connect(db_path)) as conn:
+        row = conn.execute(
+            f"SELECT score, feedback FROM {VERDICTS_TABLE} WHERE asset_type = ? AND content_hash = ?", (asset_type, digest)
+        ).fetchone()
+    return {"score": row[0], "feedback": row[1]} if row else None
+
+
+def save_verdict(db_path: str, asset_type: str, digest: str, score: str, feedback: str):
+    with closing(_connect(db_path)) as conn:
+        conn.execute(
+            f"INSERT OR REPLACE INTO {VERDICTS_TABLE} (asset_type, content_hash, score, feedback) VALUES (?, ?, ?, ?)",
+            (asset_type, digest, score, feedback),
+        )
+        conn.commit()
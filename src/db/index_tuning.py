@@ -0,0 +1,134 @@
+"""
+Recall/latency tuning of the post collection's HNSW index (`index tune`).
+
+The local embeddings are indexed once per combination of `ef_construction`,
+`max_neighbors` and `ef_search` in a scratch directory, and a sample of posts, used as
+queries, is searched in each index. Recall@k is the share of the exact k nearest neighbours
+(brute force over all embeddings, in the same distance) that the index returns, leaving out
+the query post itself. Latency is the wall time of single-query `collection.query` calls,
+as `query_brand_voice` makes them. The live collection is only read.
+"""
+import itertools
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from src.db.post_index import INDEX_MIGRATION_BATCH_SIZE, index_configuration
+from src.utils.logging import log
+
+DEFAULT_EF_CONSTRUCTION = [100, 200]
+DEFAULT_MAX_NEIGHBORS = [16, 32]
+DEFAULT_EF_SEARCH = [10, 20, 40, 80, 160]
+
+
+def load_embeddings(collection, batch_size: int = INDEX_MIGRATION_BATCH_SIZE) -> Tuple[List[str], np.ndarray]:
+    """The ids and embeddings (float32, one row per post) of every post in `collection`."""
+    ids: List[str] = []
+    rows = []
+    for offset in range(0, collection.count(), batch_size):
+        batch = collection.get(include=["embeddings"], limit=batch_size, offset=offset)
+        ids.extend(batch["ids"])
+        rows.append(np.asarray(batch["embeddings"], dtype=np.float32))
+    return ids, np.concatenate(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+
+
+def distances(queries: np.ndarray, vectors: np.ndarray, space: str) -> np.ndarray:
+    """Distances from each query to each vector, as Chroma computes them in `space`."""
+    if space == "cosine":
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    if space in ("cosine", "ip"):
+        return 1.0 - queries @ vectors.T
+    return (queries ** 2).sum(axis=1)[:, None] - 2.0 * queries @ vectors.T + (vectors ** 2).sum(axis=1)[None, :]
+
+
+def exact_neighbors(vectors: np.ndarray, query_rows: Sequence[int], k: int, space: str) -> List[List[int]]:
+    """The rows of the exact `k` nearest neighbours of each query row, nearest first, leaving out the query itself."""
+    scores = distances(vectors[list(query_rows)], vectors, space)
+    scores[np.arange(len(query_rows)), list(query_rows)] = np.inf
+    nearest = np.argpartition(scores, k - 1, axis=1)[:, :k]
+    return [list(row[np.argsort(score[row])]) for row, score in zip(nearest, scores)]
+
+
+def _percentile_ms(seconds: List[float], percentile: int) -> float:
+    if len(seconds) < 2:
+        return round(seconds[0] * 1000, 2) if seconds else 0.0
+    return round(statistics.quantiles(seconds, n=100)[percentile - 1] * 1000, 2)
+
+
+def tune_index(
+    ids: List[str],
+    vectors: np.ndarray,
+    space: str,
+    ef_construction_values: Sequence[int] = DEFAULT_EF_CONSTRUCTION,
+    max_neighbors_values: Sequence[int] = DEFAULT_MAX_NEIGHBORS,
+    ef_search_values: Sequence[int] = DEFAULT_EF_SEARCH,
+    k: int = 10,
+    queries: int = 200,
+    seed: int = 42,
+) -> Dict[str, Any]:
+    """
+    Measures recall@k and query latency for every combination of the given HNSW parameters.
+    Returns the run's settings, the latency of the exact search (the baseline) and one
+    result per combination.
+    """
+    import chromadb
+
+    if len(ids) < 2:
+        raise ValueError("At least 2 posts are needed to tune the index.")
+    k = min(k, len(ids) - 1)
+    query_rows = sorted(np.random.default_rng(seed).choice(len(ids), size=min(queries, len(ids)), replace=False).tolist())
+
+    # The baseline: the same search done exactly, over vectors normalized once when comparing by cosine.
+    baseline, baseline_space = vectors, space
+    if space == "cosine":
+        baseline, baseline_space = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12), "ip"
+    exact_seconds = []
+    for row in query_rows:
+        started = time.perf_counter()
+        exact_neighbors(baseline, [row], k, baseline_space)
+        exact_seconds.append(time.perf_counter() - started)
+    truth: List[Set[str]] = [{ids[i] for i in row} for row in exact_neighbors(vectors, query_rows, k, space)]
+
+    report: Dict[str, Any] = {
+        "posts": len(ids), "dimensions": int(vectors.shape[1]), "space": space, "k": k, "queries": len(query_rows),
+        "exact": {"p50_ms": _percentile_ms(exact_seconds, 50), "p95_ms": _percentile_ms(exact_seconds, 95)},
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="calcularte-index-tune-") as path:
+        client = chromadb.PersistentClient(path=path)
+        batch_size = client.get_max_batch_size()
+        # One index per combination: Chroma keeps a loaded index with the `ef_search` it was opened with.
+        for ef_construction, max_neighbors, ef_search in itertools.product(ef_construction_values, max_neighbors_values, ef_search_values):
+            collection = client.create_collection(
+                name="index_tuning", configuration=index_configuration(space, ef_construction, ef_search, max_neighbors),
+            )
+            started = time.perf_counter()
+            for offset in range(0, len(ids), batch_size):
+                collection.add(ids=ids[offset:offset + batch_size], embeddings=vectors[offset:offset + batch_size])
+            build_seconds = time.perf_counter() - started
+
+            collection.query(query_embeddings=[vectors[query_rows[0]]], n_results=k + 1, include=[])  # warm-up
+            latencies, hits = [], 0
+            for row, expected in zip(query_rows, truth):
+                started = time.perf_counter()
+                found = collection.query(query_embeddings=[vectors[row]], n_results=k + 1, include=[])["ids"][0]
+                latencies.append(time.perf_counter() - started)
+                hits += len(expected.intersection([post_id for post_id in found if post_id != ids[row]][:k]))
+            client.delete_collection("index_tuning")
+            result = {
+                "ef_construction": ef_construction, "max_neighbors": max_neighbors, "ef_search": ef_search,
+                "recall": round(hits / (k * len(query_rows)), 4),
+                "p50_ms": _percentile_ms(latencies, 50), "p95_ms": _percentile_ms(latencies, 95),
+                "build_seconds": round(build_seconds, 2),
+            }
+            log.debug(f"Index tuning: {result}")
+            report["results"].append(result)
+    return report
+
+
+def pick_setting(results: List[Dict[str, Any]], target_recall: float) -> Optional[Dict[str, Any]]:
+    """The result with the lowest median latency among those reaching `target_recall`, or None."""
+    eligible = [result for result in results if result["recall"] >= target_recall]
+    return min(eligible, key=lambda result: (result["p50_ms"], result["build_seconds"])) if eligible else None
@@ -0,0 +1,389 @@
+"""
+The brand's post collection in ChromaDB (`calcularte_posts` in ./chroma_db): its schema, how
+posts are written to and read from it, and the versioned migrations between schemas.
+
+Schema 2 (current) stores each caption once, as the Chroma document, with compact metadata:
+
+    {"timestamp": 1719748800,             # Unix seconds, so posts sort and filter numerically
+     "hashtags": "calcularte mei",        # lowercase, without '#', deduplicated, space-separated
+     "likesCount": 12, "commentsCount": 3, "url": "https://www.instagram.com/p/..."}
+
+Schema 1 (collections created before versioning) repeated the caption in
+`metadata["caption"]`, kept the timestamp as an ISO string and joined the hashtags into one
+string as scraped. Hashtags stay a string in schema 2 rather than a metadata array: Chroma
+reads array metadata about twice as slowly, and the newest-posts path reads the metadata of
+every post. The version is kept in the collection's metadata (`schema_version`, absent in
+schema 1). Readers accept both; `index migrate` rewrites a collection to the current
+schema, keeping its embeddings, so nothing is re-embedded.
+
+The HNSW index is built with the distance and parameters of the INDEX_* settings (cosine by
+default, as OpenAI embeddings are meant to be compared). They are read when a collection is
+created; `index migrate` rebuilds a collection whose settings differ (Chroma caches a loaded
+index with its `ef_search`, so even that one is applied by a rebuild), and `index tune`
+measures which values to pick.
+
+Embeddings can be stored at fewer dimensions than the model's full size
+(EMBEDDING_DIMENSIONS). The collection records its size (`embedding_dimensions`), and
+ingest and queries request embeddings of that size, so both sides always match.
+`index migrate` shrinks an existing collection by truncating and re-normalizing its
+vectors, which for `text-embedding-3-*` equals re-embedding at the smaller size.
+"""
+import json
+import os
+import re
+import shutil
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+from src.utils.logging import log
+from src.utils.retrieval import truncate_embeddings
+
+load_dotenv()
+
+CHROMA_PATH = "./chroma_db"
+COLLECTION_NAME = "calcularte_posts"
+
+SCHEMA_VERSION = 2
+
+# --- Post Index Settings from .env ---
+INDEX_MIGRATION_BATCH_SIZE = int(os.getenv("INDEX_MIGRATION_BATCH_SIZE", 1000))
+
+# --- HNSW Index Settings from .env ---
+INDEX_SPACE = os.getenv("INDEX_SPACE", "cosine")  # cosine, l2 or ip
+INDEX_EF_CONSTRUCTION = int(os.getenv("INDEX_EF_CONSTRUCTION", 100))
+INDEX_EF_SEARCH = int(os.getenv("INDEX_EF_SEARCH", 100))
+INDEX_MAX_NEIGHBORS = int(os.getenv("INDEX_MAX_NEIGHBORS", 16))
+
+SPACES = ("cosine", "l2", "ip")
+
+# --- Embedding Storage Settings from .env ---
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", 0))  # 0 keeps the model's full size
+
+# First window of the newest-posts search, doubled until it holds enough posts.
+NEWEST_POSTS_INITIAL_SPAN = 30 * 24 * 3600
+
+
+def normalize_hashtags(hashtags: Any) -> List[str]:
+    """Hashtags from a list or a joined string, lowercase, without '#', deduplicated in order."""
+    if isinstance(hashtags, str):
+        hashtags = hashtags.replace(",", " ").split()
+    normalized = []
+    for tag in hashtags or []:
+        tag = str(tag).strip().lstrip("#").lower()
+        if tag and tag not in normalized:
+            normalized.append(tag)
+    return normalized
+
+
+def parse_timestamp(value: Any) -> Optional[int]:
+    """Unix seconds from a stored timestamp (seconds, or an ISO string as scraped), or None."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def format_timestamp(seconds: Optional[int]) -> Optional[str]:
+    """An ISO timestamp (UTC) in the format of the scraped data."""
+    if seconds is None:
+        return None
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def post_metadata(post: Dict[str, Any]) -> Dict[str, Any]:
+    """The schema-2 metadata of a scraped post. Chroma rejects None values, so those are left out."""
+    metadata = {
+        "timestamp": parse_timestamp(post.get("timestamp")),
+        "hashtags": " ".join(normalize_hashtags(post.get("hashtags"))) or None,
+        "likesCount": post.get("likesCount"),
+        "commentsCount": post.get("commentsCount"),
+        "url": post.get("url"),
+    }
+    return {key: value for key, value in metadata.items() if value is not None}
+
+
+def timestamp_key(metadata: Optional[Dict[str, Any]]) -> int:
+    """Sort key of a stored post by its publication time (either schema); undated posts sort oldest."""
+    return parse_timestamp((metadata or {}).get("timestamp")) or 0
+
+
+def to_sample(document: str, metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    A stored post (either schema) as a `PostSample` dict: the caption, and metadata with an
+    ISO timestamp and comma-joined hashtags, the shape the agents' models expect.
+    """
+    metadata = metadata or {}
+    sample_metadata = {
+        "hashtags": ", ".join(normalize_hashtags(metadata.get("hashtags"))),
+        "timestamp": format_timestamp(parse_timestamp(metadata.get("timestamp"))),
+        "likesCount": metadata.get("likesCount") or 0,
+        "commentsCount": metadata.get("commentsCount") or 0,
+        "url": metadata.get("url"),
+    }
+    return {"caption": document, "metadata": {key: value for key, value in sample_metadata.items() if value is not None}}
+
+
+def get_by_ids(collection, ids: Sequence[str], include: List[str]) -> Dict[str, List[Any]]:
+    """`collection.get` for `ids`, with every included field in the order of `ids` (Chroma returns storage order)."""
+    if not ids:
+        return {field: [] for field in include}
+    result = collection.get(ids=list(ids), include=include)
+    position = {post_id: index for index, post_id in enumerate(result["ids"])}
+    return {field: [result[field][position[post_id]] for post_id in ids if post_id in position] for field in include}
+
+
+def schema_version(collection) -> int:
+    return int((collection.metadata or {}).get("schema_version", 1))
+
+
+def newest_post_ids(collection, count: int) -> List[str]:
+    """
+    Ids of the `count` newest posts, newest first. In schema 2, only the posts of a recent time
+    window are read (a range filter on the numeric timestamp), widening the window until it
+    holds `count` posts; schema 1, or too few dated posts, falls back to reading the
+    metadata of every post.
+    """
+    where = None
+    if schema_version(collection) >= 2:
+        now = int(time.time())
+        span = NEWEST_POSTS_INITIAL_SPAN
+        while span < now:
+            window = {"timestamp": {"$gte": now - span}}
+            if len(collection.get(where=window, include=[])["ids"]) >= count:
+                where = window
+                break
+            span *= 2
+    posts = collection.get(where=where, include=["metadatas"])
+    ranked = sorted(zip(posts["ids"], posts["metadatas"]), key=lambda item: timestamp_key(item[1]), reverse=True)
+    return [post_id for post_id, _ in ranked[:count]]
+
+
+def index_configuration(
+    space: Optional[str] = None,
+    ef_construction: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    max_neighbors: Optional[int] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """The Chroma collection configuration of an HNSW index; unset values come from the INDEX_* settings."""
+    space = space or INDEX_SPACE
+    if space not in SPACES:
+        raise ValueError(f"Unknown distance '{space}'. Use one of: {', '.join(SPACES)}.")
+    return {"hnsw": {
+        "space": space,
+        "ef_construction": ef_construction or INDEX_EF_CONSTRUCTION,
+        "ef_search": ef_search or INDEX_EF_SEARCH,
+        "max_neighbors": max_neighbors or INDEX_MAX_NEIGHBORS,
+    }}
+
+
+def index_settings(collection) -> Dict[str, Any]:
+    """The distance and HNSW parameters `collection` was built with."""
+    hnsw = (collection.configuration or {}).get("hnsw") or {}
+    return {key: hnsw.get(key) for key in ("space", "ef_construction", "ef_search", "max_neighbors")}
+
+
+def requested_dimensions(collection) -> Optional[int]:
+    """The embedding size to request for `collection` (its recorded `embedding_dimensions`), or None for the model's full size."""
+    return (collection.metadata or {}).get("embedding_dimensions")
+
+
+def embedding_dimensions(collection) -> Optional[int]:
+    """The size of the embeddings stored in `collection`, or None while it is empty."""
+    recorded = requested_dimensions(collection)
+    if recorded:
+        return recorded
+    sample = collection.get(limit=1, include=["embeddings"])["embeddings"]
+    return len(sample[0]) if sample is not None and len(sample) else None
+
+
+def index_changes(collection) -> Dict[str, Tuple[Any, Any]]:
+    """
+    The HNSW settings and embedding size of `collection` that differ from the configured
+    ones, as name -> (current, configured).
+    """
+    current = index_settings(collection)
+    changes = {key: (current[key], value) for key, value in index_configuration()["hnsw"].items() if current[key] != value}
+    if EMBEDDING_DIMENSIONS:
+        stored = embedding_dimensions(collection)
+        if stored and stored != EMBEDDING_DIMENSIONS:
+            changes["dimensions"] = (stored, EMBEDDING_DIMENSIONS)
+    return changes
+
+
+def create_collection(client, name: str = COLLECTION_NAME, configuration: Optional[Dict[str, Any]] = None, dimensions: Optional[int] = None):
+    """
+    A new, empty collection marked with the current schema version and its embedding size
+    (`dimensions`, by default EMBEDDING_DIMENSIONS; unrecorded at full size), indexed per the
+    INDEX_* settings by default.
+    """
+    metadata = {"schema_version": SCHEMA_VERSION}
+    if dimensions or EMBEDDING_DIMENSIONS:
+        metadata["embedding_dimensions"] = dimensions or EMBEDDING_DIMENSIONS
+    return client.create_collection(name=name, metadata=metadata, configuration=configuration or index_configuration())
+
+
+def _backup_name(name: str, version: int) -> str:
+    return f"{name}_v{version}_backup"
+
+
+def recover_interrupted_swap(client, name: str = COLLECTION_NAME) -> bool:
+    """
+    Repairs the collection swap of a migration that stopped half-way (see `migrate_collection`).
+    When `name` is missing but `<name>_v<N>_backup` exists, the migration stopped between its
+    two renames, and the backup, which holds the original posts, gets the name back. When
+    both exist, the swap completed and the backup is dropped, unless it holds more posts than
+    `name` (then both are kept and a warning is logged). Returns True when `name` was restored.
+    """
+    names = [collection.name for collection in client.list_collections()]
+    pattern = re.compile(rf"{re.escape(name)}_v\d+_backup")
+    backups = sorted(other for other in names if pattern.fullmatch(other))
+    if not backups:
+        return False
+    if name in names:
+        live = client.get_collection(name=name).count()
+        for backup in backups:
+            if client.get_collection(name=backup).count() > live:
+                log.warning(f"Kept '{backup}', left by an interrupted migration: it holds more posts than '{name}'. Check it and delete it by hand.")
+            else:
+                client.delete_collection(backup)
+                log.warning(f"Discarded '{backup}', left by a migration that completed.")
+        return False
+    if len(backups) > 1:
+        raise RuntimeError(f"'{name}' is missing and several migration backups exist ({', '.join(backups)}). Rename the right one to '{name}'.")
+    client.get_collection(name=backups[0]).modify(name=name)
+    log.warning(f"Restored '{name}' from '{backups[0]}', left by an interrupted migration.")
+    return True
+
+
+def get_or_create_collection(client, name: str = COLLECTION_NAME):
+    recover_interrupted_swap(client, name)
+    try:
+        return client.get_collection(name=name)
+    except Exception:
+        return create_collection(client, name)
+
+
+def remove_orphaned_segments(path: str = CHROMA_PATH) -> int:
+    """
+    Deletes the on-disk vector segments (one UUID-named directory each) of collections that
+    no longer exist. ChromaDB drops a deleted collection from its catalog (chroma.sqlite3) but
+    can leave these files behind. Returns the bytes freed.
+    """
+    catalog = os.path.join(path, "chroma.sqlite3")
+    if not os.path.exists(catalog):
+        return 0
+    with closing(sqlite3.connect(f"file:{catalog}?mode=ro", uri=True)) as conn:
+        live = {row[0] for row in conn.execute("SELECT id FROM segments")}
+    freed = 0
+    for entry in os.listdir(path):
+        directory = os.path.join(path, entry)
+        try:
+            uuid.UUID(entry)
+        except ValueError:
+            continue
+        if os.path.isdir(directory) and entry not in live:
+            freed += sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names)
+            shutil.rmtree(directory, ignore_errors=True)
+    return freed
+
+
+# --- Migrations ---
+
+def _migrate_v1(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Schema 1 -> 2: drops the caption copy, makes the timestamp numeric and normalizes the hashtags."""
+    return post_metadata(metadata)
+
+
+# Version -> the function that upgrades one post's metadata from that version to the next.
+MIGRATIONS: Dict[int, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    1: _migrate_v1,
+}
+
+
+def _upgrade(metadata: Dict[str, Any], from_version: int) -> Dict[str, Any]:
+    for version in range(from_version, SCHEMA_VERSION):
+        metadata = MIGRATIONS[version](metadata)
+    return metadata
+
+
+def _metadata_bytes(metadatas: List[Dict[str, Any]]) -> int:
+    return sum(len(json.dumps(metadata, ensure_ascii=False).encode("utf-8")) for metadata in metadatas)
+
+
+def migrate_collection(client, name: str = COLLECTION_NAME, dry_run: bool = False, batch_size: int = INDEX_MIGRATION_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Rebuilds collection `name` with the current schema, INDEX_* settings and
+    EMBEDDING_DIMENSIONS, keeping ids and documents, and embeddings (truncated when the
+    size shrinks; growing it takes a re-ingest). Posts are copied in batches into a new collection, which then
+    replaces the old one, so an interrupted migration leaves the original untouched (a
+    leftover copy is discarded on the next run; an interrupted swap is repaired by
+    `recover_interrupted_swap`). Returns the versions, the index settings changed, the posts
+    migrated and the metadata size before and after.
+    """
+    recover_interrupted_swap(client, name)
+    collection = client.get_collection(name=name)
+    from_version = schema_version(collection)
+    changes = index_changes(collection)
+    total = collection.count()
+    report = {
+        "collection": name, "from_version": from_version, "to_version": SCHEMA_VERSION, "posts": total, "dry_run": dry_run,
+        "index_changes": {key: list(values) for key, values in changes.items()},
+    }
+    if from_version >= SCHEMA_VERSION and not changes:
+        report["migrated"] = False
+        return report
+    stored, dimensions = changes.get("dimensions", (None, requested_dimensions(collection)))
+    if stored and dimensions > stored:
+        raise ValueError(
+            f"'{name}' holds {stored}-dimension embeddings, which cannot grow to {dimensions}. "
+            f"Delete ./chroma_db and run 'ingest' again to re-embed at the new size."
+        )
+
+    staging_name = f"{name}_migrating"
+    target = None
+    if not dry_run:
+        try:
+            client.delete_collection(staging_name)
+            log.warning(f"Discarded '{staging_name}' left over by an interrupted migration.")
+        except Exception:
+            pass
+        target = create_collection(client, staging_name, dimensions=dimensions)
+
+    bytes_before = bytes_after = 0
+    include = ["metadatas"] if dry_run else ["embeddings", "documents", "metadatas"]
+    for offset in range(0, total, batch_size):
+        batch = collection.get(include=include, limit=batch_size, offset=offset)
+        upgraded = [_upgrade(metadata or {}, from_version) for metadata in batch["metadatas"]]
+        bytes_before += _metadata_bytes([metadata or {} for metadata in batch["metadatas"]])
+        bytes_after += _metadata_bytes(upgraded)
+        if target is not None:
+            embeddings = truncate_embeddings(batch["embeddings"], dimensions) if stored else batch["embeddings"]
+            target.add(ids=batch["ids"], embeddings=embeddings, documents=batch["documents"], metadatas=upgraded)
+        log.debug(f"Migrated {min(offset + batch_size, total)} of {total} posts.")
+    report.update(metadata_bytes_before=bytes_before, metadata_bytes_after=bytes_after)
+
+    if target is not None:
+        if target.count() != total:
+            client.delete_collection(staging_name)
+            raise RuntimeError(f"Migration copied {target.count()} of {total} posts; '{name}' was left unchanged.")
+        # Swap: the old collection is renamed aside before the new one takes its name. Between the
+        # two renames no collection is called `name`; if the process dies there, the next
+        # `recover_interrupted_swap` (run by this function and by ingest) renames the backup back.
+        backup_name = _backup_name(name, from_version)
+        collection.modify(name=backup_name)
+        target.modify(name=name)
+        client.delete_collection(backup_name)
+        log.success(f"Rebuilt '{name}' with schema {SCHEMA_VERSION} and the configured index ({total} posts).")
+    report["migrated"] = not dry_run
+    return report
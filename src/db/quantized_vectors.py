@@ -0,0 +1,158 @@
+"""
+A compact copy of the post collection's embeddings, quantized to float16 or int8, for exact
+cosine search (EMBEDDING_QUANTIZATION). ChromaDB's local index only holds float32 vectors,
+so with quantization on, semantic queries scan this matrix instead of loading Chroma's
+HNSW index, and read only captions and metadata from Chroma.
+
+Vectors are normalized before quantizing. int8 keeps one scale per vector (symmetric,
+max |x| -> 127): a quarter of the float32 size, and about 1% of recall@10 lost against
+exact float32 search. float16 halves the size with no measurable loss in ranking, but numpy
+converts it slowly, so its scans are several times slower than int8's; prefer int8.
+
+The scan is exact, so its cost grows with the number of posts: below HNSW's latency for a
+brand profile (around a thousand posts, under a millisecond), but above it from the tens of
+thousands (scripts/embedding_storage_benchmark.py measures both).
+
+The matrix is saved next to the collection (`chroma_db/calcularte_posts.<mode>.npz`), keyed
+by the collection id and post count, and rebuilt from Chroma when either changes (after an
+ingest or a migration).
+"""
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from src.db.post_index import CHROMA_PATH, INDEX_MIGRATION_BATCH_SIZE
+from src.utils.logging import log
+
+load_dotenv()
+
+# --- Quantized Vector Settings from .env ---
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "none").lower()  # none, float16 or int8
+
+QUANTIZATION_MODES = ("none", "float16", "int8")
+# Rows dequantized at a time during a scan, to bound the float32 working set.
+SCAN_CHUNK_ROWS = 1024
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+@dataclass
+class QuantizedVectors:
+    """Post ids and their quantized unit-length embeddings; `scales` is set for int8 only."""
+    mode: str
+    ids: List[str]
+    codes: np.ndarray
+    scales: Optional[np.ndarray] = None
+    key: Tuple[str, int] = ("", 0)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def vectors(self, rows: Sequence[int]) -> np.ndarray:
+        """The dequantized (float32) embeddings of `rows`."""
+        vectors = self.codes[list(rows)].astype(np.float32)
+        return vectors * self.scales[list(rows), None] if self.scales is not None else vectors
+
+    def search(self, queries: np.ndarray, k: int) -> List[List[int]]:
+        """For each query, the rows of the `k` most cosine-similar vectors, best first (an exact scan)."""
+        queries = _unit(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        scores = np.empty((len(queries), len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), SCAN_CHUNK_ROWS):
+            chunk = self.codes[start:start + SCAN_CHUNK_ROWS].astype(np.float32)
+            scores[:, start:start + len(chunk)] = queries @ chunk.T
+        if self.scales is not None:
+            scores *= self.scales[None, :]
+        k = min(k, len(self.ids))
+        if k == 0:
+            return [[] for _ in queries]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        return [row[np.argsort(-score[row])].tolist() for row, score in zip(top, scores)]
+
+
+def quantize(ids: List[str], vectors: np.ndarray, mode: str) -> QuantizedVectors:
+    """Normalizes `vectors` (one row per id) and quantizes them to `mode` (float16 or int8)."""
+    vectors = _unit(np.asarray(vectors, dtype=np.float32))
+    if mode == "float16":
+        return QuantizedVectors(mode, list(ids), vectors.astype(np.float16))
+    if mode == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return QuantizedVectors(mode, list(ids), codes, scales.astype(np.float32))
+    raise ValueError(f"Unknown quantization '{mode}'. Use float16 or int8.")
+
+
+def vectors_path(collection_name: str, mode: str, path: str = CHROMA_PATH) -> str:
+    return os.path.join(path, f"{collection_name}.{mode}.npz")
+
+
+def _save(store: QuantizedVectors, file_path: str):
+    arrays = {"ids": np.asarray(store.ids), "codes": store.codes, "key_id": np.asarray(store.key[0]), "key_count": np.asarray(store.key[1])}
+    if store.scales is not None:
+        arrays["scales"] = store.scales
+    temporary = f"{file_path}.tmp.npz"
+    np.savez(temporary, **arrays)
+    os.replace(temporary, file_path)
+
+
+def _load(file_path: str, mode: str) -> Optional[QuantizedVectors]:
+    try:
+        with np.load(file_path) as data:
+            return QuantizedVectors(
+                mode, data["ids"].tolist(), data["codes"], data["scales"] if "scales" in data else None,
+                (str(data["key_id"]), int(data["key_count"])),
+            )
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def build(collection, mode: str, batch_size: int = INDEX_MIGRATION_BATCH_SIZE) -> QuantizedVectors:
+    """Quantizes every embedding of `collection`, reading it in batches."""
+    ids: List[str] = []
+    parts = []
+    for offset in range(0, collection.count(), batch_size):
+        batch = collection.get(include=["embeddings"], limit=batch_size, offset=offset)
+        if len(batch["ids"]):
+            part = quantize(batch["ids"], np.asarray(batch["embeddings"], dtype=np.float32), mode)
+            ids.extend(part.ids)
+            parts.append(part)
+    if not parts:
+        return QuantizedVectors(mode, [], np.zeros((0, 0), dtype=np.int8 if mode == "int8" else np.float16), np.zeros(0, dtype=np.float32) if mode == "int8" else None)
+    scales = np.concatenate([part.scales for part in parts]) if mode == "int8" else None
+    return QuantizedVectors(mode, ids, np.concatenate([part.codes for part in parts]), scales)
+
+
+_cache: Dict[str, QuantizedVectors] = {}
+_cache_lock = threading.Lock()
+
+
+def load_for_collection(collection, mode: str = EMBEDDING_QUANTIZATION, path: str = CHROMA_PATH) -> Optional[QuantizedVectors]:
+    """
+    The quantized vectors of `collection`, from memory, from disk or rebuilt from Chroma,
+    whichever is current; None when quantization is off.
+    """
+    if mode == "none":
+        return None
+    if mode not in QUANTIZATION_MODES:
+        log.warning(f"Unknown EMBEDDING_QUANTIZATION '{mode}'. Use one of: {', '.join(QUANTIZATION_MODES)}. Searching Chroma's index instead.")
+        return None
+    key = (str(collection.id), collection.count())
+    file_path = vectors_path(collection.name, mode, path)
+    with _cache_lock:
+        store = _cache.get(file_path)
+        if store is None or store.key != key:
+            store = _load(file_path, mode)
+        if store is None or store.key != key:
+            log.info(f"Building the {mode} vectors of '{collection.name}' ({key[1]} posts)...")
+            store = build(collection, mode)
+            store.key = key
+            _save(store, file_path)
+        _cache[file_path] = store
+    return store
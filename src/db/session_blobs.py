@@ -0,0 +1,272 @@
+"""
+Content-addressed storage for large payloads in session history.
+
+Maestro passes the same `BrandContext` / `BrandVoiceReport` JSON to tool after tool and gets
+large outputs back, so the session would otherwise store many verbatim copies. Before an
+item is written, every large string (and, inside JSON tool arguments/outputs, every large
+object or array) is stored once in `session_blobs`, keyed by its SHA-256, and replaced by a
+`{"$blob": "<sha256>"}` reference. Items are re-hydrated when read back, byte for byte: a JSON
+field is kept as a parsed document only when one of `JSON_FORMATS` re-serializes it to the
+original string (recorded next to it as "$format"), and stored as a plain string otherwise.
+
+For the history replayed to the model, `compact_repeated_payloads` additionally keeps only
+the most recent copy of a repeated payload and turns earlier copies into a short reference.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+BLOBS_TABLE = "session_blobs"
+BLOB_REF_KEY = "$blob"
+JSON_REF_KEY = "$json"
+JSON_FORMAT_KEY = "$format"
+
+# The json.dumps styles a stored JSON field may be re-serialized with; "default" is also the
+# style of references written before the format was recorded.
+JSON_FORMATS = {
+    "default": {"ensure_ascii": False},
+    "compact": {"ensure_ascii": False, "separators": (",", ":")},
+    "ascii": {},
+    "ascii_compact": {"separators": (",", ":")},
+}
+
+# Item fields that hold JSON documents serialized as strings.
+JSON_FIELDS = ("arguments", "output")
+# Plain-text fields that may be replaced by a reference in the replayed history.
+TEXT_FIELDS = ("text", "content", "arguments", "output")
+
+SESSION_BLOBS_ENABLED = os.getenv("SESSION_BLOBS_ENABLED", "true").lower() == "true"
+SESSION_BLOB_MIN_BYTES = int(os.getenv("SESSION_BLOB_MIN_BYTES", 1024))
+SESSION_COMPACT_REPLAY = os.getenv("SESSION_COMPACT_REPLAY", "true").lower() == "true"
+
+BLOB_REF_PATTERN = re.compile(r'"\$blob":\s*"([0-9a-f]{64})"')
+
+
+def ensure_blob_table(conn: sqlite3.Connection):
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {BLOBS_TABLE} (
+            hash TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _digest(data: str) -> str:
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _parse_json_field(value: str) -> Any:
+    """The parsed document if `value` is a JSON object/array string, otherwise None."""
+    if value[:1] not in ("{", "["):
+        return None
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return None
+
+
+def _is_ref(value: Any, key: str) -> bool:
+    return isinstance(value, dict) and len(value) == 1 and key in value
+
+
+def _is_json_ref(value: Any) -> bool:
+    return isinstance(value, dict) and JSON_REF_KEY in value and set(value) <= {JSON_REF_KEY, JSON_FORMAT_KEY}
+
+
+def _json_format(value: str, document: Any) -> Optional[str]:
+    """The name of the `JSON_FORMATS` style that serializes `document` back to exactly `value`, if any."""
+    for name, options in JSON_FORMATS.items():
+        if json.dumps(document, **options) == value:
+            return name
+    return None
+
+
+# --- Storing ---
+
+def externalize(item: Dict[str, Any], min_bytes: int = SESSION_BLOB_MIN_BYTES) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Replaces the large payloads of one session item with blob references.
+    Returns the compact item and the blobs it references, as {hash: JSON-encoded value}.
+    """
+    blobs: Dict[str, str] = {}
+
+    def store(value: Any) -> Dict[str, str]:
+        data = _canonical(value)
+        digest = _digest(data)
+        blobs[digest] = data
+        return {BLOB_REF_KEY: digest}
+
+    def walk_document(value: Any) -> Any:
+        # Inside a JSON document: children first, so a repeated BrandContext nested in
+        # otherwise different tool arguments still gets its own blob.
+        if isinstance(value, dict):
+            value = {k: walk_document(v) for k, v in value.items()}
+        elif isinstance(value, list):
+            value = [walk_document(v) for v in value]
+        elif not isinstance(value, str):
+            return value
+        return store(value) if len(_canonical(value)) >= min_bytes else value
+
+    def walk(key: str, value: Any) -> Any:
+        if isinstance(value, str):
+            if len(value) < min_bytes:
+                return value
+            if key in JSON_FIELDS:
+                document = _parse_json_field(value)
+                style = _json_format(value, document) if document is not None else None
+                if style is not None:
+                    ref = {JSON_REF_KEY: walk_document(document)}
+                    if style != "default":
+                        ref[JSON_FORMAT_KEY] = style
+                    return ref
+            return store(value)
+        if isinstance(value, dict):
+            return {k: walk(k, v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [walk(key, v) for v in value]
+        return value
+
+    return {key: walk(key, value) for key, value in item.items()}, blobs
+
+
+def save_blobs(conn: sqlite3.Connection, blobs: Dict[str, str]):
+    conn.executemany(
+        f"INSERT OR IGNORE INTO {BLOBS_TABLE} (hash, data, size) VALUES (?, ?, ?)",
+        [(digest, data, len(data)) for digest, data in blobs.items()],
+    )
+
+
+# --- Loading ---
+
+def _collect_refs(value: Any, refs: Set[str]):
+    if isinstance(value, dict):
+        if _is_ref(value, BLOB_REF_KEY):
+            refs.add(value[BLOB_REF_KEY])
+            return
+        for v in value.values():
+            _collect_refs(v, refs)
+    elif isinstance(value, list):
+        for v in value:
+            _collect_refs(v, refs)
+
+
+def load_blobs(conn: sqlite3.Connection, refs: Iterable[str]) -> Dict[str, Any]:
+    """Fetches the referenced blobs (and the blobs they reference) as decoded values."""
+    loaded: Dict[str, Any] = {}
+    pending = set(refs)
+    while pending:
+        batch = list(pending)[:500]
+        pending.difference_update(batch)
+        placeholders = ",".join("?" * len(batch))
+        for digest, data in conn.execute(f"SELECT hash, data FROM {BLOBS_TABLE} WHERE hash IN ({placeholders})", batch):
+            loaded[digest] = json.loads(data)
+            nested: Set[str] = set()
+            _collect_refs(loaded[digest], nested)
+            pending.update(nested - loaded.keys())
+    return loaded
+
+
+def _rehydrate(value: Any, blobs: Dict[str, Any]) -> Any:
+    if isinstance(value, dict):
+        if _is_ref(value, BLOB_REF_KEY):
+            return _rehydrate(blobs[value[BLOB_REF_KEY]], blobs)
+        if _is_json_ref(value):
+            options = JSON_FORMATS[value.get(JSON_FORMAT_KEY, "default")]
+            return json.dumps(_rehydrate(value[JSON_REF_KEY], blobs), **options)
+        return {k: _rehydrate(v, blobs) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_rehydrate(v, blobs) for v in value]
+    return value
+
+
+def hydrate_items(conn: sqlite3.Connection, items: List[Any]) -> List[Any]:
+    """Restores the payloads of stored items from their blob references."""
+    refs: Set[str] = set()
+    for item in items:
+        _collect_refs(item, refs)
+    blobs = load_blobs(conn, refs) if refs else {}
+    return [_rehydrate(item, blobs) for item in items]
+
+
+# --- Replay compaction ---
+
+def _reference_text(digest: str) -> str:
+    return f"[Repeated payload {digest[:12]}: same content as another copy kept in full elsewhere in this conversation.]"
+
+
+def compact_repeated_payloads(items: List[Any], min_bytes: int = SESSION_BLOB_MIN_BYTES) -> List[Any]:
+    """
+    Returns the items with every large payload that appears again later in the history
+    replaced by a short reference, so the model reads each payload once (its latest copy).
+    Only free-text fields and the inside of JSON tool arguments/outputs are rewritten, so
+    the items keep the shape the model API expects.
+    """
+    seen: Set[str] = set()
+
+    def compact_document(value: Any) -> Any:
+        if isinstance(value, (dict, list, str)):
+            data = _canonical(value)
+            if len(data) >= min_bytes:
+                digest = _digest(data)
+                if digest in seen:
+                    return _reference_text(digest)
+                seen.add(digest)
+        if isinstance(value, dict):
+            return {k: compact_document(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [compact_document(v) for v in value]
+        return value
+
+    def compact(key: str, value: Any) -> Any:
+        if isinstance(value, str):
+            if key not in TEXT_FIELDS or len(value) < min_bytes:
+                return value
+            document = _parse_json_field(value) if key in JSON_FIELDS else None
+            if document is not None:
+                compacted = compact_document(document)
+                return value if compacted == document else json.dumps(compacted, ensure_ascii=False)
+            return compact_document(value)
+        if isinstance(value, dict):
+            return {k: compact(k, v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [compact(key, v) for v in value]
+        return value
+
+    # Walk newest-first so the latest copy of each payload is the one kept.
+    compacted = [compact("", item) if isinstance(item, dict) else item for item in reversed(items)]
+    return list(reversed(compacted))
+
+
+# --- Maintenance ---
+
+def delete_unreferenced_blobs(conn: sqlite3.Connection, messages_table: str) -> int:
+    """Deletes blobs no stored message (directly or through another blob) refers to."""
+    referenced: Set[str] = set()
+    for (message_data,) in conn.execute(f"SELECT message_data FROM {messages_table} WHERE message_data LIKE '%\"$blob\"%'"):
+        referenced.update(BLOB_REF_PATTERN.findall(message_data))
+    pending = set(referenced)
+    while pending:
+        batch = list(pending)[:500]
+        pending.difference_update(batch)
+        placeholders = ",".join("?" * len(batch))
+        for (data,) in conn.execute(f"SELECT data FROM {BLOBS_TABLE} WHERE hash IN ({placeholders})", batch):
+            nested = set(BLOB_REF_PATTERN.findall(data)) - referenced
+            referenced.update(nested)
+            pending.update(nested)
+
+    stored = [row[0] for row in conn.execute(f"SELECT hash FROM {BLOBS_TABLE}")]
+    orphans = [(digest,) for digest in stored if digest not in referenced]
+    conn.executemany(f"DELETE FROM {BLOBS_TABLE} WHERE hash = ?", orphans)
+    conn.commit()
+    return len(orphans)
@@ -0,0 +1,333 @@
+"""
+SQLite-level helpers for the session database (`SESSION_DB_FILE`): connection tuning,
+extra indexes, cached per-session statistics, streaming reads for `session inspect` and
+the maintenance operations behind `session list`, `session prune` and `session vacuum`.
+
+The tables themselves (`agent_sessions`, `agent_messages`) belong to the Agents SDK's
+SQLiteSession. This module only adds indexes, its own `session_stats` table, the payload
+blobs (session_blobs.py) and the full-text index (session_search.py), and it never imports
+the SDK, so the maintenance commands stay fast.
+"""
+import json
+import os
+import re
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from src.db.session_blobs import delete_unreferenced_blobs, ensure_blob_table, hydrate_items
+from src.db.session_search import FTS_TABLE, INDEX_STATE_TABLE, ensure_search_index, index_new_items, search_entries
+from src.utils.logging import log
+
+SESSIONS_TABLE = "agent_sessions"
+MESSAGES_TABLE = "agent_messages"
+STATS_TABLE = "session_stats"
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 16384))
+
+DURATION_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([mhdw])\s*$", re.IGNORECASE)
+DURATION_UNITS = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+INSPECT_BATCH_SIZE = 200
+
+
+def configure_connection(conn: sqlite3.Connection):
+    """Applies the pragmas every session-database connection should use."""
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode=WAL")
+    # With WAL, NORMAL only risks the last transactions on power loss, never corruption.
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+
+def ensure_indexes(conn: sqlite3.Connection):
+    """Indexes for time-based queries (prune, `--since`) and the statistics table."""
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{MESSAGES_TABLE}_created_at ON {MESSAGES_TABLE} (created_at)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{SESSIONS_TABLE}_updated_at ON {SESSIONS_TABLE} (updated_at)")
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {STATS_TABLE} (
+            session_id TEXT PRIMARY KEY,
+            counted_until_id INTEGER NOT NULL DEFAULT 0,
+            item_count INTEGER NOT NULL DEFAULT 0,
+            byte_count INTEGER NOT NULL DEFAULT 0,
+            token_count INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+
+
+def _create_sdk_tables(conn: sqlite3.Connection):
+    # Same schema as the SDK's SQLiteSession, so the maintenance commands work on a fresh file.
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {SESSIONS_TABLE} (
+            session_id TEXT PRIMARY KEY,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {MESSAGES_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            message_data TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES {SESSIONS_TABLE} (session_id) ON DELETE CASCADE
+        )
+        """
+    )
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{MESSAGES_TABLE}_session_id ON {MESSAGES_TABLE} (session_id, id)")
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """Opens a tuned connection to the session database, creating the schema if needed."""
+    conn = sqlite3.connect(db_path)
+    configure_connection(conn)
+    _create_sdk_tables(conn)
+    ensure_indexes(conn)
+    ensure_blob_table(conn)
+    ensure_search_index(conn, MESSAGES_TABLE)
+    conn.commit()
+    return conn
+
+
+def parse_duration(text: str) -> timedelta:
+    """Parses durations like '90m', '12h', '30d' or '2w'."""
+    match = DURATION_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Invalid duration '{text}'. Use a number followed by m, h, d or w (e.g. 30d).")
+    amount, unit = float(match.group(1)), match.group(2).lower()
+    return timedelta(**{DURATION_UNITS[unit]: amount})
+
+
+def sqlite_timestamp(moment: datetime) -> str:
+    """Formats a datetime like SQLite's CURRENT_TIMESTAMP (UTC), so the two compare as text."""
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def parse_since(text: str) -> datetime:
+    """Parses a `--since` value: a duration back from now ('2h', '3d') or an ISO date/time (UTC if naive)."""
+    try:
+        return datetime.now(timezone.utc) - parse_duration(text)
+    except ValueError:
+        pass
+    try:
+        moment = datetime.fromisoformat(text.strip())
+    except ValueError:
+        raise ValueError(f"Invalid time '{text}'. Use a duration like 2h or 3d, or a date like 2025-01-31 or 2025-01-31T14:00.")
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def item_kind(item: Any) -> str:
+    """The item's `type`, or its role for plain chat messages (which have no `type`)."""
+    if not isinstance(item, dict):
+        return type(item).__name__
+    return item.get("type") or item.get("role") or "message"
+
+
+def iter_session_items(
+    db_path: str,
+    session_id: str,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    kinds: Sequence[str] = (),
+    pattern: Optional[re.Pattern] = None,
+    since: Optional[datetime] = None,
+) -> Iterator[Tuple[int, str, Any]]:
+    """
+    Yields `(id, created_at, item)` for a session's stored items, oldest first, reading and
+    re-hydrating them in batches so memory stays bounded however long the session is.
+
+    `kinds` keeps items whose `type` or `role` is listed, `since` keeps items created at or
+    after that moment, and `pattern` keeps items whose JSON text matches. `offset` and `limit`
+    apply after filtering. Type and time filters run in SQL; `pattern` needs the hydrated item.
+    """
+    if not os.path.exists(db_path) or (limit is not None and limit <= 0):
+        return
+    where, params = ["session_id = ?"], [session_id]
+    if kinds:
+        placeholders = ",".join("?" * len(kinds))
+        where.append(
+            f"(json_extract(message_data, '$.type') IN ({placeholders}) OR json_extract(message_data, '$.role') IN ({placeholders}))"
+        )
+        params += list(kinds) * 2
+    if since is not None:
+        where.append("created_at >= ?")
+        params.append(sqlite_timestamp(since))
+    query = f"SELECT id, created_at, message_data FROM {MESSAGES_TABLE} WHERE {' AND '.join(where)} ORDER BY id"
+    if pattern is None:
+        # Without a text filter the database can skip and stop for us.
+        query += " LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+        offset, limit = 0, None
+
+    with closing(connect(db_path)) as conn:
+        cursor = conn.execute(query, params)
+        skipped = yielded = 0
+        while True:
+            rows = cursor.fetchmany(INSPECT_BATCH_SIZE)
+            if not rows:
+                return
+            parsed = []
+            for row_id, created_at, message_data in rows:
+                try:
+                    parsed.append((row_id, created_at, json.loads(message_data)))
+                except (json.JSONDecodeError, TypeError):
+                    log.warning(f"Skipping unreadable item {row_id} in session '{session_id}'.")
+            items = hydrate_items(conn, [item for _, _, item in parsed])
+            for (row_id, created_at, _), item in zip(parsed, items):
+                if pattern is not None and not pattern.search(json.dumps(item, ensure_ascii=False)):
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                yield row_id, created_at, item
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
+
+
+def search_session(
+    db_path: str,
+    session_id: str,
+    text: Optional[str] = None,
+    asset_types: Sequence[str] = (),
+    kinds: Sequence[str] = (),
+    since: Optional[datetime] = None,
+    limit: int = 5,
+    by_relevance: bool = False,
+    any_word: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Searches a session's full-text index (see src/db/session_search.py), first indexing any
+    messages stored before the index existed. Entries come newest first unless `by_relevance`.
+    """
+    if not os.path.exists(db_path):
+        return []
+    with closing(connect(db_path)) as conn:
+        index_new_items(conn, session_id, MESSAGES_TABLE)
+        conn.commit()
+        return search_entries(
+            conn, session_id, text=text, asset_types=asset_types, kinds=kinds,
+            since=sqlite_timestamp(since) if since else None, limit=limit, by_relevance=by_relevance, any_word=any_word,
+        )
+
+
+def _refresh_stats(conn: sqlite3.Connection, session_ids: Iterable[str]):
+    """Tokenizes only the messages added since each session's statistics were last updated."""
+    from src.utils.token_counter import count_item_tokens
+
+    for session_id in session_ids:
+        row = conn.execute(
+            f"SELECT counted_until_id, item_count, byte_count, token_count FROM {STATS_TABLE} WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        counted_until_id, item_count, byte_count, token_count = row or (0, 0, 0, 0)
+
+        latest_id = conn.execute(f"SELECT MAX(id) FROM {MESSAGES_TABLE} WHERE session_id = ?", (session_id,)).fetchone()[0] or 0
+        still_counted = conn.execute(
+            f"SELECT COUNT(*) FROM {MESSAGES_TABLE} WHERE session_id = ? AND id <= ?", (session_id, counted_until_id)
+        ).fetchone()[0]
+        if still_counted != item_count:
+            # Items were removed (cleared or popped) since the last count: start over.
+            counted_until_id, item_count, byte_count, token_count = 0, 0, 0, 0
+        elif row and latest_id == counted_until_id:
+            continue
+
+        rows = conn.execute(
+            f"SELECT id, message_data FROM {MESSAGES_TABLE} WHERE session_id = ? AND id > ? ORDER BY id",
+            (session_id, counted_until_id),
+        ).fetchall()
+        new_items = []
+        for _, message_data in rows:
+            try:
+                new_items.append(json.loads(message_data))
+            except (json.JSONDecodeError, TypeError):
+                continue
+        new_items = hydrate_items(conn, new_items)
+        conn.execute(
+            f"INSERT OR REPLACE INTO {STATS_TABLE} (session_id, counted_until_id, item_count, byte_count, token_count) VALUES (?, ?, ?, ?, ?)",
+            (
+                session_id,
+                max(latest_id, counted_until_id),
+                item_count + len(rows),
+                byte_count + sum(len(message_data) for _, message_data in rows),
+                token_count + count_item_tokens(new_items),
+            ),
+        )
+    conn.commit()
+
+
+def list_sessions(db_path: str) -> List[Dict]:
+    """
+    Returns every stored session, most recently updated first, with its item count,
+    stored size in bytes and token count. The statistics are cached in `session_stats`
+    and only new messages are read, so listing stays fast as sessions accumulate.
+    """
+    if not os.path.exists(db_path):
+        return []
+    with closing(connect(db_path)) as conn:
+        session_ids = [row[0] for row in conn.execute(f"SELECT session_id FROM {SESSIONS_TABLE}")]
+        _refresh_stats(conn, session_ids)
+        rows = conn.execute(
+            f"""
+            SELECT s.session_id, s.created_at, s.updated_at,
+                   COALESCE(st.item_count, 0), COALESCE(st.token_count, 0), COALESCE(st.byte_count, 0)
+            FROM {SESSIONS_TABLE} s
+            LEFT JOIN {STATS_TABLE} st ON st.session_id = s.session_id
+            ORDER BY s.updated_at DESC
+            """
+        ).fetchall()
+    return [
+        {"session_id": sid, "created_at": created, "updated_at": updated, "items": items, "tokens": tokens, "bytes": size}
+        for sid, created, updated, items, tokens, size in rows
+    ]
+
+
+def prune_sessions(db_path: str, older_than: timedelta, keep: Iterable[str] = (), dry_run: bool = False) -> List[str]:
+    """Deletes sessions not updated within `older_than` (except `keep`) and returns their IDs."""
+    if not os.path.exists(db_path):
+        return []
+    cutoff = sqlite_timestamp(datetime.now(timezone.utc) - older_than)
+    keep = set(keep)
+    with closing(connect(db_path)) as conn:
+        stale = [
+            row[0]
+            for row in conn.execute(f"SELECT session_id FROM {SESSIONS_TABLE} WHERE updated_at < ?", (cutoff,))
+            if row[0] not in keep
+        ]
+        if stale and not dry_run:
+            for table in (MESSAGES_TABLE, STATS_TABLE, INDEX_STATE_TABLE, SESSIONS_TABLE):
+                conn.executemany(f"DELETE FROM {table} WHERE session_id = ?", [(sid,) for sid in stale])
+            conn.commit()
+            log.info(f"Pruned {len(stale)} sessions last updated before {cutoff} UTC.")
+    return stale
+
+
+def database_size(db_path: str) -> int:
+    """Size of the database including its WAL and shared-memory files, in bytes."""
+    return sum(os.path.getsize(path) for path in (db_path, f"{db_path}-wal", f"{db_path}-shm") if os.path.exists(path))
+
+
+def vacuum(db_path: str) -> Dict[str, int]:
+    """
+    Drops payload blobs no longer referenced by any session, merges the search index,
+    checkpoints the WAL and rebuilds the database file. Returns the size before and after and the blobs removed.
+    """
+    before = database_size(db_path)
+    conn = connect(db_path)
+    try:
+        removed_blobs = delete_unreferenced_blobs(conn, MESSAGES_TABLE)
+        conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        conn.commit()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA optimize")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    return {"bytes_before": before, "bytes_after": database_size(db_path), "blobs_removed": removed_blobs}
@@ -0,0 +1,265 @@
+"""
+Local full-text index over session history (SQLite FTS5), so earlier content can be found
+without asking a model to re-read the transcript.
+
+Every stored item that carries readable content becomes a row of `session_entries`: user
+and assistant messages, and the outputs of the creative tools, typed by the tool that made
+them (`TOOL_ASSET_TYPES`, e.g. captions, ideas, image prompts). The index is brought up to
+date in the same transaction that appends items (BlobStoringSession) and caught up lazily
+for history written before it existed. Deleting messages (clear, pop, prune) deletes their
+entries through a trigger.
+"""
+import json
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional, Sequence
+from src.db.session_blobs import hydrate_items
+
+ENTRIES_TABLE = "session_entries"
+FTS_TABLE = "session_entries_fts"
+INDEX_STATE_TABLE = "session_index_state"
+
+SESSION_SEARCH_ENABLED = os.getenv("SESSION_SEARCH_ENABLED", "true").lower() == "true"
+
+# Tool -> the kind of asset its output is. Outputs of other tools (brand samples, context
+# lookups) are brand data rather than session content and are not indexed.
+TOOL_ASSET_TYPES = {
+    "generate_creative_ideas": "ideas",
+    "write_post_caption": "caption",
+    "create_image_prompts": "image_prompts",
+    "create_complete_posts": "complete_posts",
+    "refine_creative_content": "revision",
+    "propose_content_plan": "content_plan",
+    "generate_brand_voice_report": "brand_report",
+    "propose_wildcard_angle": "wildcard_angle",
+}
+ASSET_TYPES = tuple(sorted(set(TOOL_ASSET_TYPES.values())))
+
+# Argument paths that name what a tool call was about; the first one present titles its output.
+TITLE_ARGUMENT_PATHS = (
+    ("post_idea", "title"),
+    ("art_director_input", "post_idea", "title"),
+    ("ideas_input",),
+    ("revision_input",),
+    ("plan_input",),
+    ("pillar",),
+)
+TITLE_MAX_CHARS = 200
+
+INDEX_BATCH_SIZE = 500
+
+
+def ensure_search_index(conn: sqlite3.Connection, messages_table: str = "agent_messages"):
+    """Creates the entries table, its FTS5 index and the triggers keeping both in sync."""
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {ENTRIES_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            message_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            asset_type TEXT,
+            tool_name TEXT,
+            call_id TEXT,
+            title TEXT NOT NULL DEFAULT '',
+            body TEXT NOT NULL DEFAULT '',
+            created_at TIMESTAMP
+        )
+        """
+    )
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{ENTRIES_TABLE}_asset ON {ENTRIES_TABLE} (session_id, asset_type, id)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{ENTRIES_TABLE}_call ON {ENTRIES_TABLE} (session_id, call_id)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{ENTRIES_TABLE}_message ON {ENTRIES_TABLE} (message_id)")
+    conn.execute(
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            title, body, content='{ENTRIES_TABLE}', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {ENTRIES_TABLE}_ai AFTER INSERT ON {ENTRIES_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (new.id, new.title, new.body);
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {ENTRIES_TABLE}_ad AFTER DELETE ON {ENTRIES_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {messages_table}_search_ad AFTER DELETE ON {messages_table} BEGIN
+            DELETE FROM {ENTRIES_TABLE} WHERE message_id = old.id;
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {INDEX_STATE_TABLE} (
+            session_id TEXT PRIMARY KEY,
+            indexed_until_id INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+
+
+# --- Extracting entries ---
+
+def item_text(item: Any) -> str:
+    """The readable content of a session item (message text, tool call or tool output)."""
+    if not isinstance(item, dict):
+        return str(item)
+    if item.get("type") == "function_call":
+        return f"{item.get('name', '')}({item.get('arguments', '')})"
+    if item.get("type") == "function_call_output":
+        text = item.get("output", "")
+    else:
+        text = item.get("content", item.get("summary", ""))
+        if isinstance(text, list):
+            text = "\n".join(part.get("text", "") for part in text if isinstance(part, dict) and part.get("text"))
+    return text if isinstance(text, str) else json.dumps(text, ensure_ascii=False)
+
+
+def _call_title(arguments: str) -> str:
+    try:
+        args = json.loads(arguments or "{}")
+    except json.JSONDecodeError:
+        return ""
+    for path in TITLE_ARGUMENT_PATHS:
+        value = args
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, str) and value.strip():
+            return " ".join(value.split())[:TITLE_MAX_CHARS]
+    return ""
+
+
+def _entry_for(conn: sqlite3.Connection, session_id: str, item: Any) -> Optional[Dict[str, Any]]:
+    if not isinstance(item, dict):
+        return None
+    kind = item.get("type") or "message"
+    if kind == "message":
+        role = item.get("role")
+        if role not in ("user", "assistant"):
+            return None
+        body = item_text(item)
+        return {"kind": role, "body": body} if body.strip() else None
+    if kind == "function_call":
+        name = item.get("name", "")
+        return {"kind": kind, "tool_name": name, "call_id": item.get("call_id"), "title": _call_title(item.get("arguments", ""))}
+    if kind == "function_call_output":
+        call = conn.execute(
+            f"SELECT tool_name, title FROM {ENTRIES_TABLE} WHERE session_id = ? AND call_id = ? AND kind = 'function_call'",
+            (session_id, item.get("call_id")),
+        ).fetchone()
+        tool_name, title = call or (None, "")
+        asset_type = TOOL_ASSET_TYPES.get(tool_name)
+        if asset_type is None:
+            return None
+        return {"kind": kind, "asset_type": asset_type, "tool_name": tool_name, "call_id": item.get("call_id"), "title": title, "body": item_text(item)}
+    return None
+
+
+def index_new_items(conn: sqlite3.Connection, session_id: str, messages_table: str = "agent_messages") -> int:
+    """
+    Indexes the session's messages added since the last call and returns how many entries
+    were written. Runs inside the caller's transaction; the caller commits.
+    """
+    row = conn.execute(f"SELECT indexed_until_id FROM {INDEX_STATE_TABLE} WHERE session_id = ?", (session_id,)).fetchone()
+    indexed_until_id = row[0] if row else 0
+    written = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT id, created_at, message_data FROM {messages_table} WHERE session_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (session_id, indexed_until_id, INDEX_BATCH_SIZE),
+        ).fetchall()
+        if not rows:
+            break
+        parsed = []
+        for message_id, created_at, message_data in rows:
+            try:
+                parsed.append((message_id, created_at, json.loads(message_data)))
+            except (json.JSONDecodeError, TypeError):
+                continue
+        items = hydrate_items(conn, [item for _, _, item in parsed])
+        for (message_id, created_at, _), item in zip(parsed, items):
+            # One at a time: an output looks up the title of its call, which may be in this batch.
+            entry = _entry_for(conn, session_id, item)
+            if entry is None:
+                continue
+            conn.execute(
+                f"""
+                INSERT INTO {ENTRIES_TABLE} (session_id, message_id, kind, asset_type, tool_name, call_id, title, body, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    session_id, message_id, entry["kind"], entry.get("asset_type"), entry.get("tool_name"),
+                    entry.get("call_id"), entry.get("title", ""), entry.get("body", ""), created_at,
+                ),
+            )
+            written += 1
+        indexed_until_id = rows[-1][0]
+    conn.execute(
+        f"INSERT OR REPLACE INTO {INDEX_STATE_TABLE} (session_id, indexed_until_id) VALUES (?, ?)", (session_id, indexed_until_id)
+    )
+    return written
+
+
+# --- Searching ---
+
+def to_match_query(text: str, any_word: bool = False) -> str:
+    """
+    Turns free text into an FTS5 query that cannot fail to parse: every word is quoted, and
+    all words must match (or any word, with `any_word`, ranked by relevance).
+    """
+    words = ['"' + word.replace('"', '""') + '"' for word in text.split()]
+    return (" OR " if any_word else " ").join(words)
+
+
+def search_entries(
+    conn: sqlite3.Connection,
+    session_id: str,
+    text: Optional[str] = None,
+    asset_types: Sequence[str] = (),
+    kinds: Sequence[str] = (),
+    since: Optional[str] = None,
+    limit: int = 5,
+    by_relevance: bool = False,
+    any_word: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Returns matching entries, newest first (or best first, with `by_relevance`). `text` is
+    matched against titles and bodies through the FTS index; `since` is a SQLite timestamp.
+    """
+    where, params = ["e.session_id = ?", "e.body != ''"], [session_id]
+    if asset_types:
+        where.append(f"e.asset_type IN ({','.join('?' * len(asset_types))})")
+        params += list(asset_types)
+    if kinds:
+        where.append(f"e.kind IN ({','.join('?' * len(kinds))})")
+        params += list(kinds)
+    if since:
+        where.append("e.created_at >= ?")
+        params.append(since)
+
+    columns = "e.id, e.kind, e.asset_type, e.tool_name, e.title, e.body, e.created_at"
+    match_query = to_match_query(text, any_word) if text and text.strip() else ""
+    if match_query:
+        order = f"bm25({FTS_TABLE}, 5.0, 1.0)" if by_relevance else "e.id DESC"
+        query = (
+            f"SELECT {columns} FROM {FTS_TABLE} JOIN {ENTRIES_TABLE} e ON e.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH ? AND {' AND '.join(where)} ORDER BY {order} LIMIT ?"
+        )
+        params = [match_query] + params
+    else:
+        query = f"SELECT {columns} FROM {ENTRIES_TABLE} e WHERE {' AND '.join(where)} ORDER BY e.id DESC LIMIT ?"
+    params.append(limit)
+    return [
+        {"id": row[0], "kind": row[1], "asset_type": row[2], "tool_name": row[3], "title": row[4], "body": row[5], "created_at": row[6]}
+        for row in conn.execute(query, params)
+    ]
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import os
+import sqlite3
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, ClassVar, List, Optional, Set
+from agents import RunHooks, SQLiteSession
+from agents.memory import SessionABC
+from agents.memory.session_settings import resolve_session_limit
+from pydantic import BaseModel
+from src.db.session_blobs import (
+    SESSION_BLOBS_ENABLED,
+    SESSION_COMPACT_REPLAY,
+    compact_repeated_payloads,
+    ensure_blob_table,
+    externalize,
+    hydrate_items,
+    save_blobs,
+)
+from src.db.session_db import configure_connection, ensure_indexes
+from src.db.session_search import SESSION_SEARCH_ENABLED, ensure_search_index, index_new_items
+from src.utils.logging import log
+
+CANCELLED_TOOL_OUTPUT = "Cancelled by the user before this tool finished."
+
+
+class TunedSQLiteSession(SQLiteSession):
+    """
+    SQLiteSession using the session database's tuned pragmas (WAL, NORMAL sync, busy timeout,
+    larger page cache) and extra indexes. The schema check runs once per database file per
+    process instead of on every construction; each worker thread keeps reusing its connection.
+    """
+
+    _initialized_paths: ClassVar[Set[str]] = set()
+
+    @staticmethod
+    def _configure_connection(conn: sqlite3.Connection) -> None:
+        configure_connection(conn)
+
+    def _init_db_for_connection(self, conn: sqlite3.Connection) -> None:
+        path_key = None if self._is_memory_db else os.path.abspath(str(self.db_path))
+        if path_key in TunedSQLiteSession._initialized_paths:
+            return
+        super()._init_db_for_connection(conn)
+        ensure_indexes(conn)
+        ensure_blob_table(conn)
+        ensure_search_index(conn, self.messages_table)
+        conn.commit()
+        if path_key:
+            TunedSQLiteSession._initialized_paths.add(path_key)
+
+
+class BlobStoringSession(TunedSQLiteSession):
+    """
+    TunedSQLiteSession that stores large payloads once, by content hash, in `session_blobs`
+    (see src/db/session_blobs.py) and re-hydrates them on load. `get_items`, which feeds the
+    model, also collapses payloads repeated across the history into compact references
+    (SESSION_COMPACT_REPLAY); `get_full_items` returns the history exactly as it was added.
+    Appended items are added to the session's full-text index in the same transaction
+    (see src/db/session_search.py).
+    """
+
+    def _insert_items(self, conn: sqlite3.Connection, items: List[Any]) -> None:
+        if SESSION_BLOBS_ENABLED:
+            stored_items, blobs = [], {}
+            for item in items:
+                stored_item, item_blobs = externalize(item)
+                stored_items.append(stored_item)
+                blobs.update(item_blobs)
+            save_blobs(conn, blobs)
+            items = stored_items
+        super()._insert_items(conn, items)
+        if SESSION_SEARCH_ENABLED:
+            index_new_items(conn, self.session_id, self.messages_table)
+
+    def _hydrate_sync(self, items: List[Any]) -> List[Any]:
+        with self._locked_connection() as conn:
+            return hydrate_items(conn, items)
+
+    async def get_full_items(self, limit: Optional[int] = None) -> List[Any]:
+        items = await super().get_items(limit)
+        return await asyncio.to_thread(self._hydrate_sync, items)
+
+    async def get_items(self, limit: Optional[int] = None) -> List[Any]:
+        items = await self.get_full_items(limit)
+        return compact_repeated_payloads(items) if SESSION_COMPACT_REPLAY else items
+
+    async def pop_item(self) -> Optional[Any]:
+        item = await super().pop_item()
+        if item is None:
+            return None
+        return (await asyncio.to_thread(self._hydrate_sync, [item]))[0]
+
+
+class WriteBehindSession(SessionABC):
+    """
+    Serves a session's history from memory and persists every change to the wrapped
+    SQLiteSession on a background task, in order. Meant for long-lived processes (the
+    interactive REPL) that should never wait on SQLite between or during turns.
+
+    Call `load()` before use and `close()` (or at least `flush()`) before exiting.
+    """
+
+    def __init__(self, backing: SessionABC):
+        self.session_id = backing.session_id
+        self.session_settings = backing.session_settings
+        self._backing = backing
+        self._items: List[Any] = []
+        self._writes: "asyncio.Queue[tuple]" = asyncio.Queue()
+        self._writer: Optional[asyncio.Task] = None
+
+    async def load(self):
+        """Reads the stored history once and starts the background writer."""
+        self._items = await getattr(self._backing, "get_full_items", self._backing.get_items)()
+        self._writer = asyncio.ensure_future(self._write_loop())
+        log.info(f"Loaded {len(self._items)} items for session '{self.session_id}' into memory.")
+
+    async def _write_loop(self):
+        while True:
+            write, args = await self._writes.get()
+            try:
+                await write(*args)
+            except Exception as e:
+                log.error(f"Background write to session '{self.session_id}' failed: {e}")
+            finally:
+                self._writes.task_done()
+
+    def _enqueue(self, write: Callable[..., Awaitable[Any]], *args):
+        self._writes.put_nowait((write, args))
+
+    async def get_full_items(self, limit: Optional[int] = None) -> List[Any]:
+        limit = resolve_session_limit(limit, self.session_settings)
+        if limit is None:
+            return list(self._items)
+        return list(self._items[-limit:]) if limit > 0 else []
+
+    async def get_items(self, limit: Optional[int] = None) -> List[Any]:
+        items = await self.get_full_items(limit)
+        return compact_repeated_payloads(items) if SESSION_COMPACT_REPLAY else items
+
+    async def add_items(self, items: List[Any]) -> None:
+        if not items:
+            return
+        self._items.extend(items)
+        self._enqueue(self._backing.add_items, list(items))
+
+    async def pop_item(self) -> Optional[Any]:
+        if not self._items:
+            return None
+        item = self._items.pop()
+        self._enqueue(self._backing.pop_item)
+        return item
+
+    async def clear_session(self) -> None:
+        self._items.clear()
+        self._enqueue(self._backing.clear_session)
+
+    async def flush(self):
+        """Waits until every queued write has reached SQLite."""
+        await self._writes.join()
+
+    async def close(self):
+        await self.flush()
+        if self._writer:
+            self._writer.cancel()
+
+
+@dataclass
+class CompletedToolCall:
+    call_id: str
+    name: str
+    arguments: str
+    output: str
+
+
+class ToolResultRecorder(RunHooks):
+    """Run hooks that remember every tool call as soon as it finishes, so a cancelled turn can keep them."""
+
+    def __init__(self):
+        self.completed: List[CompletedToolCall] = []
+
+    async def on_tool_end(self, context, agent, tool, result) -> None:
+        call_id = getattr(context, "tool_call_id", None)
+        if not call_id:
+            return
+        if isinstance(result, BaseModel):
+            output = result.model_dump_json()
+        elif isinstance(result, (dict, list)):
+            output = json.dumps(result, ensure_ascii=False)
+        else:
+            output = str(result)
+        self.completed.append(CompletedToolCall(call_id, getattr(context, "tool_name", tool.name), getattr(context, "tool_arguments", "{}"), output))
+
+
+async def settle_cancelled_turn(session: SessionABC, completed: List[CompletedToolCall]) -> int:
+    """
+    Leaves a session valid and useful after a turn was cancelled mid-run: tool calls that
+    finished are stored with their results (if the run had not stored them yet), and stored
+    calls that never got a result are closed with a "cancelled" output, which the model API
+    requires before the next turn. Returns the number of tool results kept.
+    """
+    items = await session.get_items()
+    stored_calls = {item.get("call_id") for item in items if item.get("type") == "function_call"}
+    stored_outputs = {item.get("call_id") for item in items if item.get("type") == "function_call_output"}
+
+    new_items, kept = [], 0
+    finished = {call.call_id: call for call in completed}
+    for call_id in stored_calls - stored_outputs:
+        output = finished[call_id].output if call_id in finished else CANCELLED_TOOL_OUTPUT
+        kept += call_id in finished
+        new_items.append({"type": "function_call_output", "call_id": call_id, "output": output})
+    for call in completed:
+        if call.call_id in stored_calls or call.call_id in stored_outputs:
+            continue
+        new_items.append({"type": "function_call", "call_id": call.call_id, "name": call.name, "arguments": call.arguments})
+        new_items.append({"type": "function_call_output", "call_id": call.call_id, "output": call.output})
+        kept += 1
+
+    await session.add_items(new_items)
+    return kept
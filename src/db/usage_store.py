@@ -0,0 +1,167 @@
+"""
+Per-run latency, token and cost records for every model call (Maestro turns, sub-agents and
+the wildcard angle), so the model tiers in src/utils/model_profiles.py can be tuned with
+real numbers (`models report`).
+
+Runs live in the `agent_usage` table of the session database, one row per run, tagged with
+the agent, the task (tool) it served, the profile and model it used and its session. Costs
+are computed at record time from the profile's prices and stay NULL without them.
+"""
+import asyncio
+import os
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+from dotenv import load_dotenv
+from src.db.session_db import sqlite_timestamp, configure_connection
+from src.utils.logging import log
+from src.utils.model_profiles import ModelProfile
+
+load_dotenv()
+
+USAGE_TABLE = "agent_usage"
+
+USAGE_TRACKING_ENABLED = os.getenv("USAGE_TRACKING_ENABLED", "true").lower() == "true"
+
+# Database files whose schema was already checked by this process.
+_ensured_paths: Set[str] = set()
+
+
+@dataclass
+class AgentRun:
+    """One finished model run."""
+    agent: str
+    profile: str
+    model: Optional[str]
+    seconds: float
+    requests: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost: Optional[float] = None
+    task: Optional[str] = None
+
+
+def ensure_usage_table(conn: sqlite3.Connection):
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {USAGE_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL DEFAULT '',
+            agent TEXT NOT NULL,
+            task TEXT,
+            profile TEXT NOT NULL,
+            model TEXT,
+            seconds REAL NOT NULL,
+            requests INTEGER NOT NULL DEFAULT 0,
+            input_tokens INTEGER NOT NULL DEFAULT 0,
+            output_tokens INTEGER NOT NULL DEFAULT 0,
+            cost REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{USAGE_TABLE}_created_at ON {USAGE_TABLE} (created_at)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{USAGE_TABLE}_session ON {USAGE_TABLE} (session_id, created_at)")
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    configure_connection(conn)
+    path_key = os.path.abspath(db_path)
+    if path_key not in _ensured_paths:
+        ensure_usage_table(conn)
+        conn.commit()
+        _ensured_paths.add(path_key)
+    return conn
+
+
+def record_run(db_path: str, session_id: Optional[str], run: AgentRun):
+    with closing(_connect(db_path)) as conn:
+        conn.execute(
+            f"""
+            INSERT INTO {USAGE_TABLE} (session_id, agent, task, profile, model, seconds, requests, input_tokens, output_tokens, cost)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                session_id or "", run.agent, run.task, run.profile, run.model, run.seconds,
+                run.requests, run.input_tokens, run.output_tokens, run.cost,
+            ),
+        )
+        conn.commit()
+
+
+async def record_usage(run_context: Any, agent_name: str, profile: ModelProfile, seconds: float, usage: Any, task: Optional[str] = None):
+    """
+    Records a finished run in the database of `run_context` (a MaestroContext), under its
+    session if it has one. Runs without a context (e.g. sub-agents called directly by scripts)
+    are not recorded. `usage` is the run's token usage (the Agents SDK's `Usage` or a
+    Responses API `usage`).
+    """
+    db_path = getattr(run_context, "db_path", None)
+    if not USAGE_TRACKING_ENABLED or not db_path:
+        return
+    input_tokens = getattr(usage, "input_tokens", 0) or 0
+    output_tokens = getattr(usage, "output_tokens", 0) or 0
+    run = AgentRun(
+        agent=agent_name, profile=profile.name, model=profile.model, seconds=seconds,
+        requests=getattr(usage, "requests", 1), input_tokens=input_tokens, output_tokens=output_tokens,
+        cost=profile.cost(input_tokens, output_tokens), task=task,
+    )
+    session = getattr(run_context, "session", None)
+    try:
+        await asyncio.to_thread(record_run, db_path, session.session_id if session else None, run)
+    except sqlite3.Error as e:
+        # Only the report loses this run.
+        log.error(f"Could not record the usage of {agent_name}: {e}")
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def usage_report(db_path: str, since: Optional[datetime] = None, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Aggregates recorded runs per agent, profile and model: run count, p50/p95 latency,
+    tokens and cost (None when no run had prices), most expensive first.
+    """
+    if not os.path.exists(db_path):
+        return []
+    where, params = [], []
+    if since is not None:
+        where.append("created_at >= ?")
+        params.append(sqlite_timestamp(since))
+    if session_id is not None:
+        where.append("session_id = ?")
+        params.append(session_id)
+    query = f"SELECT agent, profile, model, seconds, input_tokens, output_tokens, cost FROM {USAGE_TABLE}"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+
+    groups: Dict[tuple, Dict[str, Any]] = {}
+    with closing(_connect(db_path)) as conn:
+        for agent, profile, model, seconds, input_tokens, output_tokens, cost in conn.execute(query, params):
+            group = groups.setdefault(
+                (agent, profile, model),
+                {"agent": agent, "profile": profile, "model": model, "latencies": [], "input_tokens": 0, "output_tokens": 0, "cost": None},
+            )
+            group["latencies"].append(seconds)
+            group["input_tokens"] += input_tokens
+            group["output_tokens"] += output_tokens
+            if cost is not None:
+                group["cost"] = (group["cost"] or 0.0) + cost
+
+    report = []
+    for group in groups.values():
+        latencies = sorted(group.pop("latencies"))
+        report.append({
+            **group,
+            "runs": len(latencies),
+            "p50_seconds": _percentile(latencies, 50),
+            "p95_seconds": _percentile(latencies, 95),
+            "total_seconds": sum(latencies),
+        })
+    report.sort(key=lambda row: (row["cost"] or 0.0, row["total_seconds"]), reverse=True)
+    return report
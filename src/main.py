@@ -1,36 +1,87 @@
+import time
+_CLI_STARTED = time.perf_counter()  # the `import: cli` stage of --profile starts here
 import typer
 import os
+import sys
 import json
 import asyncio
 from dotenv import load_dotenv
-from typing import Optional
-from agents.tracing import add_trace_processor
-from agents import SQLiteSession, Runner
-from scripts.ingest_data import ingest_data
-from src.agents_crew.brand_strategist import BrandStrategistAgent
-from src.agents_crew.maestro import maestro_agent
-from src.utils.logging import CustomLoguruProcessor, log
-from src.utils.token_counter import get_session_token_count
+from typing import Dict, List, Optional, TYPE_CHECKING
+from src.daemon import DAEMON_PORT, DAEMON_SOCKET, request_daemon, run_daemon
+from src.utils import console
+from src.utils.logging import log
+from src.utils.profiling import PROFILER_MODES, profiler, stage
 from datetime import datetime
 
+if TYPE_CHECKING:
+    from agents import SQLiteSession
+    from src.utils.token_counter import SessionTokenLedger
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize custom logging
-add_trace_processor(CustomLoguruProcessor())
-log.info("Custom logging initialized and trace processor added.")
+# The Agents SDK, ChromaDB and the agent graph are imported lazily (see _init_agent_runtime and
+# the command handlers below), so commands served by the daemon start in milliseconds.
+_agent_runtime_ready = False
+
+
+def _init_agent_runtime():
+    """Installs the trace processor and the rate-limited OpenAI client, once per process."""
+    global _agent_runtime_ready
+    if _agent_runtime_ready:
+        return
+    with stage("import: agent runtime"):
+        from agents.tracing import add_trace_processor
+        from src.utils.rate_limiter import install_rate_limited_default_client
+        from src.utils.tracing import CHROME_TRACE_DIR, ChromeTraceProcessor, CustomLoguruProcessor
+
+    # Initialize custom logging
+    add_trace_processor(CustomLoguruProcessor())
+    log.info("Custom logging initialized and trace processor added.")
+    if CHROME_TRACE_DIR:
+        add_trace_processor(ChromeTraceProcessor(CHROME_TRACE_DIR))
+
+    # Route every agent run through the shared OpenAI rate limiter
+    install_rate_limited_default_client()
+    _agent_runtime_ready = True
 
 app = typer.Typer()
 report_app = typer.Typer()
 session_app = typer.Typer()
+assets_app = typer.Typer()
+models_app = typer.Typer()
+index_app = typer.Typer()
 app.add_typer(report_app, name="report")
 app.add_typer(session_app, name="session")
+app.add_typer(assets_app, name="assets")
+app.add_typer(models_app, name="models")
+app.add_typer(index_app, name="index")
+
+
+@app.callback()
+def main_options(
+    ctx: typer.Context,
+    profile: bool = typer.Option(False, "--profile", help="Time the command's stages and profile it; prints a breakdown at exit (runs in-process, never on the daemon)."),
+    profiler_mode: str = typer.Option("cprofile", "--profiler", help=f"Profiler for --profile: {' or '.join(PROFILER_MODES)}."),
+    profile_output: Optional[str] = typer.Option(None, "--profile-output", help="With --profile, also write a pstats file (cprofile) or folded stacks for flame graphs (sample)."),
+):
+    """
+    Calcularte Content Engine.
+    """
+    if not profile:
+        return
+    if profiler_mode not in PROFILER_MODES:
+        typer.echo(f"Error: --profiler must be one of: {', '.join(PROFILER_MODES)}.")
+        raise typer.Exit(code=1)
+    profiler.start(profiler_mode, profile_output, origin=_CLI_STARTED)
+    ctx.call_on_close(lambda: typer.echo("\n" + profiler.finish(), err=True))
 
 
 # --- Session Management Constants from .env ---
 SESSION_DB_FILE = os.getenv("SESSION_DB_FILE", "sessions.db")
 ACTIVE_SESSION_FILE = os.getenv("ACTIVE_SESSION_FILE", ".active_session")
 TOKEN_LIMIT = int(os.getenv("TOKEN_LIMIT", 100000))
+INSPECT_PREVIEW_CHARS = int(os.getenv("INSPECT_PREVIEW_CHARS", 120))
 
 # --- New Session Management Helper Functions ---
 
@@ -51,14 +102,41 @@ def _clear_active_session_id():
     if os.path.exists(ACTIVE_SESSION_FILE):
         os.remove(ACTIVE_SESSION_FILE)
 
-def _handle_token_limit(session: SQLiteSession):
+def _ensure_active_session_id() -> str:
+    """Returns the active session ID, starting an automatically named session if there is none."""
+    session_id = _get_active_session_id()
+    if not session_id:
+        session_id = f"auto_session_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+        _set_active_session_id(session_id)
+        log.warning(f"No active session found. Started new session: '{session_id}'")
+        console.echo(f"Warning: No active session. Started new session: '{session_id}'", fg=typer.colors.YELLOW)
+    return session_id
+
+# Sessions and their token ledgers stay open for the lifetime of the process, which is what
+# keeps them warm across requests when the commands are served by the daemon.
+_open_sessions: Dict[str, "SQLiteSession"] = {}
+_token_ledgers: Dict[str, "SessionTokenLedger"] = {}
+
+def _open_session(session_id: str) -> "SQLiteSession":
+    """Returns the (cached) session for a session ID: tuned SQLite storage with payload blobs."""
+    if session_id not in _open_sessions:
+        from src.db.session_store import BlobStoringSession
+        from src.utils.token_counter import SessionTokenLedger
+        _open_sessions[session_id] = BlobStoringSession(session_id=session_id, db_path=SESSION_DB_FILE)
+        _token_ledgers[session_id] = SessionTokenLedger(_open_sessions[session_id])
+    return _open_sessions[session_id]
+
+async def _session_token_count(session_id: str) -> int:
+    _open_session(session_id)
+    return await _token_ledgers[session_id].refresh()
+
+async def _handle_token_limit(session: "SQLiteSession", token_count: int) -> "SQLiteSession":
     """Handles the case where the token limit is exceeded."""
-    token_count = get_session_token_count(session)
     log.warning(f"Session '{session.session_id}' exceeds token limit of {TOKEN_LIMIT} with {token_count} tokens.")
-    typer.secho(f"Warning: Session '{session.session_id}' has a large history ({token_count} tokens).", fg=typer.colors.YELLOW)
-    typer.secho("This may lead to high costs and latency.", fg=typer.colors.YELLOW)
+    console.echo(f"Warning: Session '{session.session_id}' has a large history ({token_count} tokens).", fg=typer.colors.YELLOW)
+    console.echo("This may lead to high costs and latency.", fg=typer.colors.YELLOW)
     
-    action = typer.prompt(
+    action = await console.ask(
         "Choose an action:\n"
         "1: Proceed with the command\n"
         "2: Clear session data and proceed\n"
@@ -72,14 +150,15 @@ def _handle_token_limit(session: SQLiteSession):
         return session
     elif action == '2':
         log.info(f"User chose to clear session '{session.session_id}'.")
-        session.clear()
+        await session.clear_session()
+        _token_ledgers[session.session_id].reset()
         log.success(f"Session '{session.session_id}' cleared.")
-        typer.echo(f"Session '{session.session_id}' history has been cleared.")
+        console.echo(f"Session '{session.session_id}' history has been cleared.")
         return session
     elif action == '3':
         log.info(f"User chose to end session '{session.session_id}' and start a new one.")
         _clear_active_session_id()
-        return _get_active_session() # Recursively call to get a new session
+        return await _get_active_session(_ensure_active_session_id()) # Recursively call to get a new session
     elif action == '4':
         log.info("User chose to quit.")
         raise typer.Exit()
@@ -87,26 +166,34 @@ def _handle_token_limit(session: SQLiteSession):
         log.error("Invalid choice. Aborting.")
         raise typer.Exit(code=1)
 
-def _get_active_session() -> SQLiteSession:
+async def _get_active_session(session_id: str) -> "SQLiteSession":
     """
-    Gets the active session, creating one if it doesn't exist.
+    Opens the given (active) session.
     Also handles token limit checks.
     """
-    session_id = _get_active_session_id()
-    if not session_id:
-        session_id = f"auto_session_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
-        _set_active_session_id(session_id)
-        log.warning(f"No active session found. Started new session: '{session_id}'")
-        typer.secho(f"Warning: No active session. Started new session: '{session_id}'", fg=typer.colors.YELLOW)
-    
-    session = SQLiteSession(session_id=session_id, db_path=SESSION_DB_FILE)
-    
-    token_count = get_session_token_count(session)
+    with stage("session load"):
+        session = _open_session(session_id)
+
+    with stage("token check"):
+        token_count = await _session_token_count(session_id)
     if token_count > TOKEN_LIMIT:
-        session = _handle_token_limit(session)
+        session = await _handle_token_limit(session, token_count)
         
     return session
 
+def _run_command(command: str, **args):
+    """
+    Runs a command on the warm daemon when one is listening (`serve`), streaming its output
+    back to this terminal; otherwise runs it in this process.
+    """
+    # A profile measures this process, so a profiled command never goes to the daemon.
+    exit_code = None if profiler.enabled else request_daemon(command, args)
+    if exit_code is None:
+        _init_agent_runtime()
+        asyncio.run(COMMAND_HANDLERS[command](**args))
+    elif exit_code:
+        raise typer.Exit(code=exit_code)
+
 # --- Refactored Session CLI Commands ---
 
 @session_app.command("start")
@@ -116,17 +203,19 @@ def session_start(session_id: str = typer.Argument(..., help="The name for the s
     log.success(f"Session '{session_id}' is now active.")
     typer.echo(f"Session '{session_id}' is now active.")
 
+async def _session_status(session_id: str):
+    token_count = await _session_token_count(session_id)
+    log.info(f"Currently active session: '{session_id}' ({token_count} tokens)")
+    console.echo(f"Active Session: '{session_id}'")
+    console.echo(f"Token Count: {token_count}")
+    console.echo(f"Database: {os.path.abspath(SESSION_DB_FILE)}")
+
 @session_app.command("status")
 def session_status():
     """Checks the currently active session."""
     session_id = _get_active_session_id()
     if session_id:
-        session = SQLiteSession(session_id=session_id, db_path=SESSION_DB_FILE)
-        token_count = get_session_token_count(session)
-        log.info(f"Currently active session: '{session_id}' ({token_count} tokens)")
-        typer.echo(f"Active Session: '{session_id}'")
-        typer.echo(f"Token Count: {token_count}")
-        typer.echo(f"Database: {os.path.abspath(SESSION_DB_FILE)}")
+        _run_command("session_status", session_id=session_id)
     else:
         log.info("No active session.")
         typer.echo("No active session.")
@@ -144,33 +233,75 @@ def session_end():
         typer.echo("No active session to end.")
 
 @session_app.command("inspect")
-def session_inspect():
-    """Inspects the content of the active session."""
+def session_inspect(
+    limit: Optional[int] = typer.Option(None, "--limit", "-n", help="Show at most this many items."),
+    offset: int = typer.Option(0, "--offset", help="Skip this many (matching) items first."),
+    item_types: Optional[List[str]] = typer.Option(None, "--type", "-t", help="Only items of this type or role (e.g. user, assistant, function_call). Repeatable."),
+    grep: Optional[str] = typer.Option(None, "--grep", "-g", help="Only items whose content matches this regular expression (case-insensitive)."),
+    since: Optional[str] = typer.Option(None, "--since", help="Only items added within this period (e.g. 2h, 3d) or after this date/time (UTC)."),
+    summary: bool = typer.Option(False, "--summary", "-s", help="One line per item instead of the full JSON."),
+    jsonl: bool = typer.Option(False, "--jsonl", help="Print one compact JSON object per line (for piping to jq and friends)."),
+):
+    """Inspects the content of the active session, streaming items from the database."""
+    import re
+    from src.db.session_db import item_kind, iter_session_items, parse_since
+    from src.db.session_search import item_text
+
     session_id = _get_active_session_id()
     if not session_id:
         log.warning("No active session to inspect.")
         typer.echo("No active session to inspect.")
         return
 
+    try:
+        pattern = re.compile(grep, re.IGNORECASE) if grep else None
+        since_moment = parse_since(since) if since else None
+    except (re.error, ValueError) as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(code=1)
+
     log.info(f"Inspecting session: '{session_id}'")
-    typer.echo(f"--- Inspecting Session: {session_id} ---")
-    
+    items = iter_session_items(
+        SESSION_DB_FILE, session_id, offset=offset, limit=limit, kinds=item_types or (), pattern=pattern, since=since_moment
+    )
+    if not jsonl:
+        typer.echo(f"--- Inspecting Session: {session_id} ---")
+    shown = 0
     try:
-        session = SQLiteSession(session_id=session_id, db_path=SESSION_DB_FILE)
-        import asyncio
-        items = asyncio.run(session.get_items())
-        
-        if not items:
-            typer.echo("Session is empty.")
-            return
-            
-        # Pretty-print the JSON content
-        typer.echo(json.dumps(items, indent=2))
+        for item_id, created_at, item in items:
+            shown += 1
+            if jsonl:
+                typer.echo(json.dumps(item, ensure_ascii=False))
+            elif summary:
+                preview = " ".join(item_text(item).split())
+                if len(preview) > INSPECT_PREVIEW_CHARS:
+                    preview = preview[:INSPECT_PREVIEW_CHARS - 1] + "…"
+                typer.echo(f"{item_id:>7}  {created_at}  {item_kind(item):<22} {preview}")
+            else:
+                typer.echo(f"# {item_id} · {created_at} · {item_kind(item)}")
+                typer.echo(json.dumps(item, indent=2, ensure_ascii=False))
+    except BrokenPipeError:
+        # The reader (e.g. `head`) stopped early. Point stdout at devnull so the exit flush stays quiet.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return
+    if jsonl:
+        return
+    if shown:
+        typer.echo(f"--- {shown} items shown ---")
+    elif item_types or grep or since or offset:
+        typer.echo("No matching items.")
+    else:
+        typer.echo("Session is empty.")
 
+async def _session_clear(session_id: str):
+    try:
+        await _open_session(session_id).clear_session()
+        _token_ledgers[session_id].reset()
+        log.success(f"History for session '{session_id}' has been cleared.")
+        console.echo(f"History for session '{session_id}' has been cleared.")
     except Exception as e:
-        log.error(f"Failed to inspect session '{session_id}': {e}")
-        typer.echo(f"Error: Failed to inspect session '{session_id}'.")
-
+        log.error(f"Failed to clear session '{session_id}': {e}")
+        console.echo(f"Error: Failed to clear session '{session_id}'.")
 
 @session_app.command("clear")
 def session_clear():
@@ -182,14 +313,212 @@ def session_clear():
         return
 
     if typer.confirm(f"Are you sure you want to permanently delete all history for session '{session_id}'?"):
-        try:
-            session_to_clear = SQLiteSession(session_id=session_id, db_path=SESSION_DB_FILE)
-            asyncio.run(session_to_clear.clear_session())
-            log.success(f"History for session '{session_id}' has been cleared.")
-            typer.echo(f"History for session '{session_id}' has been cleared.")
-        except Exception as e:
-            log.error(f"Failed to clear session '{session_id}': {e}")
-            typer.echo(f"Error: Failed to clear session '{session_id}'.")
+        _run_command("session_clear", session_id=session_id)
+
+def _format_size(num_bytes: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} GB"
+
+@session_app.command("list")
+def session_list():
+    """Lists stored sessions with their size and token count (* marks the active session)."""
+    from src.db.session_db import list_sessions
+
+    sessions = list_sessions(SESSION_DB_FILE)
+    if not sessions:
+        typer.echo("No stored sessions.")
+        return
+    active_session_id = _get_active_session_id()
+    typer.echo(f"  {'SESSION':<40} {'UPDATED (UTC)':<20} {'ITEMS':>6} {'TOKENS':>9} {'SIZE':>10}")
+    for info in sessions:
+        marker = "*" if info["session_id"] == active_session_id else " "
+        typer.echo(
+            f"{marker} {info['session_id']:<40} {info['updated_at']:<20} {info['items']:>6} "
+            f"{info['tokens']:>9} {_format_size(info['bytes']):>10}"
+        )
+    typer.echo(f"{len(sessions)} sessions, {sum(i['tokens'] for i in sessions)} tokens in {os.path.abspath(SESSION_DB_FILE)}")
+
+@session_app.command("prune")
+def session_prune(
+    older_than: str = typer.Option(..., "--older-than", help="Delete sessions not updated within this period, e.g. 30d, 12h, 2w."),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Only list the sessions that would be deleted."),
+    yes: bool = typer.Option(False, "--yes", "-y", help="Do not ask for confirmation."),
+):
+    """Permanently deletes old sessions (never the active one)."""
+    from src.db.session_db import parse_duration, prune_sessions
+
+    try:
+        period = parse_duration(older_than)
+    except ValueError as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(code=1)
+
+    keep = [sid for sid in [_get_active_session_id()] if sid]
+    stale = prune_sessions(SESSION_DB_FILE, period, keep=keep, dry_run=True)
+    if not stale:
+        typer.echo(f"No sessions older than {older_than}.")
+        return
+    typer.echo(f"{len(stale)} sessions not updated in the last {older_than}:")
+    for session_id in stale:
+        typer.echo(f"  {session_id}")
+    if dry_run:
+        return
+    if yes or typer.confirm("Permanently delete them?"):
+        deleted = prune_sessions(SESSION_DB_FILE, period, keep=keep)
+        log.success(f"Pruned {len(deleted)} sessions.")
+        typer.echo(f"Deleted {len(deleted)} sessions. Run 'session vacuum' to reclaim disk space.")
+
+@session_app.command("vacuum")
+def session_vacuum():
+    """Compacts the session database file and reclaims the space of deleted history."""
+    from src.db.session_db import vacuum
+
+    if not os.path.exists(SESSION_DB_FILE):
+        typer.echo("No session database to vacuum.")
+        return
+    sizes = vacuum(SESSION_DB_FILE)
+    log.success(f"Vacuumed {SESSION_DB_FILE}: {sizes['bytes_before']} -> {sizes['bytes_after']} bytes.")
+    typer.echo(f"Session database: {_format_size(sizes['bytes_before'])} -> {_format_size(sizes['bytes_after'])} ({sizes['blobs_removed']} unused payloads removed)")
+
+# --- Generated Asset CLI Commands ---
+
+@assets_app.command("list")
+def assets_list(
+    asset_type: Optional[str] = typer.Option(None, "--type", "-t", help="idea, caption, image_prompts, revision, content_plan or wildcard_angle."),
+    pillar: Optional[str] = typer.Option(None, "--pillar", "-p", help="Only assets of this content pillar (exact, ignoring case)."),
+    title: Optional[str] = typer.Option(None, "--title", help="Only assets whose idea title contains this text."),
+    session: Optional[str] = typer.Option(None, "--session", help="Only assets generated in this session."),
+    current: bool = typer.Option(False, "--current", help="Only assets generated in the active session."),
+    since: Optional[str] = typer.Option(None, "--since", help="Only assets created within this period (e.g. 2h, 3d) or after this date/time (UTC)."),
+    limit: int = typer.Option(20, "--limit", "-n", help="Show at most this many assets."),
+    jsonl: bool = typer.Option(False, "--jsonl", help="Print one JSON object per asset, including its content."),
+):
+    """Lists generated assets (captions, ideas, image prompts...), newest first."""
+    from src.db.asset_store import find_assets
+    from src.db.session_db import parse_since
+
+    if current:
+        session = _get_active_session_id()
+        if not session:
+            typer.echo("No active session.")
+            raise typer.Exit(code=1)
+    try:
+        since_moment = parse_since(since) if since else None
+    except ValueError as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(code=1)
+
+    assets = find_assets(SESSION_DB_FILE, session_id=session, asset_type=asset_type, pillar=pillar, title=title, since=since_moment, limit=limit)
+    if jsonl:
+        for asset in assets:
+            typer.echo(json.dumps(asset, ensure_ascii=False))
+        return
+    if not assets:
+        typer.echo("No matching assets.")
+        return
+    typer.echo(f"{'ID':>6}  {'CREATED (UTC)':<19}  {'TYPE':<14} {'PILLAR':<22} {'TITLE':<40} SESSION")
+    for asset in assets:
+        typer.echo(
+            f"{asset['id']:>6}  {asset['created_at']:<19}  {asset['asset_type']:<14} {(asset['pillar'] or '-')[:22]:<22} "
+            f"{(asset['idea_title'] or '-')[:40]:<40} {asset['session_id'] or '-'}"
+        )
+    typer.echo("Use 'assets show <ID>' to print an asset.")
+
+@assets_app.command("show")
+def assets_show(
+    asset_id: int = typer.Argument(..., help="The asset ID, as printed by 'assets list'."),
+    raw: bool = typer.Option(False, "--raw", help="Print only the stored content, as is."),
+):
+    """Prints one generated asset."""
+    from src.db.asset_store import get_asset
+
+    asset = get_asset(SESSION_DB_FILE, asset_id)
+    if asset is None:
+        typer.echo(f"No asset with ID {asset_id}.")
+        raise typer.Exit(code=1)
+    content = asset["content"]
+    if raw:
+        typer.echo(content)
+        return
+    try:
+        content = json.dumps(json.loads(content), indent=2, ensure_ascii=False)
+    except json.JSONDecodeError:
+        pass
+    typer.echo(f"--- Asset {asset['id']}: {asset['asset_type']} ---")
+    for label, key in (("Title", "idea_title"), ("Pillar", "pillar"), ("Session", "session_id"), ("Tool", "tool_name"), ("Created", "created_at")):
+        if asset[key]:
+            typer.echo(f"{label}: {asset[key]}")
+    typer.echo()
+    typer.echo(content)
+
+# --- Model Profile CLI Commands ---
+
+@models_app.command("show")
+def models_show(
+    as_json: bool = typer.Option(False, "--json", help="Print the resolved configuration as JSON."),
+):
+    """Shows the model profiles, which profile each agent uses and the task routes."""
+    from src.utils.model_profiles import MODEL_PROFILES_FILE, model_registry
+
+    config = model_registry.describe()
+    if as_json:
+        typer.echo(json.dumps(config, indent=2, ensure_ascii=False))
+        return
+    source = MODEL_PROFILES_FILE if os.path.exists(MODEL_PROFILES_FILE) else "built-in defaults"
+    typer.echo(f"Model profiles ({source}):")
+    typer.echo(f"  {'PROFILE':<12} {'MODEL':<24} {'EFFORT':<8} {'MAX OUT':>8} {'TEMP':>5}  PRICE IN/OUT (USD/1M)")
+    for name, profile in config["profiles"].items():
+        price = "-"
+        if profile["input_cost_per_million"] is not None or profile["output_cost_per_million"] is not None:
+            price = f"{profile['input_cost_per_million'] or 0:g} / {profile['output_cost_per_million'] or 0:g}"
+        typer.echo(
+            f"  {name:<12} {profile['model'] or '-':<24} {profile['reasoning_effort'] or '-':<8} "
+            f"{profile['max_output_tokens'] or '-':>8} {'-' if profile['temperature'] is None else profile['temperature']:>5}  {price}"
+        )
+    typer.echo("\nAgents:")
+    for agent, name in config["agents"].items():
+        typer.echo(f"  {agent:<32} {name}")
+    typer.echo("\nTask routes (take precedence over the agent's profile):")
+    for task, name in config["routes"].items():
+        typer.echo(f"  {task:<32} {name}")
+
+@models_app.command("report")
+def models_report(
+    since: Optional[str] = typer.Option(None, "--since", help="Only runs within this period (e.g. 2h, 3d) or after this date/time (UTC)."),
+    session: Optional[str] = typer.Option(None, "--session", help="Only runs of this session."),
+    jsonl: bool = typer.Option(False, "--jsonl", help="Print one JSON object per agent and model."),
+):
+    """Reports latency, tokens and cost per agent and model, from the recorded runs."""
+    from src.db.session_db import parse_since
+    from src.db.usage_store import usage_report
+
+    try:
+        since_moment = parse_since(since) if since else None
+    except ValueError as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(code=1)
+
+    report = usage_report(SESSION_DB_FILE, since=since_moment, session_id=session)
+    if jsonl:
+        for row in report:
+            typer.echo(json.dumps(row, ensure_ascii=False))
+        return
+    if not report:
+        typer.echo("No recorded runs.")
+        return
+    typer.echo(f"{'AGENT':<30} {'PROFILE':<10} {'MODEL':<20} {'RUNS':>5} {'P50 S':>7} {'P95 S':>7} {'IN TOK':>9} {'OUT TOK':>9} {'COST USD':>9}")
+    for row in report:
+        cost = "-" if row["cost"] is None else f"{row['cost']:.4f}"
+        typer.echo(
+            f"{row['agent'][:30]:<30} {row['profile'][:10]:<10} {(row['model'] or '-')[:20]:<20} {row['runs']:>5} "
+            f"{row['p50_seconds']:>7.1f} {row['p95_seconds']:>7.1f} {row['input_tokens']:>9} {row['output_tokens']:>9} {cost:>9}"
+        )
+    costs = [row["cost"] for row in report if row["cost"] is not None]
+    if costs:
+        typer.echo(f"Total cost: {sum(costs):.4f} USD (runs without profile prices are not costed).")
 
 def check_openai_api_key():
     if not os.getenv("OPENAI_API_KEY"):
@@ -198,6 +527,18 @@ def check_openai_api_key():
         typer.echo("Please set it in your .env file or as an environment variable.")
         raise typer.Exit(code=1)
 
+async def _ingest(file_path: str):
+    from scripts.ingest_data import ingest_data
+
+    # Ingestion is synchronous (embeddings + ChromaDB writes); keep the event loop free for other requests.
+    await asyncio.to_thread(ingest_data, file_path)
+
+    # A warm process (the daemon) may have started before the collection existed or was migrated.
+    _reconnect_post_collection()
+
+    log.success("Data ingestion process finished.")
+    console.echo("Data ingestion process finished.")
+
 @app.command()
 def ingest(
     sample: bool = typer.Option(
@@ -216,35 +557,199 @@ def ingest(
     else:
         file_path = "dataset_instagram_calcularte_profile.jsonl"
     
-    ingest_data(file_path)
-    log.success("Data ingestion process finished.")
-    typer.echo("Data ingestion process finished.")
+    _run_command("ingest", file_path=file_path)
 
+# --- Post Index CLI Commands ---
 
-@app.command("maestro")
-def maestro_command(
-    prompt: str = typer.Argument(..., help="The high-level prompt for the Maestro Agent.")
+def _reconnect_post_collection():
+    """Reopens the brand strategist's collection in a warm process, after it was created or replaced."""
+    tools_module = sys.modules.get("src.agents_crew.tools")
+    if tools_module:
+        tools_module.brand_strategist.connect_collection()
+
+async def _index_migrate(dry_run: bool = False):
+    import chromadb
+    from src.db.post_index import CHROMA_PATH, COLLECTION_NAME, migrate_collection, recover_interrupted_swap, remove_orphaned_segments
+
+    client = chromadb.PersistentClient(path=CHROMA_PATH)
+    recover_interrupted_swap(client)
+    if COLLECTION_NAME not in [collection.name for collection in client.list_collections()]:
+        console.echo(f"No '{COLLECTION_NAME}' collection in {CHROMA_PATH}. Run 'ingest' first.")
+        return
+    try:
+        report = await asyncio.to_thread(migrate_collection, client, dry_run=dry_run)
+    except ValueError as e:
+        console.echo(f"Error: {e}")
+        return
+    changes = ", ".join(f"{key} {current} -> {configured}" for key, (current, configured) in report["index_changes"].items())
+    if report["from_version"] >= report["to_version"] and not changes:
+        console.echo(f"'{COLLECTION_NAME}' is already at schema {report['to_version']} with the configured index ({report['posts']} posts).")
+        return
+    if not dry_run:
+        _reconnect_post_collection()
+        freed = remove_orphaned_segments(CHROMA_PATH)
+        log.info(f"Removed {freed} bytes of the replaced collection's index files.")
+    action = "Would rebuild" if dry_run else "Rebuilt"
+    if report["from_version"] < report["to_version"]:
+        changes = ", ".join(filter(None, [f"schema {report['from_version']} -> {report['to_version']}", changes]))
+    console.echo(
+        f"{action} '{COLLECTION_NAME}' ({changes}): {report['posts']} posts, "
+        f"metadata {_format_size(report['metadata_bytes_before'])} -> {_format_size(report['metadata_bytes_after'])}."
+    )
+
+@index_app.command("migrate")
+def index_migrate(
+    dry_run: bool = typer.Option(False, "--dry-run", help="Only report what the migration would change."),
+):
+    """Brings the post collection to the current schema and INDEX_* settings in place, keeping its embeddings (no re-embedding)."""
+    _run_command("index_migrate", dry_run=dry_run)
+
+@index_app.command("status")
+def index_status():
+    """Shows the post collection's size, schema version, index settings, embedding storage and disk usage."""
+    import chromadb
+    from src.db.post_index import CHROMA_PATH, COLLECTION_NAME, SCHEMA_VERSION, embedding_dimensions, index_changes, index_settings, schema_version
+    from src.db.quantized_vectors import EMBEDDING_QUANTIZATION, vectors_path
+
+    client = chromadb.PersistentClient(path=CHROMA_PATH)
+    if COLLECTION_NAME not in [collection.name for collection in client.list_collections()]:
+        typer.echo(f"No '{COLLECTION_NAME}' collection in {CHROMA_PATH}. Run 'ingest' first.")
+        return
+    collection = client.get_collection(name=COLLECTION_NAME)
+    version = schema_version(collection)
+    disk = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(CHROMA_PATH) for name in names)
+    changes = index_changes(collection)
+    typer.echo(f"Collection: {COLLECTION_NAME} ({os.path.abspath(CHROMA_PATH)})")
+    typer.echo(f"Posts: {collection.count()}")
+    typer.echo(f"Schema: {version}" + ("" if version >= SCHEMA_VERSION else f" (current is {SCHEMA_VERSION}; run 'index migrate')"))
+    typer.echo("Index: " + ", ".join(f"{key}={value}" for key, value in index_settings(collection).items()))
+    if changes:
+        typer.echo("  differs from .env: " + ", ".join(f"{key}={configured}" for key, (_, configured) in changes.items()) + " (run 'index migrate')")
+    quantized = vectors_path(COLLECTION_NAME, EMBEDDING_QUANTIZATION)
+    storage = "float32 (Chroma's index)" if EMBEDDING_QUANTIZATION == "none" else f"{EMBEDDING_QUANTIZATION} ({_format_size(os.path.getsize(quantized)) if os.path.exists(quantized) else 'built on the first query'})"
+    typer.echo(f"Embeddings: {embedding_dimensions(collection) or '?'} dimensions, searched as {storage}")
+    typer.echo(f"Disk: {_format_size(disk)}")
+
+@index_app.command("tune")
+def index_tune(
+    k: int = typer.Option(10, "--k", "-k", help="Neighbours per query for recall@k."),
+    queries: int = typer.Option(200, "--queries", help="Posts sampled as queries."),
+    space: Optional[str] = typer.Option(None, "--space", help="Distance: cosine, l2 or ip (default INDEX_SPACE)."),
+    ef_construction: Optional[List[int]] = typer.Option(None, "--ef-construction", help="ef_construction values to try. Repeatable."),
+    max_neighbors: Optional[List[int]] = typer.Option(None, "--max-neighbors", help="max_neighbors (M) values to try. Repeatable."),
+    ef_search: Optional[List[int]] = typer.Option(None, "--ef-search", help="ef_search values to try. Repeatable."),
+    target_recall: float = typer.Option(0.95, "--target-recall", help="Recall@k the recommended setting must reach."),
+    jsonl: bool = typer.Option(False, "--jsonl", help="Print one JSON object per setting."),
 ):
+    """Measures recall@k (against exact search) and query latency of HNSW settings on the local posts, and recommends one."""
+    import chromadb
+    from src.db.index_tuning import DEFAULT_EF_CONSTRUCTION, DEFAULT_EF_SEARCH, DEFAULT_MAX_NEIGHBORS, load_embeddings, pick_setting, tune_index
+    from src.db.post_index import CHROMA_PATH, COLLECTION_NAME, INDEX_SPACE, SPACES
+
+    space = space or INDEX_SPACE
+    if space not in SPACES:
+        typer.echo(f"Error: unknown distance '{space}'. Use one of: {', '.join(SPACES)}.")
+        raise typer.Exit(code=1)
+    client = chromadb.PersistentClient(path=CHROMA_PATH)
+    if COLLECTION_NAME not in [collection.name for collection in client.list_collections()]:
+        typer.echo(f"No '{COLLECTION_NAME}' collection in {CHROMA_PATH}. Run 'ingest' first.")
+        return
+    ids, vectors = load_embeddings(client.get_collection(name=COLLECTION_NAME))
+    try:
+        report = tune_index(
+            ids, vectors, space,
+            ef_construction or DEFAULT_EF_CONSTRUCTION, max_neighbors or DEFAULT_MAX_NEIGHBORS, ef_search or DEFAULT_EF_SEARCH,
+            k=k, queries=queries,
+        )
+    except ValueError as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(code=1)
+    if jsonl:
+        for result in report["results"]:
+            typer.echo(json.dumps({"space": report["space"], "k": report["k"], **result}))
+        return
+
+    typer.echo(
+        f"{report['posts']} posts x {report['dimensions']} dimensions, {report['space']} distance, "
+        f"{report['queries']} queries, recall@{report['k']}. Exact search: p50 {report['exact']['p50_ms']} ms."
+    )
+    typer.echo(f"{'EF_CONSTR':>9} {'MAX_NEIGH':>9} {'EF_SEARCH':>9} {'RECALL':>7} {'P50 MS':>8} {'P95 MS':>8} {'BUILD S':>8}")
+    for result in report["results"]:
+        typer.echo(
+            f"{result['ef_construction']:>9} {result['max_neighbors']:>9} {result['ef_search']:>9} {result['recall']:>7.3f} "
+            f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['build_seconds']:>8.2f}"
+        )
+    best = pick_setting(report["results"], target_recall)
+    if best is None:
+        typer.echo(f"No setting reached recall@{report['k']} {target_recall}. Try larger --ef-search or --max-neighbors values.")
+        return
+    typer.echo(f"\nFastest setting with recall@{report['k']} >= {target_recall}: add to .env, then run 'index migrate':")
+    typer.echo(f"INDEX_SPACE={report['space']}")
+    typer.echo(f"INDEX_EF_CONSTRUCTION={best['ef_construction']}")
+    typer.echo(f"INDEX_MAX_NEIGHBORS={best['max_neighbors']}")
+    typer.echo(f"INDEX_EF_SEARCH={best['ef_search']}")
+
+
+def _print_final_response(final_output):
+    with stage("render"):
+        console.echo("\n\n--- Maestro's Final Response ---")
+        console.echo(str(final_output))
+        console.echo("--------------------------------")
+
+
+async def _run_maestro_turn(prompt: str, session, hooks=None):
     """
-    Interacts with the Maestro Agent for autonomous, conversational content creation.
+    Runs one turn as a single trace, so its fast-path steps, tools and sub-agents are grouped,
+    under one run budget (src/utils/run_budget.py) shared by all of them.
     """
-    check_openai_api_key()
-    session = _get_active_session()
-    log.info(f"Using active session: '{session.session_id}' for Maestro command.")
-    typer.echo(f"Maestro is thinking... (using session: {session.session_id})")
+    from agents import trace
+    from src.utils.run_budget import RunBudget, run_budget
+
+    with trace("Maestro turn", group_id=getattr(session, "session_id", None)), run_budget(RunBudget.from_env()):
+        await _stream_maestro_turn(prompt, session, hooks=hooks)
+
+
+async def _stream_maestro_turn(prompt: str, session, hooks=None):
+    """
+    Streams one Maestro run to the console and prints its final response. When the turn's
+    run budget is spent, the run is stopped and the response lists the assets completed so far.
+    """
+    with stage("import: agents"):
+        from agents import Runner
+        from src.agents_crew.maestro import maestro_agent
+        from src.agents_crew.run_context import MaestroContext
+        from src.agents_crew.fast_path import run_fast_path
+        from src.db.usage_store import record_usage
+        from src.utils.model_profiles import model_registry
+        from src.utils.run_budget import charge_response_event, current_budget, enforce_deadline
+
+    # Known intents (a caption, a plan, ideas, a refinement) skip the Maestro's planning turns.
+    with stage("fast path"):
+        fast_output = await run_fast_path(prompt, session, SESSION_DB_FILE)
+    if fast_output is not None:
+        log.success("Fast-path command finished successfully.")
+        _print_final_response(fast_output)
+        return
 
-    async def stream_maestro():
-        final_output = None
-        thought_buffer = "" # Buffer to accumulate thought chunks
+    thought_buffer = "" # Buffer to accumulate thought chunks
 
-        # Use run_streamed() which returns a result object, then iterate over stream_events()
-        result = Runner.run_streamed(maestro_agent, prompt, session=session, max_turns=20)
+    # Use run_streamed() which returns a result object, then iterate over stream_events()
+    context = MaestroContext(session=session, db_path=SESSION_DB_FILE)
+    agent, profile = model_registry.configure(maestro_agent)
+    started = time.perf_counter()
+    running_tools: Dict[str, tuple] = {}  # call_id -> (tool name, start), for --profile
+    result = Runner.run_streamed(agent, prompt, session=session, context=context, max_turns=20, hooks=hooks)
+    budget = current_budget()
+    deadline = asyncio.ensure_future(enforce_deadline(budget, result.cancel))
+    try:
         async for event in result.stream_events():
+            if event.type == "raw_response_event":
+                charge_response_event(event.data)
             if event.type == "raw_response_event" and hasattr(event.data, 'delta') and event.data.delta:
                 # Accumulate the thought chunks
                 thought_buffer += event.data.delta
-                # Use typer.secho for direct, unformatted console output
-                typer.secho(event.data.delta, nl=False, fg="magenta")
+                # Direct, unformatted console output
+                console.echo(event.data.delta, nl=False, fg="magenta")
             
             # Log the complete thought when a tool is called (signaling the end of a thought)
             elif event.type == "run_item_stream_event" and hasattr(event.item, 'type') and event.item.type == "tool_call_item":
@@ -253,26 +758,218 @@ def maestro_command(
                     thought_buffer = "" # Reset buffer
 
                 # A tool has been called. Print a newline to the console.
-                typer.echo()
+                console.echo()
                 # Access the tool call info from the raw_item attribute
                 log.info(f"Tool Call: {event.item.raw_item.name} with args: {event.item.raw_item.arguments}")
+                if profiler.enabled:
+                    running_tools[event.item.raw_item.call_id] = (event.item.raw_item.name, time.perf_counter())
+
+            elif profiler.enabled and event.type == "run_item_stream_event" and getattr(event.item, "type", None) == "tool_call_output_item":
+                raw_output = event.item.raw_item
+                call_id = raw_output.get("call_id") if isinstance(raw_output, dict) else getattr(raw_output, "call_id", None)
+                if call_id in running_tools:
+                    name, tool_started = running_tools.pop(call_id)
+                    profiler.record(f"tool: {name}", tool_started)
+
+            # Checked between steps, so a response that is being written is not cut off.
+            if event.type == "run_item_stream_event" and budget.stop_reason():
+                result.cancel()
+                break
+    except BaseException:
+        # The client went away (daemon) or the user interrupted: stop the background run.
+        result.cancel()
+        raise
+    finally:
+        deadline.cancel()
+
+    # Log any remaining thoughts in the buffer after the loop finishes
+    if thought_buffer:
+        log.log("THOUGHT", thought_buffer.replace("{", "{{").replace("}", "}}"))
+
+    profiler.record(f"agent: {agent.name}", started)
+    # Maestro's own calls only: every sub-agent run records its usage separately.
+    await record_usage(context, agent.name, profile, time.perf_counter() - started, result.context_wrapper.usage)
+
+    final_output = result.final_output
+    if final_output is None and budget.stop_reason():
+        await _finish_over_budget(session, budget, hooks)
+        return
 
-        # Log any remaining thoughts in the buffer after the loop finishes
-        if thought_buffer:
-            log.log("THOUGHT", thought_buffer.replace("{", "{{").replace("}", "}}"))
-
-        return result.final_output
-
-    final_output = asyncio.run(stream_maestro())
-      
     if final_output:
         log.success("Maestro command finished successfully.")
-        typer.echo("\n\n--- Maestro's Final Response ---")
-        typer.echo(str(final_output))
-        typer.echo("--------------------------------")
+        _print_final_response(final_output)
     else:
         log.error("Maestro command finished with no output.")
-        typer.echo("\nMaestro command finished with no output.")
+        console.echo("\nMaestro command finished with no output.")
+
+
+async def _finish_over_budget(session, budget, hooks=None):
+    """Ends a Maestro turn its budget stopped: settles the session and prints the assets completed so far."""
+    from src.db.session_store import settle_cancelled_turn
+    from src.utils.run_budget import partial_response
+
+    log.warning(f"Maestro turn stopped by the run budget ({budget.stop_reason()}): {budget.summary()}.")
+    response = partial_response(budget)
+    if session is not None:
+        # Tool results that finished (known when the REPL's recorder is attached) are kept, like a cancelled turn.
+        await settle_cancelled_turn(session, getattr(hooks, "completed", []))
+        await session.add_items([{"role": "assistant", "content": response}])
+    _print_final_response(response)
+
+
+async def _maestro(prompt: str, session_id: str):
+    session = await _get_active_session(session_id)
+    log.info(f"Using active session: '{session.session_id}' for Maestro command.")
+    console.echo(f"Maestro is thinking... (using session: {session.session_id})")
+    await _run_maestro_turn(prompt, session)
+
+
+async def _read_line() -> str:
+    """Reads one line from stdin without blocking the event loop ('' on EOF)."""
+    loop = asyncio.get_running_loop()
+    line = loop.create_future()
+    try:
+        loop.add_reader(sys.stdin.fileno(), lambda: line.done() or line.set_result(sys.stdin.readline()))
+    except (NotImplementedError, OSError, ValueError):
+        # No selector support for this stdin (e.g. Windows or a regular file).
+        return await asyncio.to_thread(sys.stdin.readline)
+    try:
+        return await line
+    finally:
+        loop.remove_reader(sys.stdin.fileno())
+
+
+async def _maestro_repl(session_id: str, first_prompt: Optional[str] = None):
+    """
+    Interactive Maestro loop. The agent graph, the session history (served from memory and
+    written to SQLite in the background) and the token ledger live for the whole REPL, so
+    each turn only pays for the model calls. Ctrl+C cancels the running turn, keeping the
+    results of tools that already finished; Ctrl+C at the prompt, Ctrl+D or 'exit' quits.
+    """
+    import signal
+    from src.db.session_store import ToolResultRecorder, WriteBehindSession, settle_cancelled_turn
+    from src.utils.token_counter import SessionTokenLedger
+    import src.agents_crew.maestro  # Build the agent graph and ChromaDB connection before the first prompt.
+
+    stored_session = await _get_active_session(session_id)
+    session = WriteBehindSession(stored_session)
+    await session.load()
+    ledger = SessionTokenLedger(session)
+    await ledger.refresh()
+
+    loop = asyncio.get_running_loop()
+    current: Dict[str, asyncio.Future] = {}
+
+    def on_interrupt():
+        task = current.get("turn") or current.get("input")
+        if task and not task.done():
+            task.cancel()
+
+    try:
+        loop.add_signal_handler(signal.SIGINT, on_interrupt)
+    except (NotImplementedError, RuntimeError):
+        pass  # Ctrl+C then falls back to the default KeyboardInterrupt (and ends the REPL).
+
+    console.echo(f"Interactive Maestro (session: {session.session_id}). Ctrl+C cancels a turn; 'exit' or Ctrl+D quits.", fg=typer.colors.GREEN)
+    prompt = first_prompt
+    try:
+        while True:
+            if prompt is None:
+                console.echo(f"\n[{ledger.token_count} tokens] You> ", nl=False, fg=typer.colors.CYAN)
+                current["input"] = asyncio.ensure_future(_read_line())
+                try:
+                    line = await current["input"]
+                except asyncio.CancelledError:
+                    console.echo()
+                    break
+                if not line or line.strip().lower() in ("exit", "quit"):
+                    break
+                prompt = line.strip()
+                if not prompt:
+                    prompt = None
+                    continue
+
+            recorder = ToolResultRecorder()
+            current["turn"] = asyncio.ensure_future(_run_maestro_turn(prompt, session, hooks=recorder))
+            try:
+                await current["turn"]
+            except asyncio.CancelledError:
+                kept = await settle_cancelled_turn(session, recorder.completed)
+                log.warning(f"Turn cancelled. Kept {kept} completed tool result(s) in the session.")
+                console.echo(f"\nTurn cancelled. Kept {kept} completed tool result(s).", fg=typer.colors.YELLOW)
+            except Exception as e:
+                log.error(f"Maestro turn failed: {e}")
+                console.echo(f"\nError: {e}", fg=typer.colors.RED)
+            finally:
+                current.pop("turn", None)
+                prompt = None
+
+            if await ledger.refresh() > TOKEN_LIMIT:
+                console.echo(f"Warning: Session '{session.session_id}' has a large history ({ledger.token_count} tokens).", fg=typer.colors.YELLOW)
+    finally:
+        try:
+            loop.remove_signal_handler(signal.SIGINT)
+        except (NotImplementedError, RuntimeError):
+            pass
+        await session.close()
+        log.info(f"Interactive session '{session.session_id}' saved.")
+
+
+@app.command("maestro")
+def maestro_command(
+    prompt: Optional[str] = typer.Argument(None, help="The high-level prompt for the Maestro Agent (optional with --interactive)."),
+    interactive: bool = typer.Option(False, "--interactive", "-i", help="Start a REPL that keeps the session, token count and agents in memory across turns."),
+):
+    """
+    Interacts with the Maestro Agent for autonomous, conversational content creation.
+    """
+    check_openai_api_key()
+    if interactive:
+        # The REPL owns the terminal (prompts, Ctrl+C), so it always runs in-process.
+        _init_agent_runtime()
+        asyncio.run(_maestro_repl(_ensure_active_session_id(), prompt))
+        return
+    if not prompt:
+        typer.echo("Error: Provide a prompt, or use --interactive.")
+        raise typer.Exit(code=1)
+    _run_command("maestro", prompt=prompt, session_id=_ensure_active_session_id())
+
+
+# Commands a `serve` daemon can run on behalf of thin CLI clients.
+COMMAND_HANDLERS = {
+    "maestro": _maestro,
+    "ingest": _ingest,
+    "index_migrate": _index_migrate,
+    "session_status": _session_status,
+    "session_clear": _session_clear,
+}
+
+
+async def _warm_up():
+    """Loads everything the first request would otherwise pay for: the agent graph, ChromaDB, tool schemas."""
+    from agents import RunContextWrapper
+    from src.agents_crew.maestro import maestro_agent
+    from src.utils.token_counter import get_encoding
+
+    await maestro_agent.get_all_tools(RunContextWrapper(context=None))
+    try:
+        get_encoding()
+    except Exception as e:
+        log.warning(f"Could not preload the tokenizer: {e}")
+
+
+@app.command("serve")
+def serve(
+    socket_path: str = typer.Option(DAEMON_SOCKET, "--socket", help="Unix socket to listen on (clients read DAEMON_SOCKET)."),
+    port: int = typer.Option(DAEMON_PORT, "--port", help="Listen on this localhost TCP port instead of a Unix socket (clients read DAEMON_PORT and the DAEMON_TOKEN_FILE token)."),
+):
+    """
+    Runs a local daemon that keeps the agents, ChromaDB, HTTP connections and sessions warm.
+    While it runs, the other commands are served by it and stream their output back.
+    """
+    check_openai_api_key()
+    _init_agent_runtime()
+    run_daemon(COMMAND_HANDLERS, socket_path=socket_path, port=port, warm_up=_warm_up)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+import contextvars
+from typing import Optional, Protocol
+import typer
+
+
+class EventChannel(Protocol):
+    """Where console output goes while a daemon request is being served (see src/daemon.py)."""
+
+    def send(self, event: dict) -> None: ...
+
+    async def ask(self, text: str) -> str: ...
+
+
+# The channel of the request being served in the current task or worker thread, if any.
+_current_channel: contextvars.ContextVar[Optional[EventChannel]] = contextvars.ContextVar("console_channel", default=None)
+
+
+def current_channel() -> Optional[EventChannel]:
+    return _current_channel.get()
+
+
+def bind_channel(channel: EventChannel) -> contextvars.Token:
+    """Routes console output of the current context (and the tasks/threads it spawns) to `channel`."""
+    return _current_channel.set(channel)
+
+
+def unbind_channel(token: contextvars.Token):
+    _current_channel.reset(token)
+
+
+def echo(message: str = "", nl: bool = True, fg: Optional[str] = None, err: bool = False):
+    """
+    Writes to the user's console. Behaves like `typer.secho` in a normal CLI process; inside
+    the daemon the text is streamed back to the client that issued the request.
+    """
+    channel = _current_channel.get()
+    if channel is None:
+        typer.secho(message, nl=nl, fg=fg, err=err)
+    else:
+        channel.send({"event": "output", "text": message, "nl": nl, "fg": fg, "err": err})
+
+
+async def ask(text: str) -> str:
+    """Prompts the user for an answer, on the local terminal or through the daemon client."""
+    channel = _current_channel.get()
+    if channel is None:
+        return typer.prompt(text)
+    return await channel.ask(text)
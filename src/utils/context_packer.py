@@ -0,0 +1,145 @@
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from src.agents_crew.brand_strategist import BrandContext, PostSample
+from src.utils.logging import log
+from src.utils.run_budget import current_budget
+from src.utils.token_counter import count_tokens
+
+load_dotenv()
+
+# --- Context Budget Settings from .env ---
+# A default budget for every creative agent, optionally overridden per agent,
+# e.g. CONTEXT_TOKEN_BUDGET_COPYWRITER=6000.
+DEFAULT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 4000))
+CONTEXT_AGENT_KEYS = ["creative_director", "copywriter", "art_director"]
+CONTEXT_TOKEN_BUDGETS: Dict[str, int] = {
+    key: int(os.getenv(f"CONTEXT_TOKEN_BUDGET_{key.upper()}", DEFAULT_CONTEXT_TOKEN_BUDGET))
+    for key in CONTEXT_AGENT_KEYS
+}
+
+HASHTAG_PATTERN = re.compile(r"#\w+")
+
+
+def strip_hashtags(caption: str) -> str:
+    """Removes the lines made up only of hashtags (the hashtag blocks) from a caption."""
+    kept_lines = []
+    for line in caption.splitlines():
+        without_tags = HASHTAG_PATTERN.sub("", line).strip()
+        if HASHTAG_PATTERN.search(line) and not without_tags:
+            continue
+        kept_lines.append(line.rstrip())
+    return "\n".join(kept_lines).strip()
+
+
+def split_paragraphs(caption: str) -> List[str]:
+    """Splits a caption into non-empty paragraphs."""
+    return [p.strip() for p in re.split(r"\n\s*\n", caption) if p.strip()]
+
+
+def normalize_paragraph(paragraph: str) -> str:
+    """Normalizes a paragraph for boilerplate matching (case, emojis, punctuation, spacing)."""
+    return re.sub(r"[^\w]+", " ", paragraph.lower()).strip()
+
+
+def find_repeated_paragraphs(captions: List[str], min_count: int = 2) -> Dict[str, str]:
+    """
+    Finds paragraphs (typically CTAs and sign-offs) that occur in at least `min_count`
+    different captions, ignoring differences in case, emojis and punctuation.
+
+    Returns:
+        A mapping of normalized paragraph to its first-seen original text.
+    """
+    counts = Counter()
+    originals: Dict[str, str] = {}
+    for caption in captions:
+        keys = set()
+        for paragraph in split_paragraphs(caption):
+            key = normalize_paragraph(paragraph)
+            if key:
+                keys.add(key)
+                originals.setdefault(key, paragraph)
+        counts.update(keys)
+    return {key: originals[key] for key, count in counts.items() if count >= min_count}
+
+
+def remove_paragraphs(caption: str, paragraphs: Dict[str, str]) -> str:
+    """Drops the given (normalized) paragraphs from a caption, keeping the rest intact."""
+    return "\n\n".join(p for p in split_paragraphs(caption) if normalize_paragraph(p) not in paragraphs)
+
+
+def _format_sample(sample: PostSample, caption: str) -> str:
+    meta = sample.metadata
+    date = f"{meta.timestamp[:10]} | " if meta.timestamp else ""
+    return f"- [{date}{meta.likesCount} likes | {meta.commentsCount} comments]\n{caption}"
+
+
+def pack_brand_context(brand_context: BrandContext, agent_key: str, token_budget: Optional[int] = None) -> str:
+    """
+    Packs a `BrandContext` into a prompt block that fits a per-agent token budget.
+
+    The brand voice report is always kept. Sample captions are stripped of hashtag
+    blocks and of paragraphs repeated across samples (listed once instead), then
+    picked greedily by value per token, where value combines the sample's rank
+    (its relevance order) with its engagement. Selected samples keep their
+    original order.
+
+    Args:
+        brand_context: The context assembled by the Maestro.
+        agent_key: The creative agent receiving the context (see CONTEXT_AGENT_KEYS).
+        token_budget: Overrides the configured budget for this agent. Either is shrunk
+            while the turn's run budget is nearly spent (src/utils/run_budget.py).
+
+    Returns:
+        The formatted context block, ready to be appended to the agent's prompt.
+    """
+    if token_budget is None:
+        token_budget = CONTEXT_TOKEN_BUDGETS.get(agent_key, DEFAULT_CONTEXT_TOKEN_BUDGET)
+    run_budget = current_budget()
+    if run_budget is not None:
+        token_budget = run_budget.shrink(token_budget)
+
+    unpacked_tokens = count_tokens(brand_context.model_dump_json(indent=2))
+
+    report_block = f"Brand Voice Report:\n{brand_context.report.model_dump_json()}"
+    captions = [sample.caption for sample in brand_context.samples]
+    boilerplate = find_repeated_paragraphs([strip_hashtags(c) for c in captions])
+    boilerplate_block = ""
+    if boilerplate:
+        boilerplate_block = "Recurring boilerplate (CTAs/sign-offs reused across posts, shown once):\n" + "\n\n".join(boilerplate.values())
+
+    frame = "\n\n--- Brand Context ---\n\n\nPost Samples:\n\n--- End Context ---"
+    remaining = token_budget - count_tokens(frame) - count_tokens(report_block) - count_tokens(boilerplate_block)
+
+    # Score each cleaned sample by value per token.
+    max_engagement = max((s.metadata.likesCount + s.metadata.commentsCount for s in brand_context.samples), default=0) or 1
+    candidates = []
+    for rank, sample in enumerate(brand_context.samples):
+        cleaned = remove_paragraphs(strip_hashtags(sample.caption), boilerplate)
+        if not cleaned:
+            continue
+        formatted = _format_sample(sample, cleaned)
+        tokens = count_tokens(formatted + "\n\n")
+        relevance = 1.0 / (1 + rank)
+        engagement = (sample.metadata.likesCount + sample.metadata.commentsCount) / max_engagement
+        value = relevance * (1 + engagement)
+        candidates.append((value / tokens, rank, formatted, tokens))
+
+    selected = []
+    for _, rank, formatted, tokens in sorted(candidates, reverse=True):
+        if tokens <= remaining:
+            selected.append((rank, formatted))
+            remaining -= tokens
+
+    sample_block = "Post Samples:\n" + "\n\n".join(formatted for _, formatted in sorted(selected))
+    blocks = [report_block, boilerplate_block, sample_block] if boilerplate_block else [report_block, sample_block]
+    packed = "\n\n--- Brand Context ---\n" + "\n\n".join(blocks) + "\n--- End Context ---"
+
+    packed_tokens = count_tokens(packed)
+    log.info(
+        f"Packed brand context for '{agent_key}': {len(selected)}/{len(brand_context.samples)} samples, "
+        f"{packed_tokens} tokens (budget {token_budget}, saved {unpacked_tokens - packed_tokens} tokens)."
+    )
+    return packed
@@ -0,0 +1,103 @@
+import asyncio
+import os
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+from dotenv import load_dotenv
+from src.utils.logging import log
+
+load_dotenv()
+
+# --- Deadline and Hedging Settings from .env ---
+AGENT_DEADLINE_SECONDS = float(os.getenv("AGENT_DEADLINE_SECONDS", 300))
+AGENT_TTFT_TIMEOUT_SECONDS = float(os.getenv("AGENT_TTFT_TIMEOUT_SECONDS", 60))
+AGENT_HEDGING_ENABLED = os.getenv("AGENT_HEDGING_ENABLED", "false").lower() == "true"
+AGENT_HEDGE_DELAY_SECONDS = float(os.getenv("AGENT_HEDGE_DELAY_SECONDS", 30))
+AGENT_HEDGE_MIN_SAMPLES = int(os.getenv("AGENT_HEDGE_MIN_SAMPLES", 5))
+
+T = TypeVar("T")
+
+
+class AgentDeadlineExceeded(TimeoutError):
+    """Raised when a sub-agent run misses its deadline or its time-to-first-token watchdog."""
+
+
+def agent_env_key(agent_name: str) -> str:
+    """Turns an agent name like 'Copywriter Agent' into an env suffix like 'COPYWRITER_AGENT'."""
+    return "_".join(agent_name.upper().split())
+
+
+def agent_deadline(agent_name: str) -> float:
+    """The overall deadline for one run of the agent, overridable with AGENT_DEADLINE_SECONDS_<AGENT>."""
+    return float(os.getenv(f"AGENT_DEADLINE_SECONDS_{agent_env_key(agent_name)}", AGENT_DEADLINE_SECONDS))
+
+
+class LatencyTracker:
+    """Keeps a rolling window of successful run durations per agent to derive hedge delays."""
+
+    def __init__(self, window: int = 100):
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, key: str, seconds: float):
+        self._samples[key].append(seconds)
+
+    def percentile(self, key: str, pct: float) -> Optional[float]:
+        """The `pct` percentile of the recorded durations, or None until enough samples exist."""
+        samples = sorted(self._samples.get(key, ()))
+        if len(samples) < AGENT_HEDGE_MIN_SAMPLES:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def snapshot(self, key: str) -> List[float]:
+        """The durations currently recorded for `key`, oldest first."""
+        return list(self._samples.get(key, ()))
+
+    def restore(self, key: str, samples: List[float]):
+        """Replaces the durations recorded for `key` (e.g. with an earlier `snapshot`)."""
+        self._samples[key].clear()
+        self._samples[key].extend(samples)
+
+    def hedge_delay(self, key: str) -> float:
+        """Hedge after the p95 latency, falling back to AGENT_HEDGE_DELAY_SECONDS."""
+        p95 = self.percentile(key, 95)
+        return p95 if p95 is not None else AGENT_HEDGE_DELAY_SECONDS
+
+
+# Process-wide tracker shared by every sub-agent call.
+latency_tracker = LatencyTracker()
+
+
+async def run_hedged(make_attempt: Callable[[bool], Awaitable[T]], hedge_delay: float) -> T:
+    """
+    Runs `make_attempt(False)` and, if it has not finished after `hedge_delay` seconds (or
+    was cancelled), fires an identical `make_attempt(True)`. Returns whichever attempt
+    succeeds first and cancels the other; cancelling the caller cancels both. Raises the
+    primary attempt's error only if both attempts fail, and a RuntimeError if both were
+    cancelled.
+    """
+    primary = asyncio.ensure_future(make_attempt(False))
+    hedge: Optional[asyncio.Future] = None
+    # Everything after the primary starts is inside the try, so a caller cancelled while
+    # waiting (Ctrl+C, a budget stop, a client disconnect) also cancels the attempts.
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done and not primary.cancelled():
+            return primary.result()
+
+        log.info(f"Primary request {'was cancelled' if done else f'still running after {hedge_delay:.1f}s'}. Firing a hedged request.")
+        hedge = asyncio.ensure_future(make_attempt(True))
+        pending = {primary, hedge}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None:
+                    log.info(f"{'Hedged' if task is hedge else 'Primary'} request finished first.")
+                    return task.result()
+        for task in (primary, hedge):
+            if not task.cancelled():
+                raise task.exception()
+        raise RuntimeError("Both the primary and the hedged request were cancelled before finishing.")
+    finally:
+        for task in (primary, hedge):
+            if task is not None and not task.done():
+                task.cancel()
@@ -0,0 +1,169 @@
+"""
+Per-agent model profiles and the rule-based router that picks one for every model call.
+
+A profile bundles a model with its settings (reasoning effort, max output tokens,
+temperature) and, optionally, its prices, so runs can be costed. Each call resolves its
+profile in this order: the route of the task it serves (the tool name, e.g.
+`query_session_history`), then the agent's own assignment, then `default`. A route covers
+every agent the tool runs (e.g. the brand report behind `propose_wildcard_angle`).
+
+Without a config file, `default` uses OPENAI_MODEL and `fast` uses OPENAI_FAST_MODEL (or
+OPENAI_MODEL when unset), and the cheap tasks in DEFAULT_ROUTES go to `fast`. A JSON file
+at MODEL_PROFILES_FILE overrides any of this:
+
+    {
+      "profiles": {
+        "default": {"model": "gpt-5", "reasoning_effort": "medium",
+                    "input_cost_per_million": 1.25, "output_cost_per_million": 10.0},
+        "fast": {"model": "gpt-5-mini", "reasoning_effort": "low"}
+      },
+      "agents": {"Copywriter Agent": "default", "Evaluator Agent": "fast"},
+      "routes": {"propose_content_plan": "default"}
+    }
+"""
+import json
+import os
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from src.utils.logging import log
+
+load_dotenv()
+
+# --- Model Profile Settings from .env ---
+MODEL_PROFILES_FILE = os.getenv("MODEL_PROFILES_FILE", "model_profiles.json")
+OPENAI_FAST_MODEL = os.getenv("OPENAI_FAST_MODEL")
+
+DEFAULT_PROFILE = "default"
+
+# Tasks that need little reasoning: retrieving from session history, one-sentence wildcard
+# angles and turning the planning context into a plan.
+DEFAULT_ROUTES = {
+    "query_session_history": "fast",
+    "propose_wildcard_angle": "fast",
+    "propose_content_plan": "fast",
+}
+
+# Agents that default to a profile other than `default`.
+DEFAULT_AGENT_PROFILES = {
+    "Intent Classifier Agent": "fast",
+}
+
+# Every agent that calls a model, for `models show`.
+KNOWN_AGENTS = (
+    "Maestro Agent",
+    "Brand Reporter Agent",
+    "Content Planner Agent",
+    "Creative Director Agent",
+    "Copywriter Agent",
+    "Art Director Agent",
+    "Reviewer Agent",
+    "Session History Analyst Agent",
+    "Evaluator Agent",
+    "Candidate Selector Agent",
+    "Intent Classifier Agent",
+    "Wildcard Angle",
+)
+
+
+@dataclass
+class ModelProfile:
+    """A model and its settings. Unset fields keep the agent's own settings."""
+    name: str
+    model: Optional[str] = None
+    reasoning_effort: Optional[str] = None
+    max_output_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    input_cost_per_million: Optional[float] = None
+    output_cost_per_million: Optional[float] = None
+
+    def cost(self, input_tokens: int, output_tokens: int) -> Optional[float]:
+        """The USD cost of a run, or None when the profile has no prices."""
+        if self.input_cost_per_million is None and self.output_cost_per_million is None:
+            return None
+        return (input_tokens * (self.input_cost_per_million or 0) + output_tokens * (self.output_cost_per_million or 0)) / 1_000_000
+
+    def request_options(self) -> Dict[str, Any]:
+        """The profile as keyword arguments for a direct Responses API call."""
+        options: Dict[str, Any] = {}
+        if self.temperature is not None:
+            options["temperature"] = self.temperature
+        if self.max_output_tokens is not None:
+            options["max_output_tokens"] = self.max_output_tokens
+        if self.reasoning_effort:
+            options["reasoning"] = {"effort": self.reasoning_effort}
+        return options
+
+
+_PROFILE_FIELDS = {field.name for field in fields(ModelProfile)} - {"name"}
+
+
+def _profile(name: str, settings: Dict[str, Any]) -> ModelProfile:
+    unknown = set(settings) - _PROFILE_FIELDS
+    if unknown:
+        log.warning(f"Ignoring unknown settings in model profile '{name}': {', '.join(sorted(unknown))}.")
+    return ModelProfile(name=name, **{key: value for key, value in settings.items() if key in _PROFILE_FIELDS})
+
+
+class ModelRegistry:
+    """The profiles, agent assignments and task routes in effect for this process."""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.profiles: Dict[str, ModelProfile] = {
+            DEFAULT_PROFILE: ModelProfile(DEFAULT_PROFILE, model=os.getenv("OPENAI_MODEL")),
+            "fast": ModelProfile("fast", model=OPENAI_FAST_MODEL or os.getenv("OPENAI_MODEL")),
+        }
+        for name, settings in config.get("profiles", {}).items():
+            self.profiles[name] = _profile(name, settings)
+        self.agents: Dict[str, str] = {**DEFAULT_AGENT_PROFILES, **config.get("agents", {})}
+        self.routes: Dict[str, str] = {**DEFAULT_ROUTES, **config.get("routes", {})}
+
+        for owner, name in list(self.agents.items()) + list(self.routes.items()):
+            if name not in self.profiles:
+                log.warning(f"'{owner}' uses the unknown model profile '{name}'; it will use '{DEFAULT_PROFILE}'.")
+
+    @classmethod
+    def from_file(cls, path: str = MODEL_PROFILES_FILE) -> "ModelRegistry":
+        if not os.path.exists(path):
+            return cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            log.error(f"Could not read the model profiles in {path}: {e}. Using the defaults.")
+            return cls()
+        log.debug(f"Loaded model profiles from {path}.")
+        return cls(config)
+
+    def resolve(self, agent_name: str, task: Optional[str] = None) -> ModelProfile:
+        """The profile for a call by `agent_name` serving `task` (route, then agent, then default)."""
+        name = self.routes.get(task) if task else None
+        name = name or self.agents.get(agent_name) or DEFAULT_PROFILE
+        return self.profiles.get(name) or self.profiles[DEFAULT_PROFILE]
+
+    def configure(self, agent, task: Optional[str] = None, profile_name: Optional[str] = None) -> Tuple[Any, ModelProfile]:
+        """A copy of `agent` using its resolved profile (or `profile_name`, when given and known), and that profile."""
+        from agents import ModelSettings
+        from openai.types.shared import Reasoning
+
+        profile = self.profiles.get(profile_name) if profile_name else None
+        profile = profile or self.resolve(agent.name, task)
+        overrides = ModelSettings(
+            temperature=profile.temperature,
+            max_tokens=profile.max_output_tokens,
+            reasoning=Reasoning(effort=profile.reasoning_effort) if profile.reasoning_effort else None,
+        )
+        return agent.clone(model=profile.model or agent.model, model_settings=agent.model_settings.resolve(overrides)), profile
+
+    def describe(self) -> Dict[str, Any]:
+        """The resolved configuration, for `models show`."""
+        return {
+            "profiles": {name: asdict(profile) for name, profile in self.profiles.items()},
+            "agents": {agent: self.resolve(agent).name for agent in sorted(set(KNOWN_AGENTS) | set(self.agents))},
+            "routes": dict(self.routes),
+        }
+
+
+# Process-wide registry, read once at import.
+model_registry = ModelRegistry.from_file()
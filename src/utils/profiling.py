@@ -0,0 +1,200 @@
+"""
+Opt-in profiling of a CLI command (`--profile`): the wall time of named stages (imports,
+session load, token check, each tool, each sub-agent, Chroma, embeddings, rendering) plus
+a function-level profiler, summarized when the command exits.
+
+Two profilers are available. `cprofile` (deterministic, main thread) ranks functions by
+cumulative time and can save a pstats file (snakeviz, gprof2dot). `sample` polls the
+stacks of every thread every PROFILE_SAMPLE_INTERVAL seconds, so worker threads
+(`asyncio.to_thread`, ChromaDB) are covered too, and can save folded stacks for
+flamegraph.pl or speedscope.
+
+Stages nest: a tool's time includes its sub-agents, and the Maestro's includes its tools.
+When profiling is off, `stage()` costs one attribute check.
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Profiling Settings from .env ---
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))
+PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", 25))
+
+PROFILER_MODES = ("cprofile", "sample")
+
+# Leaf frames of worker threads that are parked waiting for work; their samples are dropped.
+# The main thread is always sampled, so time spent waiting on the network stays visible.
+IDLE_FRAMES = {("_worker", "thread.py"), ("wait", "threading.py"), ("get", "queue.py"), ("_wait_for_tstate_lock", "threading.py")}
+
+
+@dataclass
+class StageRecord:
+    """One timed stage; `start` is relative to the start of profiling."""
+    name: str
+    start: float
+    seconds: float
+    thread: str
+
+
+class StackSampler(threading.Thread):
+    """Counts the stacks of all other threads at a fixed interval."""
+
+    def __init__(self, interval: float):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        main_id = threading.main_thread().ident
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id != main_id and (frame.f_code.co_name, os.path.basename(frame.f_code.co_filename)) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[(names.get(thread_id, str(thread_id)), *reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def folded(self) -> str:
+        """The samples in folded-stack format (`thread;outer;...;inner count`)."""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.items())
+
+    def top_frames(self, limit: int) -> List[Tuple[str, int, int]]:
+        """(frame, self samples, total samples) of the frames with the most self samples."""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for frame in set(stack[1:]):
+                total[frame] += count
+        return [(frame, count, total[frame]) for frame, count in own.most_common(limit)]
+
+
+class Profiler:
+    """The process-wide profiling state. Inactive until `start()`."""
+
+    def __init__(self):
+        self.enabled = False
+        self.mode: Optional[str] = None
+        self.output: Optional[str] = None
+        self.origin = time.perf_counter()
+        self.records: List[StageRecord] = []
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+
+    def start(self, mode: str = "cprofile", output: Optional[str] = None, origin: Optional[float] = None):
+        """
+        Starts recording. `origin` (a `time.perf_counter()` value) backdates the start, e.g.
+        to when the CLI module began importing, which is then recorded as the `import: cli` stage.
+        """
+        if mode not in PROFILER_MODES:
+            raise ValueError(f"Unknown profiler '{mode}'. Use one of: {', '.join(PROFILER_MODES)}.")
+        self.enabled, self.mode, self.output = True, mode, output
+        self.records = []
+        now = time.perf_counter()
+        self.origin = origin if origin is not None else now
+        if origin is not None:
+            self.record("import: cli", origin)
+        if mode == "cprofile":
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        else:
+            self._sampler = StackSampler(PROFILE_SAMPLE_INTERVAL)
+            self._sampler.start()
+
+    def record(self, name: str, started: float, ended: Optional[float] = None):
+        """Records a stage that ran from `started` to `ended` (now), both `time.perf_counter()` values."""
+        if not self.enabled:
+            return
+        ended = ended if ended is not None else time.perf_counter()
+        self.records.append(StageRecord(name, started - self.origin, ended - started, threading.current_thread().name))
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times the enclosed block as stage `name`."""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, started)
+
+    def stage_totals(self) -> List[Dict[str, float]]:
+        """Count, total, mean and max seconds per stage name, largest total first."""
+        groups: Dict[str, List[float]] = {}
+        for record in self.records:
+            groups.setdefault(record.name, []).append(record.seconds)
+        rows = [
+            {"stage": name, "count": len(values), "total": sum(values), "mean": sum(values) / len(values), "max": max(values)}
+            for name, values in groups.items()
+        ]
+        return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+    def finish(self) -> str:
+        """Stops profiling, writes the output file if one was requested, and returns the report."""
+        if not self.enabled:
+            return ""
+        wall = time.perf_counter() - self.origin
+        self.enabled = False
+        lines = [f"--- Profile ({self.mode}, wall {wall:.2f}s) ---", f"{'Stage':<48}{'Count':>6}{'Total':>10}{'Mean':>10}{'Max':>10}"]
+        for row in self.stage_totals():
+            lines.append(f"{row['stage'][:47]:<48}{row['count']:>6}{row['total']:>9.3f}s{row['mean']:>9.3f}s{row['max']:>9.3f}s")
+
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            buffer = io.StringIO()
+            stats = pstats.Stats(self._cprofile, stream=buffer)
+            stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+            lines.append("")
+            lines.append(f"Top {PROFILE_TOP_FUNCTIONS} functions by cumulative time (main thread):")
+            lines.append(buffer.getvalue().strip())
+            if self.output:
+                stats.dump_stats(self.output)
+                lines.append(f"\npstats written to {self.output}")
+            self._cprofile = None
+
+        if self._sampler is not None:
+            self._sampler.stop()
+            interval = self._sampler.interval
+            lines.append("")
+            lines.append(f"Top {PROFILE_TOP_FUNCTIONS} frames by self time ({self._sampler.samples} samples every {interval * 1000:g}ms):")
+            lines.append(f"{'Self':>9}{'Total':>10}  Frame")
+            for frame, own, total in self._sampler.top_frames(PROFILE_TOP_FUNCTIONS):
+                lines.append(f"{own * interval:>8.2f}s{total * interval:>9.2f}s  {frame}")
+            if self.output:
+                with open(self.output, "w", encoding="utf-8") as f:
+                    f.write(self._sampler.folded())
+                lines.append(f"\nFolded stacks written to {self.output} (flamegraph.pl, speedscope)")
+            self._sampler = None
+        return "\n".join(lines)
+
+
+# Process-wide profiler, enabled by the CLI's --profile option.
+profiler = Profiler()
+stage = profiler.stage
@@ -0,0 +1,106 @@
+import os
+import re
+from typing import List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Quality Loop Settings from .env ---
+# The caption defaults are bounds of the brand's own feed (dataset_instagram_calcularte_profile.jsonl):
+# under 4% of its captions are shorter than 150 characters, and none has more than 26 hashtags.
+QUALITY_LOOP_ENABLED = os.getenv("QUALITY_LOOP_ENABLED", "false").lower() == "true"
+QUALITY_MAX_ROUNDS = int(os.getenv("QUALITY_MAX_ROUNDS", 3))
+QUALITY_CAPTION_MIN_CHARS = int(os.getenv("QUALITY_CAPTION_MIN_CHARS", 150))
+QUALITY_CAPTION_MAX_CHARS = int(os.getenv("QUALITY_CAPTION_MAX_CHARS", 2200))  # Instagram's limit
+QUALITY_MIN_HASHTAGS = int(os.getenv("QUALITY_MIN_HASHTAGS", 1))
+QUALITY_MAX_HASHTAGS = int(os.getenv("QUALITY_MAX_HASHTAGS", 26))
+QUALITY_MAX_CORPUS_SIMILARITY = float(os.getenv("QUALITY_MAX_CORPUS_SIMILARITY", 0.95))
+QUALITY_MAX_IMAGE_PROMPTS = int(os.getenv("QUALITY_MAX_IMAGE_PROMPTS", 20))
+QUALITY_IMAGE_PROMPT_MIN_CHARS = int(os.getenv("QUALITY_IMAGE_PROMPT_MIN_CHARS", 100))
+
+HASHTAG_PATTERN = re.compile(r"#\w+")
+WORD_PATTERN = re.compile(r"[^\W\d_]+")
+# A caption closes the loop with the reader either way: a link (the site, "link na bio", a profile)
+# or a call to action (a question, or an invitation such as "Saiba mais" or "arrasta pro lado").
+LINK_PATTERN = re.compile(r"calcularte\.com\.br|\blink\b|\bbio\b|@calcularte", re.IGNORECASE)
+CTA_PATTERN = re.compile(
+    r"\?|\b(salv[ae]|compartilh[ae]|coment[ae]|marqu[ae]|marca|conta pra gente|me conta|conte|saiba mais|confira|conferir|"
+    r"acesse|clique|arrasta|vem|venha|conheça|conheçam|assista|baixe|teste|experimente|assine|cadastre|manda|mande|deixe|"
+    r"chama|chame|fale|acompanhe|segue|siga|aproveite|garanta|participe|responda|inscreva)\b",
+    re.IGNORECASE,
+)
+QUOTED_PATTERN = re.compile(r'"[^"]*"|“[^”]*”')
+IMAGE_CTA_PATTERN = re.compile(r"calcularte\.com\.br|link na bio|\b(salve|compartilhe|comente|save|share|comment)\b", re.IGNORECASE)
+
+# Frequent words that only occur in one of the two languages (words like "a" or "do" are ambiguous).
+PORTUGUESE_WORDS = frozenset(
+    "que não para com uma um os das dos da em na nos nas você seu sua é são mais como por ao pra isso "
+    "mas ou também está muito quando seus suas ele ela já tem sobre pelo pela cada sem".split()
+)
+ENGLISH_WORDS = frozenset(
+    "the and of to is with for on that this it are be your you from by at an its their which into over "
+    "has have was were".split()
+)
+LANGUAGE_MIN_HITS = 3
+
+
+def detect_language(text: str) -> Optional[str]:
+    """'pt' or 'en' from frequent function words, or None when the text has too few of them."""
+    words = [word.lower() for word in WORD_PATTERN.findall(text)]
+    pt_hits = sum(word in PORTUGUESE_WORDS for word in words)
+    en_hits = sum(word in ENGLISH_WORDS for word in words)
+    if max(pt_hits, en_hits) < LANGUAGE_MIN_HITS:
+        return None
+    return "pt" if pt_hits >= en_hits else "en"
+
+
+def caption_issues(caption: str, corpus_similarity: Optional[float] = None) -> List[str]:
+    """
+    Deterministic checks a caption must pass before it is worth a judge call. Returns the
+    problems found, phrased as revision feedback (empty when the caption passes).
+    `corpus_similarity` is the cosine similarity to the closest post already in the corpus.
+    """
+    issues = []
+    length = len(caption.strip())
+    if length < QUALITY_CAPTION_MIN_CHARS:
+        issues.append(f"The caption is too short ({length} characters); develop it to at least {QUALITY_CAPTION_MIN_CHARS}.")
+    elif length > QUALITY_CAPTION_MAX_CHARS:
+        issues.append(f"The caption is too long ({length} characters); Instagram allows at most {QUALITY_CAPTION_MAX_CHARS}.")
+
+    hashtags = len(HASHTAG_PATTERN.findall(caption))
+    if hashtags < QUALITY_MIN_HASHTAGS:
+        issues.append(f"Add relevant hashtags at the end (at least {QUALITY_MIN_HASHTAGS}).")
+    elif hashtags > QUALITY_MAX_HASHTAGS:
+        issues.append(f"Use at most {QUALITY_MAX_HASHTAGS} hashtags (found {hashtags}).")
+
+    if not CTA_PATTERN.search(caption) and not LINK_PATTERN.search(caption):
+        issues.append(
+            "End with a call to action: a question for the comments, an invitation (save, share, \"Saiba mais\") "
+            "or the link (www.calcularte.com.br, link na bio)."
+        )
+
+    if detect_language(caption) == "en":
+        issues.append("Write the caption in Brazilian Portuguese.")
+
+    if corpus_similarity is not None and corpus_similarity >= QUALITY_MAX_CORPUS_SIMILARITY:
+        issues.append(
+            f"The caption is almost identical to an existing post (similarity {corpus_similarity:.2f}); write an original caption."
+        )
+    return issues
+
+
+def image_prompt_issues(prompts: List[str]) -> List[str]:
+    """Deterministic checks for a set of image prompts (see `caption_issues`)."""
+    if not prompts:
+        return ["Return at least one image prompt."]
+    issues = []
+    if len(prompts) > QUALITY_MAX_IMAGE_PROMPTS:
+        issues.append(f"Use at most {QUALITY_MAX_IMAGE_PROMPTS} slides (found {len(prompts)}).")
+    for number, prompt in enumerate(prompts, start=1):
+        if len(prompt.strip()) < QUALITY_IMAGE_PROMPT_MIN_CHARS:
+            issues.append(f"Prompt {number} is too short to guide an image model; describe the scene, style and overlaid text in detail.")
+        elif detect_language(QUOTED_PATTERN.sub(" ", prompt)) == "pt":
+            issues.append(f"Write prompt {number} in English (only the overlaid text should be in Portuguese).")
+    if not IMAGE_CTA_PATTERN.search(prompts[-1]):
+        issues.append("The final slide must be the call-to-action image (save, share, comment and calcularte.com.br).")
+    return issues
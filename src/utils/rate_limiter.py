@@ -0,0 +1,331 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, OpenAI
+from src.utils.logging import log
+
+load_dotenv()
+
+# --- Rate Limit Settings from .env ---
+# A limit of 0 disables the corresponding bucket.
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", 0))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", 0))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", 8))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 5))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", 1.0))
+DEFAULT_OUTPUT_TOKEN_ESTIMATE = int(os.getenv("DEFAULT_OUTPUT_TOKEN_ESTIMATE", 1000))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Mirrors the OpenAI client's own default (10 minutes, 5 seconds to connect).
+OPENAI_HTTP_TIMEOUT = httpx.Timeout(600.0, connect=5.0)
+
+
+class _TokenBucket:
+    """A per-minute token bucket. A non-positive limit means unlimited."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.refill_per_second = per_minute / 60.0
+        self.updated_at = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be consumed (0 if it can be consumed now)."""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        # A single request larger than the bucket is admitted once the bucket is full.
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.refill_per_second
+
+    def consume(self, amount: float):
+        if not self.unlimited:
+            self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    A process-wide limiter shared by every OpenAI call (sync and async).
+
+    Combines a requests-per-minute and a tokens-per-minute bucket with an AIMD
+    concurrency controller: the in-flight limit grows additively on success and
+    is halved on every 429, during which all callers pause for the `retry-after`.
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0, max_concurrency: int = 8, min_concurrency: int = 1):
+        self._lock = threading.Lock()
+        self._requests = _TokenBucket(requests_per_minute)
+        self._tokens = _TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency_limit = float(max_concurrency)
+        self.in_flight = 0
+        self.rate_limited_count = 0
+        self._paused_until = 0.0
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Takes a slot and returns 0, or returns how long to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self.in_flight >= int(self.concurrency_limit):
+                return 0.05
+            wait = max(self._requests.wait_time(1, now), self._tokens.wait_time(tokens, now))
+            if wait > 0:
+                return wait
+            self._requests.consume(1)
+            self._tokens.consume(tokens)
+            self.in_flight += 1
+            return 0.0
+
+    async def acquire(self, tokens: int = 0):
+        """Waits (without blocking the event loop) until a request may be sent."""
+        while (wait := self._try_acquire(tokens)) > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, tokens: int = 0):
+        """Blocking counterpart of `acquire` for the synchronous OpenAI client."""
+        while (wait := self._try_acquire(tokens)) > 0:
+            time.sleep(wait)
+
+    def release(self):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def on_success(self):
+        """Additive increase: roughly +1 slot per window of successful requests."""
+        with self._lock:
+            self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1 / self.concurrency_limit)
+
+    def on_rate_limited(self, retry_after: float):
+        """Multiplicative decrease, plus a shared pause honoring the server's `retry-after`."""
+        with self._lock:
+            self.rate_limited_count += 1
+            self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit / 2)
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        log.warning(f"OpenAI rate limit hit. Pausing {retry_after:.2f}s; concurrency limit is now {int(self.concurrency_limit)}.")
+
+
+def estimate_request_tokens(request: httpx.Request) -> int:
+    """Roughly estimates the tokens a request will consume (~4 bytes per input token plus the output cap)."""
+    try:
+        body = request.content
+    except httpx.RequestNotRead:
+        return DEFAULT_OUTPUT_TOKEN_ESTIMATE
+    output_tokens = DEFAULT_OUTPUT_TOKEN_ESTIMATE
+    try:
+        payload = json.loads(body) if body else {}
+        output_tokens = payload.get("max_output_tokens") or payload.get("max_tokens") or output_tokens
+    except (ValueError, AttributeError):
+        pass
+    return len(body) // 4 + output_tokens
+
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Uses the server's retry hint when present, otherwise exponential backoff with full jitter."""
+    headers = response.headers
+    if retry_after_ms := headers.get("retry-after-ms"):
+        try:
+            delay = float(retry_after_ms) / 1000
+            return delay + random.uniform(0, delay * 0.25)
+        except ValueError:
+            pass
+    if retry_after := headers.get("retry-after"):
+        try:
+            delay = float(retry_after)
+            return delay + random.uniform(0, delay * 0.25)
+        except ValueError:
+            pass
+    return random.uniform(0, OPENAI_BACKOFF_BASE * 2 ** attempt)
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Keeps the limiter slot until a (possibly streamed) response body is closed."""
+
+    def __init__(self, stream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._closed = False
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    """Async counterpart of `_ReleasingStream`."""
+
+    def __init__(self, stream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._closed = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close()
+
+
+def _with_stream(response: httpx.Response, stream) -> httpx.Response:
+    return httpx.Response(
+        status_code=response.status_code,
+        headers=response.headers,
+        stream=stream,
+        extensions=response.extensions,
+    )
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """An httpx transport that routes every request through the shared `RateLimiter`."""
+
+    def __init__(self, limiter: RateLimiter, transport: Optional[httpx.BaseTransport] = None, max_retries: int = OPENAI_MAX_RETRIES):
+        self._limiter = limiter
+        self._transport = transport or httpx.HTTPTransport()
+        self._max_retries = max_retries
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        tokens = estimate_request_tokens(request)
+        attempt = 0
+        while True:
+            self._limiter.acquire_sync(tokens)
+            try:
+                response = self._transport.handle_request(request)
+            except BaseException:
+                self._limiter.release()
+                raise
+
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                delay = _retry_delay(response, attempt)
+                if response.status_code == 429:
+                    self._limiter.on_rate_limited(delay)
+                if attempt < self._max_retries:
+                    response.close()
+                    self._limiter.release()
+                    log.debug(f"Retrying {request.url.path} after HTTP {response.status_code} in {delay:.2f}s (attempt {attempt + 1}/{self._max_retries}).")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+            else:
+                self._limiter.on_success()
+            return _with_stream(response, _ReleasingStream(response.stream, self._limiter.release))
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of `RateLimitedTransport`, used by the Agents SDK client."""
+
+    def __init__(self, limiter: RateLimiter, transport: Optional[httpx.AsyncBaseTransport] = None, max_retries: int = OPENAI_MAX_RETRIES):
+        self._limiter = limiter
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self._max_retries = max_retries
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        tokens = estimate_request_tokens(request)
+        attempt = 0
+        while True:
+            await self._limiter.acquire(tokens)
+            try:
+                response = await self._transport.handle_async_request(request)
+            except BaseException:
+                self._limiter.release()
+                raise
+
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                delay = _retry_delay(response, attempt)
+                if response.status_code == 429:
+                    self._limiter.on_rate_limited(delay)
+                if attempt < self._max_retries:
+                    await response.aclose()
+                    self._limiter.release()
+                    log.debug(f"Retrying {request.url.path} after HTTP {response.status_code} in {delay:.2f}s (attempt {attempt + 1}/{self._max_retries}).")
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+            else:
+                self._limiter.on_success()
+            return _with_stream(response, _AsyncReleasingStream(response.stream, self._limiter.release))
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+# --- Process-wide limiter and client factories ---
+
+_limiter: Optional[RateLimiter] = None
+_limiter_guard = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Returns the process-wide limiter, creating it from the .env settings on first use."""
+    global _limiter
+    with _limiter_guard:
+        if _limiter is None:
+            _limiter = RateLimiter(
+                requests_per_minute=OPENAI_RPM_LIMIT,
+                tokens_per_minute=OPENAI_TPM_LIMIT,
+                max_concurrency=OPENAI_MAX_CONCURRENCY,
+            )
+        return _limiter
+
+
+def create_openai_client(**kwargs) -> OpenAI:
+    """Creates a synchronous OpenAI client whose requests go through the shared limiter."""
+    # Retries are handled by the transport, so the client's own retry loop is disabled.
+    return OpenAI(
+        api_key=kwargs.pop("api_key", os.getenv("OPENAI_API_KEY")),
+        http_client=httpx.Client(transport=RateLimitedTransport(get_rate_limiter()), timeout=OPENAI_HTTP_TIMEOUT),
+        max_retries=0,
+        **kwargs,
+    )
+
+
+def create_async_openai_client(**kwargs) -> AsyncOpenAI:
+    """Creates an async OpenAI client whose requests go through the shared limiter."""
+    return AsyncOpenAI(
+        api_key=kwargs.pop("api_key", os.getenv("OPENAI_API_KEY")),
+        http_client=httpx.AsyncClient(transport=AsyncRateLimitedTransport(get_rate_limiter()), timeout=OPENAI_HTTP_TIMEOUT),
+        max_retries=0,
+        **kwargs,
+    )
+
+
+def install_rate_limited_default_client():
+    """Makes the Agents SDK use a rate-limited client for every agent run."""
+    from agents import set_default_openai_client
+
+    set_default_openai_client(create_async_openai_client())
+    log.debug("Rate-limited OpenAI client installed as the Agents SDK default.")
@@ -0,0 +1,131 @@
+import numpy as np
+from typing import List, Optional, Sequence
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalizes each row so that dot products become cosine similarities."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def truncate_embeddings(embeddings: Sequence[Sequence[float]], dimensions: int) -> np.ndarray:
+    """
+    The first `dimensions` components of each embedding, re-normalized to unit length. For
+    `text-embedding-3-*` models this equals requesting the embedding with `dimensions`.
+    """
+    return _normalize(np.asarray(embeddings, dtype=np.float32)[:, :dimensions])
+
+
+def cosine_similarity(a: Sequence[float], b: Sequence[float]) -> float:
+    vectors = _normalize(np.asarray([a, b], dtype=np.float32))
+    return float(vectors[0] @ vectors[1])
+
+
+def rank_by_brand_similarity(
+    candidate_embeddings: Sequence[Sequence[float]],
+    neighbour_embeddings: Sequence[Sequence[Sequence[float]]],
+    max_similarity: float = 0.95,
+) -> List[int]:
+    """
+    Ranks candidates by how close they sit to the brand's existing posts.
+
+    A candidate's score is its mean cosine similarity to its nearest posts in the corpus.
+    Candidates at or above `max_similarity` to any single post are near-copies, not on-brand
+    originals, and are ranked after all others.
+
+    Args:
+        candidate_embeddings: One embedding per candidate.
+        neighbour_embeddings: For each candidate, the embeddings of its nearest corpus posts.
+        max_similarity: Similarity to one post from which a candidate counts as a copy.
+
+    Returns:
+        The candidate indices, best first.
+    """
+    scores = []
+    for candidate, neighbours in zip(candidate_embeddings, neighbour_embeddings):
+        if len(neighbours) == 0:
+            scores.append((False, 0.0))
+            continue
+        similarities = _normalize(np.asarray(neighbours, dtype=np.float32)) @ _normalize(np.asarray(candidate, dtype=np.float32))
+        scores.append((bool(np.max(similarities) < max_similarity), float(np.mean(similarities))))
+    return sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+
+
+def collapse_near_duplicates(
+    embeddings: Sequence[Sequence[float]],
+    threshold: float = 0.95,
+    limit: Optional[int] = None,
+) -> List[int]:
+    """
+    Walks the candidates in their given order and keeps only those whose cosine
+    similarity to every already-kept candidate is below `threshold`.
+
+    Args:
+        embeddings: Candidate embeddings, in priority order (best first).
+        threshold: Cosine similarity at or above which two candidates are duplicates.
+        limit: Stop once this many candidates have been kept.
+
+    Returns:
+        The indices of the kept candidates, in their original order.
+    """
+    if len(embeddings) == 0:
+        return []
+
+    vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+    kept: List[int] = []
+    kept_vectors = np.empty((0, vectors.shape[1]), dtype=np.float32)
+
+    for i, vector in enumerate(vectors):
+        if kept and np.max(kept_vectors @ vector) >= threshold:
+            continue
+        kept.append(i)
+        kept_vectors = np.vstack([kept_vectors, vector])
+        if limit is not None and len(kept) >= limit:
+            break
+    return kept
+
+
+def mmr_rerank(
+    query_embedding: Sequence[float],
+    candidate_embeddings: Sequence[Sequence[float]],
+    k: int,
+    lambda_mult: float = 0.5,
+) -> List[int]:
+    """
+    Selects `k` candidates using Maximal Marginal Relevance.
+
+    Each step picks the candidate maximizing
+    `lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, selected))`,
+    trading relevance to the query against redundancy with what was already picked.
+
+    Args:
+        query_embedding: The embedding of the search query.
+        candidate_embeddings: The embeddings of the retrieved candidates.
+        k: The number of candidates to select.
+        lambda_mult: 1.0 is pure relevance, 0.0 is pure diversity.
+
+    Returns:
+        The indices of the selected candidates, in selection order.
+    """
+    if len(candidate_embeddings) == 0 or k <= 0:
+        return []
+
+    candidates = _normalize(np.asarray(candidate_embeddings, dtype=np.float32))
+    query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+    k = min(k, len(candidates))
+
+    relevance = candidates @ query
+    pairwise = candidates @ candidates.T
+
+    selected = [int(np.argmax(relevance))]
+    # Running max similarity of every candidate to the selected set.
+    redundancy = pairwise[selected[0]].copy()
+
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        np.maximum(redundancy, pairwise[best], out=redundancy)
+    return selected
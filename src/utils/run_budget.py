@@ -0,0 +1,210 @@
+"""
+Per-turn budgets for a Maestro or fast-path turn: wall time, input and output tokens, and
+sub-agent calls. Token usage is charged live, from the `response.completed` event of every
+model response streamed by the Maestro and its sub-agents (the same usage their response
+spans carry), so the budget also works with tracing disabled.
+
+Once any limit is RUN_BUDGET_DEGRADE_AT spent, the turn degrades: sub-agents switch to the
+RUN_BUDGET_DEGRADED_PROFILE model profile, the wildcard, judge, best-of-N and hedging steps
+are skipped, and brand context is shrunk by RUN_BUDGET_CONTEXT_FACTOR. Once a limit is
+reached, no new sub-agent is started, running ones stop, and the turn returns the assets
+completed so far instead of failing. A limit of 0 disables it.
+"""
+import asyncio
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from src.utils import console
+from src.utils.logging import log
+
+load_dotenv()
+
+# --- Run Budget Settings from .env ---
+RUN_BUDGET_MAX_SECONDS = float(os.getenv("RUN_BUDGET_MAX_SECONDS", 0))  # 0 disables each limit
+RUN_BUDGET_MAX_INPUT_TOKENS = int(os.getenv("RUN_BUDGET_MAX_INPUT_TOKENS", 0))
+RUN_BUDGET_MAX_OUTPUT_TOKENS = int(os.getenv("RUN_BUDGET_MAX_OUTPUT_TOKENS", 0))
+RUN_BUDGET_MAX_AGENT_CALLS = int(os.getenv("RUN_BUDGET_MAX_AGENT_CALLS", 0))
+RUN_BUDGET_DEGRADE_AT = float(os.getenv("RUN_BUDGET_DEGRADE_AT", 0.8))  # fraction of any limit
+RUN_BUDGET_DEGRADED_PROFILE = os.getenv("RUN_BUDGET_DEGRADED_PROFILE", "fast")
+RUN_BUDGET_CONTEXT_FACTOR = float(os.getenv("RUN_BUDGET_CONTEXT_FACTOR", 0.5))
+
+# Completed assets listed first in a partial response; ideas already developed into a caption are left out.
+ASSET_ORDER = ["caption", "image_prompts", "revision", "content_plan", "idea", "wildcard_angle"]
+
+
+class BudgetExhausted(RuntimeError):
+    """Raised when a turn's budget does not allow a sub-agent to start or keep running."""
+
+
+@dataclass
+class RunBudget:
+    """The limits of one turn (0 = unlimited) and what it has spent so far."""
+    max_seconds: float = 0
+    max_input_tokens: int = 0
+    max_output_tokens: int = 0
+    max_agent_calls: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    input_tokens: int = 0
+    output_tokens: int = 0
+    agent_calls: int = 0
+    assets: List[Any] = field(default_factory=list)
+    refused: Optional[str] = None
+    _announced: bool = False
+
+    @classmethod
+    def from_env(cls) -> "RunBudget":
+        return cls(RUN_BUDGET_MAX_SECONDS, RUN_BUDGET_MAX_INPUT_TOKENS, RUN_BUDGET_MAX_OUTPUT_TOKENS, RUN_BUDGET_MAX_AGENT_CALLS)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def fractions(self) -> Dict[str, float]:
+        """The spent fraction of every enabled limit."""
+        spent = {
+            "wall time": (self.elapsed, self.max_seconds),
+            "input tokens": (self.input_tokens, self.max_input_tokens),
+            "output tokens": (self.output_tokens, self.max_output_tokens),
+            "sub-agent calls": (self.agent_calls, self.max_agent_calls),
+        }
+        return {name: used / limit for name, (used, limit) in spent.items() if limit > 0}
+
+    @property
+    def degraded(self) -> bool:
+        return any(fraction >= RUN_BUDGET_DEGRADE_AT for fraction in self.fractions().values())
+
+    def spent(self) -> Optional[str]:
+        """The hard limit (wall time or tokens) that has been reached, if any. Calls only limit new sub-agents."""
+        for name, fraction in self.fractions().items():
+            if name != "sub-agent calls" and fraction >= 1:
+                return name
+        return None
+
+    def stop_reason(self) -> Optional[str]:
+        """Why the turn should stop now, or None while it may continue."""
+        return self.refused or self.spent()
+
+    def remaining_seconds(self) -> Optional[float]:
+        return max(0.0, self.max_seconds - self.elapsed) if self.max_seconds > 0 else None
+
+    def degraded_profile(self) -> Optional[str]:
+        """The model profile sub-agents must use, or None to keep their own."""
+        return RUN_BUDGET_DEGRADED_PROFILE if self.degraded else None
+
+    def shrink(self, value: int) -> int:
+        """`value` (a context size) scaled down by RUN_BUDGET_CONTEXT_FACTOR once degraded."""
+        return max(1, int(value * RUN_BUDGET_CONTEXT_FACTOR)) if self.degraded else value
+
+    def charge_tokens(self, input_tokens: int, output_tokens: int):
+        self.input_tokens += input_tokens or 0
+        self.output_tokens += output_tokens or 0
+        self._announce()
+
+    def start_agent_call(self, agent_name: str):
+        """Counts a new sub-agent run, or raises BudgetExhausted if the budget does not allow it."""
+        reason = self.spent()
+        if reason is None and self.max_agent_calls > 0 and self.agent_calls >= self.max_agent_calls:
+            reason = "sub-agent calls"
+        if reason:
+            self.refused = self.refused or reason
+            raise BudgetExhausted(f"The run budget ({reason}) is spent; {agent_name} was not started.")
+        self.agent_calls += 1
+        self._announce()
+
+    def _announce(self):
+        if self._announced or not self.degraded:
+            return
+        self._announced = True
+        log.warning(
+            f"Run budget nearly spent ({self.summary()}). Switching sub-agents to the '{RUN_BUDGET_DEGRADED_PROFILE}' profile, "
+            f"skipping the wildcard, judge and best-of-N steps and shrinking brand context."
+        )
+        console.echo(f"\n--- Run budget nearly spent: switching to economy mode ({self.summary()}). ---")
+
+    def summary(self) -> str:
+        parts = [f"{self.elapsed:.1f}s" + (f" of {self.max_seconds:g}s" if self.max_seconds else "")]
+        parts.append(f"{self.input_tokens} input tokens" + (f" of {self.max_input_tokens}" if self.max_input_tokens else ""))
+        parts.append(f"{self.output_tokens} output tokens" + (f" of {self.max_output_tokens}" if self.max_output_tokens else ""))
+        parts.append(f"{self.agent_calls} sub-agent calls" + (f" of {self.max_agent_calls}" if self.max_agent_calls else ""))
+        return ", ".join(parts)
+
+
+_current_budget: ContextVar[Optional[RunBudget]] = ContextVar("run_budget", default=None)
+
+
+def current_budget() -> Optional[RunBudget]:
+    """The budget of the turn this code runs in (tasks and threads started by the turn inherit it)."""
+    return _current_budget.get()
+
+
+@contextmanager
+def run_budget(budget: RunBudget):
+    """Makes `budget` the current budget for the enclosed turn."""
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+def budget_degraded() -> bool:
+    budget = current_budget()
+    return budget is not None and budget.degraded
+
+
+def charge_response_event(data: Any):
+    """Charges the usage of a streamed `response.completed` event to the current budget."""
+    budget = current_budget()
+    if budget is None or getattr(data, "type", None) != "response.completed":
+        return
+    usage = getattr(getattr(data, "response", None), "usage", None)
+    if usage is not None:
+        budget.charge_tokens(usage.input_tokens, usage.output_tokens)
+
+
+async def enforce_deadline(budget: RunBudget, cancel: Callable[[], None]):
+    """Calls `cancel` when the budget's wall time runs out. Run it as a task and cancel it when the turn ends."""
+    remaining = budget.remaining_seconds()
+    if remaining is None:
+        return
+    await asyncio.sleep(remaining)
+    log.warning(f"Run budget: wall time of {budget.max_seconds:g}s reached. Stopping the turn.")
+    cancel()
+
+
+def _render_asset(asset: Any) -> str:
+    title = f" '{asset.idea_title}'" if asset.idea_title else ""
+    try:
+        content = json.loads(asset.content) if asset.asset_type in ("idea", "image_prompts", "content_plan") else None
+    except ValueError:
+        content = None
+    if asset.asset_type == "idea" and isinstance(content, dict):
+        return f"Idea{title} ({asset.pillar}):\n{content.get('defense_of_idea', '')}"
+    if asset.asset_type == "image_prompts" and isinstance(content, dict):
+        prompts = [item.get("prompt", "") for item in content.get("prompts", [])]
+        return f"Image prompts for{title}:\n" + "\n".join(f"Slide {number}: {prompt}" for number, prompt in enumerate(prompts, start=1))
+    if asset.asset_type == "content_plan" and isinstance(content, dict):
+        lines = [f"- {post.get('day_or_sequence')} | {post.get('pillar')}: {post.get('reasoning')}" for post in content.get("plan", [])]
+        return "Content plan:\n" + "\n".join(lines)
+    label = asset.asset_type.replace("_", " ").capitalize()
+    return f"{label}{' for' + title if title else ''}:\n{asset.content}"
+
+
+def partial_response(budget: RunBudget) -> str:
+    """The final response of a turn stopped by its budget: the assets it completed, best first."""
+    reason = budget.stop_reason() or "limit"
+    captioned = {asset.idea_title for asset in budget.assets if asset.asset_type == "caption"}
+    assets = [
+        asset for asset in budget.assets
+        if not (asset.asset_type == "idea" and asset.idea_title in captioned)
+    ]
+    assets.sort(key=lambda asset: ASSET_ORDER.index(asset.asset_type) if asset.asset_type in ASSET_ORDER else len(ASSET_ORDER))
+    header = f"Stopped early: the run budget ({reason}) was reached after {budget.summary()}."
+    if not assets:
+        return f"{header}\nNothing was completed before the budget ran out. Try a narrower request or a larger budget."
+    return f"{header}\nHere is what was completed:\n\n" + "\n\n".join(_render_asset(asset) for asset in assets)
@@ -0,0 +1,69 @@
+import json
+import re
+from typing import Any, Dict, List
+
+
+class IncrementalArrayParser:
+    """
+    Incrementally parses a streamed JSON document and yields each object of one
+    top-level array (e.g. the `ideas` of a `GeneratedIdeas` output) as soon as its
+    closing brace arrives, without waiting for the whole document.
+
+    Example:
+        parser = IncrementalArrayParser("ideas")
+        for delta in deltas:
+            for idea in parser.feed(delta):
+                ...
+    """
+
+    def __init__(self, array_key: str):
+        self._array_start = re.compile(r'"' + re.escape(array_key) + r'"\s*:\s*\[')
+        self._buffer = ""
+        self._position = 0
+        self._in_array = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start = None
+
+    def feed(self, delta: str) -> List[Dict[str, Any]]:
+        """Consumes the next chunk of text and returns any array items it completed."""
+        if self._finished or not delta:
+            return []
+        self._buffer += delta
+
+        if not self._in_array:
+            match = self._array_start.search(self._buffer)
+            if not match:
+                return []
+            self._in_array = True
+            self._position = match.end()
+
+        items = []
+        buffer = self._buffer
+        while self._position < len(buffer):
+            char = buffer[self._position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0 and char == "{":
+                    self._item_start = self._position
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0 and char == "]":
+                    self._finished = True
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._item_start is not None:
+                    items.append(json.loads(buffer[self._item_start:self._position + 1]))
+                    self._item_start = None
+            self._position += 1
+        return items
@@ -1,7 +1,48 @@
 import tiktoken
-from agents import SQLiteSession
+from functools import lru_cache
+from typing import Dict, Iterator, List, TYPE_CHECKING
 
-def get_session_token_count(session: SQLiteSession) -> int:
+if TYPE_CHECKING:
+    from agents import SQLiteSession
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = "cl100k_base") -> tiktoken.Encoding:
+    """Returns a tiktoken encoder, built once per process and reused afterwards."""
+    return tiktoken.get_encoding(encoding_name)
+
+
+def count_tokens(text: str) -> int:
+    """Counts the tokens in a piece of text using the cached encoder."""
+    if not text:
+        return 0
+    return len(get_encoding().encode(text))
+
+
+def _item_texts(items: List[dict]) -> Iterator[str]:
+    """The text the model reads in session items: message content (plain or as parts) and tool call arguments and outputs."""
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        content = item.get("content")
+        if isinstance(content, str):
+            yield content
+        elif isinstance(content, list):
+            for part in content:
+                if isinstance(part, dict) and isinstance(part.get("text"), str):
+                    yield part["text"]
+        for key in ("arguments", "output"):
+            if isinstance(item.get(key), str):
+                yield item[key]
+
+
+def count_item_tokens(items: List[dict]) -> int:
+    """Counts the tokens in the text of a list of session items."""
+    encoding = get_encoding()
+    return sum(len(encoding.encode(text)) for text in _item_texts(items) if text)
+
+
+def get_session_token_count(session: "SQLiteSession") -> int:
     """
     Calculates the total token count of a session's history.
 
@@ -14,8 +55,6 @@ def get_session_token_count(session: SQLiteSession) -> int:
     if not session:
         return 0
 
-    encoding = tiktoken.get_encoding("cl100k_base")
-    
     try:
         # This is a synchronous workaround to call an async method.
         # In a real async application, you would `await session.get_items()`.
@@ -25,9 +64,38 @@ def get_session_token_count(session: SQLiteSession) -> int:
         # If an event loop is already running, use it.
         items = asyncio.get_event_loop().run_until_complete(session.get_items())
 
-    token_count = 0
-    for item in items:
-        if content := item.get("content"):
-            if isinstance(content, str):
-                token_count += len(encoding.encode(content))
-    return token_count
+    return count_item_tokens(items)
+
+
+class SessionTokenLedger:
+    """
+    Keeps the token count of the history a long-lived session replays to the model.
+
+    Each refresh sums the whole of `session.get_items()`, because replay compaction
+    (SESSION_COMPACT_REPLAY) can shrink an earlier item when a later one repeats its
+    payload. Token counts are memoized per distinct text, so only text not seen in the
+    previous refresh is tokenized.
+    """
+
+    def __init__(self, session: "SQLiteSession"):
+        self.session = session
+        self.token_count = 0
+        self._counts: Dict[str, int] = {}
+
+    async def refresh(self) -> int:
+        """Recounts the session's replayed history and returns the count."""
+        items = await self.session.get_items()
+        encoding = get_encoding()
+        counts: Dict[str, int] = {}
+        for text in _item_texts(items):
+            if text and text not in counts:
+                counts[text] = self._counts.get(text)
+                if counts[text] is None:
+                    counts[text] = len(encoding.encode(text))
+        self.token_count = sum(counts.get(text, 0) for text in _item_texts(items))
+        # Only the texts of the current history are kept, so the memo cannot outgrow it.
+        self._counts = counts
+        return self.token_count
+
+    def reset(self):
+        self.token_count, self._counts = 0, {}
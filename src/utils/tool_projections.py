@@ -0,0 +1,98 @@
+"""
+Projections of the retrieval tools' outputs before they go back to the Maestro. A tool's
+output stays in the Maestro's context and in the session for the rest of the conversation,
+and post samples are echoed back as arguments of the next tools, so each projection keeps
+only what the next steps use:
+
+- full: the posts as stored.
+- standard: drops the caption copy in `metadata` and the post URL, and strips each caption's
+  hashtag block (the hashtags stay in `metadata.hashtags`) and any paragraph an earlier
+  result already contains (recurring calls to action and sign-offs).
+- compact: like standard, but `metadata` keeps only engagement and captions are cut to
+  TOOL_CAPTION_MAX_CHARS.
+
+Callers pick a projection with the tool's `projection` argument; otherwise the tool's
+default from .env applies.
+"""
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from src.utils.context_packer import normalize_paragraph, split_paragraphs, strip_hashtags
+from src.utils.logging import log
+
+load_dotenv()
+
+# --- Tool Output Projection Settings from .env ---
+TOOL_PROJECTION_QUERY_BRAND_VOICE = os.getenv("TOOL_PROJECTION_QUERY_BRAND_VOICE", "standard")
+TOOL_PROJECTION_SPECIALIZED_CONTEXT = os.getenv("TOOL_PROJECTION_SPECIALIZED_CONTEXT", "compact")
+TOOL_CAPTION_MAX_CHARS = int(os.getenv("TOOL_CAPTION_MAX_CHARS", 500))
+
+REPEATED_CAPTION = "(same text as an earlier post)"
+
+
+@dataclass(frozen=True)
+class Projection:
+    """What a projection keeps of each post. `metadata_fields=None` keeps all of them."""
+    metadata_fields: Optional[Tuple[str, ...]] = None
+    strip_hashtags: bool = False
+    strip_boilerplate: bool = False
+    caption_max_chars: Optional[int] = None
+
+
+PROJECTIONS: Dict[str, Projection] = {
+    "full": Projection(),
+    "standard": Projection(("hashtags", "timestamp", "likesCount", "commentsCount"), strip_hashtags=True, strip_boilerplate=True),
+    "compact": Projection(("likesCount", "commentsCount"), strip_hashtags=True, strip_boilerplate=True, caption_max_chars=TOOL_CAPTION_MAX_CHARS),
+}
+
+
+def get_projection(name: Optional[str], default: str) -> Projection:
+    """The projection called `name`, or the `default` one when `name` is empty or unknown."""
+    if name and name not in PROJECTIONS:
+        log.warning(f"Unknown tool output projection '{name}'. Use one of: {', '.join(PROJECTIONS)}. Using '{default}'.")
+        name = None
+    return PROJECTIONS.get(name or default) or PROJECTIONS["full"]
+
+
+def truncate(text: str, max_chars: int) -> str:
+    """`text` cut to at most `max_chars` characters at a word boundary, with an ellipsis."""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(None, 1)[0] if " " in text[:max_chars] else text[:max_chars]
+    return cut.rstrip() + "…"
+
+
+def project_captions(captions: List[str], projection: Projection) -> List[str]:
+    """Applies the caption rules of `projection`, in order, so only the first copy of a repeated paragraph is kept."""
+    seen = set()
+    projected = []
+    for caption in captions:
+        if projection.strip_hashtags:
+            caption = strip_hashtags(caption)
+        if projection.strip_boilerplate:
+            kept = []
+            for paragraph in split_paragraphs(caption):
+                key = normalize_paragraph(paragraph)
+                if key in seen:
+                    continue
+                seen.add(key)
+                kept.append(paragraph)
+            caption = "\n\n".join(kept) or REPEATED_CAPTION
+        if projection.caption_max_chars:
+            caption = truncate(caption, projection.caption_max_chars)
+        projected.append(caption)
+    return projected
+
+
+def project_samples(samples: List[Dict[str, Any]], projection: Projection) -> List[Dict[str, Any]]:
+    """Post samples (`{"caption", "metadata"}` dicts, as `query_brand_voice` returns them) reduced by `projection`."""
+    captions = project_captions([sample["caption"] for sample in samples], projection)
+    fields = projection.metadata_fields
+    return [
+        {
+            "caption": caption,
+            "metadata": {key: value for key, value in (sample.get("metadata") or {}).items() if fields is None or key in fields},
+        }
+        for caption, sample in zip(captions, samples)
+    ]
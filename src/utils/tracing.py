@@ -0,0 +1,276 @@
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from agents.tracing import TracingProcessor, Span, Trace
+from agents.tracing.create import (
+    AgentSpanData,
+    FunctionSpanData,
+    GenerationSpanData,
+    GuardrailSpanData,
+    HandoffSpanData,
+)
+from agents.tracing.span_data import ResponseSpanData, TurnSpanData
+
+from src.utils.logging import log as logger
+
+load_dotenv()
+
+# --- Trace Export Settings from .env ---
+CHROME_TRACE_DIR = os.getenv("CHROME_TRACE_DIR", "")  # empty disables the export
+CHROME_TRACE_ARG_MAX_CHARS = int(os.getenv("CHROME_TRACE_ARG_MAX_CHARS", 500))
+
+
+class CustomLoguruProcessor(TracingProcessor):
+    def on_span_start(self, span: Span):
+        pass
+
+    def on_span_end(self, span: Span):
+        # Check for errors on the span first
+        if span.error:
+            span_name = getattr(span.span_data, 'name', type(span.span_data).__name__)
+            logger.log(
+                "ERROR",
+                f"ERROR in span '{span_name}' ({span.span_id}): {span.error}"
+            )
+            # Optionally, you can return here if you don't want to log the regular span info on error
+            return
+
+        span_data = span.span_data
+        log_message = ""
+        log_level = "INFO"
+        
+        if isinstance(span_data, AgentSpanData):
+            log_level = "INFO"
+            log_message = f"AGENT: {span_data.name}"
+            logger.log(log_level, log_message)
+
+        elif isinstance(span_data, GenerationSpanData):
+            log_level = "DEBUG"
+            log_message = (
+                f"GENERATION: Model '{span_data.model}' - "
+                f"Input: {span_data.input}"
+            )
+            if span_data.output:
+                log_message += f" | Output: {span_data.output}"
+            logger.log(log_level, log_message)
+
+        elif isinstance(span_data, FunctionSpanData):
+            log_level = "INFO"
+            log_message = (
+                f"TOOL CALL: {span_data.name} - "
+                f"Arguments: {span_data.input}"
+            )
+            if span_data.output:
+                log_message += f" | Output: {span_data.output}"
+            logger.log(log_level, log_message)
+
+        elif isinstance(span_data, HandoffSpanData):
+            log_level = "INFO"
+            log_message = (
+                f"HANDOFF: From '{span_data.from_agent}' "
+                f"to '{span_data.to_agent}'"
+            )
+            logger.log(log_level, log_message)
+
+        elif isinstance(span_data, GuardrailSpanData):
+            log_level = "WARNING"
+            log_message = (
+                f"GUARDRAIL: {span_data.name} - "
+                f"Triggered: {span_data.triggered}"
+            )
+            logger.log(log_level, log_message)
+
+        else:
+            # Log other span types if necessary, or ignore
+            log_level = "DEBUG"
+            span_name = getattr(span_data, 'name', type(span_data).__name__)
+            log_message = f"SPAN ENDED: {span_name} ({span.span_id}) - Type: {type(span_data).__name__}"
+            logger.log(log_level, log_message)
+
+    def on_trace_start(self, trace: Trace):
+        pass
+
+    def on_trace_end(self, trace: Trace):
+        pass
+
+    def force_flush(self):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+def _microseconds(timestamp: Optional[str]) -> Optional[int]:
+    if not timestamp:
+        return None
+    return int(datetime.fromisoformat(timestamp).timestamp() * 1_000_000)
+
+
+def _clip(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    return text if len(text) <= CHROME_TRACE_ARG_MAX_CHARS else text[:CHROME_TRACE_ARG_MAX_CHARS] + "..."
+
+
+def _span_event(span: Span) -> Optional[Dict[str, Any]]:
+    """A span as a complete ("X") trace event, before lanes are assigned."""
+    start, end = _microseconds(span.started_at), _microseconds(span.ended_at)
+    if start is None or end is None:
+        return None
+    data = span.span_data
+    args: Dict[str, Any] = {"span_id": span.span_id, "parent_id": span.parent_id}
+    if isinstance(data, AgentSpanData):
+        name, category = f"agent: {data.name}", "agent"
+        args["tools"] = data.tools
+    elif isinstance(data, FunctionSpanData):
+        name, category = f"tool: {data.name}", "function"
+        args["input"], args["output"] = _clip(data.input), _clip(data.output)
+    elif isinstance(data, GenerationSpanData):
+        name, category = f"generation: {data.model}", "generation"
+        args["model"], args["usage"] = data.model, data.usage
+    elif isinstance(data, ResponseSpanData):
+        model = getattr(data.response, "model", None)
+        name, category = f"response: {model or '?'}", "generation"
+        args["model"], args["usage"] = model, data.usage
+        args["response_id"] = data.response.id if data.response is not None else None
+    elif isinstance(data, HandoffSpanData):
+        name, category = f"handoff: {data.from_agent} -> {data.to_agent}", "handoff"
+    elif isinstance(data, TurnSpanData):
+        name, category = f"turn {data.turn}: {data.agent_name}", "turn"
+    else:
+        name = getattr(data, "name", None) or data.type
+        category = data.type
+    if span.error:
+        args["error"] = span.error
+    return {"name": name, "cat": category, "ph": "X", "ts": start, "dur": max(0, end - start), "args": args}
+
+
+def _assign_lanes(events: List[Dict[str, Any]]) -> int:
+    """
+    Sets each event's `tid` so that events on one lane either nest or do not overlap
+    (Chrome and Perfetto need that to draw them). A child stays on its parent's lane when it
+    fits; overlapping siblings, e.g. parallel tool calls or hedged runs, get their own lanes.
+    Returns the number of lanes.
+    """
+    lanes: List[List[Dict[str, Any]]] = []
+    by_span = {event["args"]["span_id"]: event for event in events}
+
+    def fits(lane: List[Dict[str, Any]], event: Dict[str, Any]) -> bool:
+        start, end = event["ts"], event["ts"] + event["dur"]
+        for other in lane:
+            other_start, other_end = other["ts"], other["ts"] + other["dur"]
+            disjoint = end <= other_start or start >= other_end
+            nested = (other_start <= start and end <= other_end) or (start <= other_start and other_end <= end)
+            if not (disjoint or nested):
+                return False
+        return True
+
+    for event in sorted(events, key=lambda event: (event["ts"], -event["dur"])):
+        parent = by_span.get(event["args"]["parent_id"])
+        candidates = ([parent["tid"]] if parent is not None and "tid" in parent else []) + list(range(len(lanes)))
+        lane = next((index for index in candidates if fits(lanes[index], event)), None)
+        if lane is None:
+            lanes.append([])
+            lane = len(lanes) - 1
+        lanes[lane].append(event)
+        event["tid"] = lane
+    return len(lanes)
+
+
+def _sum_usage(events: List[Dict[str, Any]]):
+    """Adds the tokens of every model call to its ancestors, as `args.total_usage`."""
+    by_span = {event["args"]["span_id"]: event for event in events}
+    for event in events:
+        usage = event["args"].get("usage")
+        if event["cat"] != "generation" or not usage:
+            continue
+        parent = by_span.get(event["args"]["parent_id"])
+        while parent is not None:
+            total = parent["args"].setdefault("total_usage", {"requests": 0, "input_tokens": 0, "output_tokens": 0})
+            total["requests"] += 1
+            total["input_tokens"] += usage.get("input_tokens") or 0
+            total["output_tokens"] += usage.get("output_tokens") or 0
+            parent = by_span.get(parent["args"]["parent_id"])
+
+
+def chrome_trace(name: str, events: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """The Chrome trace-event document for one trace: its spans, lanes and parent-child flow arrows."""
+    _sum_usage(events)
+    lane_count = _assign_lanes(events)
+    origin = min((event["ts"] for event in events), default=0)
+    for event in events:
+        event["ts"] -= origin
+        event["pid"] = 1
+
+    trace_events: List[Dict[str, Any]] = [{"name": "process_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": name}}]
+    trace_events += [{"name": "thread_name", "ph": "M", "pid": 1, "tid": lane, "args": {"name": f"lane {lane}"}} for lane in range(lane_count)]
+    trace_events += events
+
+    # Arrows from a parent to the children drawn on another lane.
+    by_span = {event["args"]["span_id"]: event for event in events}
+    for flow_id, event in enumerate(events, start=1):
+        parent = by_span.get(event["args"]["parent_id"])
+        if parent is None or parent["tid"] == event["tid"]:
+            continue
+        trace_events.append({"name": "parent", "cat": "flow", "ph": "s", "id": flow_id, "pid": 1, "tid": parent["tid"], "ts": event["ts"]})
+        trace_events.append({"name": "parent", "cat": "flow", "ph": "f", "bp": "e", "id": flow_id, "pid": 1, "tid": event["tid"], "ts": event["ts"]})
+    return {"traceEvents": trace_events, "displayTimeUnit": "ms", "otherData": metadata or {}}
+
+
+class ChromeTraceProcessor(TracingProcessor):
+    """
+    Writes every finished trace (e.g. one Maestro turn with its tools and sub-agents) to a
+    Chrome trace-event JSON file, to open in Perfetto (ui.perfetto.dev) or chrome://tracing.
+    Each agent, tool, model call and handoff span becomes a slice with its timing, parent
+    and token usage; concurrent spans are drawn on separate lanes.
+    """
+
+    def __init__(self, directory: str = CHROME_TRACE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._events: Dict[str, List[Dict[str, Any]]] = {}
+        self._started: Dict[str, datetime] = {}
+
+    def on_trace_start(self, trace: Trace):
+        with self._lock:
+            self._events[trace.trace_id] = []
+            self._started[trace.trace_id] = datetime.now()
+
+    def on_span_start(self, span: Span):
+        pass
+
+    def on_span_end(self, span: Span):
+        event = _span_event(span)
+        if event is None:
+            return
+        with self._lock:
+            self._events.setdefault(span.trace_id, []).append(event)
+
+    def on_trace_end(self, trace: Trace):
+        with self._lock:
+            events = self._events.pop(trace.trace_id, [])
+            started = self._started.pop(trace.trace_id, datetime.now())
+        if not events:
+            return
+        exported = trace.export() or {}
+        document = chrome_trace(trace.name, events, {"trace_id": trace.trace_id, "group_id": exported.get("group_id"), "metadata": exported.get("metadata")})
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", trace.name).strip("-").lower() or "trace"
+        path = os.path.join(self.directory, f"{started:%Y%m%d-%H%M%S}_{slug}_{trace.trace_id[-8:]}.json")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(document, f, ensure_ascii=False, default=str)
+            logger.info(f"Trace written to {path} ({len(events)} spans).")
+        except OSError as e:
+            logger.error(f"Could not write the trace to {path}: {e}")
+
+    def force_flush(self):
+        pass
+
+    def shutdown(self):
+        pass
@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from src.utils.hedging import run_hedged
+
+
+def test_cancelling_the_caller_during_the_hedge_delay_cancels_the_primary():
+    async def scenario():
+        started = asyncio.Event()
+        cancelled = []
+
+        async def attempt(is_hedge: bool):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(is_hedge)
+                raise
+
+        caller = asyncio.ensure_future(run_hedged(attempt, hedge_delay=5))
+        await started.wait()
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        return cancelled
+
+    assert asyncio.run(scenario()) == [False]
+
+
+def test_hedge_wins_when_the_primary_stalls():
+    async def attempt(is_hedge: bool):
+        await asyncio.sleep(0.01 if is_hedge else 10)
+        return "hedge" if is_hedge else "primary"
+
+    assert asyncio.run(run_hedged(attempt, hedge_delay=0.01)) == "hedge"
+
+
+def test_both_attempts_cancelled_raises_a_clear_error():
+    async def scenario():
+        async def attempt(is_hedge: bool):
+            asyncio.current_task().cancel()
+            await asyncio.sleep(10)
+
+        return await run_hedged(attempt, hedge_delay=0)
+
+    with pytest.raises(RuntimeError, match="Both the primary and the hedged request were cancelled"):
+        asyncio.run(scenario())
@@ -0,0 +1,34 @@
+import pytest
+from src.agents_crew.intent_classifier import classify_by_rules
+
+
+@pytest.mark.parametrize("prompt, kind, topic, count", [
+    ("Escreva uma legenda sobre precificação para artesãs", "caption", "precificação para artesãs", None),
+    ("faça uma legenda sobre o Dia das Mães", "caption", "o Dia das Mães", None),
+    ("make a caption about dogs", "caption", "dogs", None),
+    ("legenda sobre gatos", "caption", "gatos", None),
+    ("Me dê 3 ideias sobre Educação", "ideas", "Educação", 3),
+    ("make 3 ideas about pricing", "ideas", "pricing", 3),
+    ("Crie um plano de conteúdo com 5 posts", "plan", "", 5),
+    ("Deixe a última legenda mais curta", "refine", "Deixe a última legenda mais curta", None),
+])
+def test_recognizes_simple_requests(prompt, kind, topic, count):
+    intent = classify_by_rules(prompt)
+    assert intent is not None
+    assert (intent.kind, intent.topic, intent.count) == (kind, topic, count)
+
+
+@pytest.mark.parametrize("prompt", [
+    # Remarks about earlier output are not requests.
+    "a legenda sobre gatos ficou ótima, obrigado",
+    "the caption about cats was great",
+    # Subjects that refer to earlier turns need the conversation history.
+    "escreva uma legenda sobre isso",
+    "write a caption about it",
+    "ideias sobre o tema anterior",
+    "Me dê 3 ideias sobre esse tema",
+    # Multi-step requests are briefs for the Maestro.
+    "Escreva uma legenda sobre gatos e depois as imagens",
+])
+def test_leaves_other_requests_to_the_maestro(prompt):
+    assert classify_by_rules(prompt) is None
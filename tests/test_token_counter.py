@@ -0,0 +1,36 @@
+import asyncio
+import json
+from src.db.session_store import BlobStoringSession
+from src.utils import token_counter
+from src.utils.token_counter import SessionTokenLedger, count_item_tokens
+
+
+class _WordEncoding:
+    """Counts words instead of tokens, so the tests do not need tiktoken's downloaded encoding."""
+
+    def encode(self, text):
+        return text.split()
+
+
+def _tool_output(call_id: str, payload: str) -> dict:
+    return {"type": "function_call_output", "call_id": call_id, "output": payload}
+
+
+def test_ledger_follows_replay_compaction_across_refreshes(tmp_path, monkeypatch):
+    monkeypatch.setattr(token_counter, "get_encoding", lambda: _WordEncoding())
+    report = json.dumps({"report": "tom acolhedor e didático " * 100}, ensure_ascii=False)
+
+    async def scenario():
+        session = BlobStoringSession(session_id="ledger", db_path=str(tmp_path / "sessions.db"))
+        ledger = SessionTokenLedger(session)
+        await session.add_items([{"role": "user", "content": "gere um relatório"}, _tool_output("call_1", report)])
+        first = await ledger.refresh()
+        # The same report again: the replayed history now keeps only this copy in full.
+        await session.add_items([{"role": "user", "content": "de novo"}, _tool_output("call_2", report)])
+        second = await ledger.refresh()
+        return first, second, count_item_tokens(await session.get_items()), count_item_tokens(await session.get_full_items())
+
+    first, second, replayed, full = asyncio.run(scenario())
+    assert first == 3 + len(report.split())
+    assert second == replayed
+    assert second < full